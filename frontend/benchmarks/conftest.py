@@ -0,0 +1,47 @@
+# benchmarks/conftest.py
+import asyncio
+import os
+import sys
+
+import pytest
+
+# The application modules are imported relative to frontend/, like main.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.api_client import OllamaAPI
+from utils.mock_server import MockConfig, MockOllamaServer
+
+
+@pytest.fixture(scope="session")
+def event_loop_runner():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture
+def run(event_loop_runner):
+    """Run a coroutine to completion on the shared benchmark loop"""
+    return event_loop_runner.run_until_complete
+
+
+def start_mock(run, config: MockConfig):
+    server = MockOllamaServer(config)
+    run(server.start())
+    return server
+
+
+@pytest.fixture
+def mock_server(run):
+    server = start_mock(run, MockConfig())
+    yield server
+    run(server.stop())
+
+
+@pytest.fixture
+def api(run, mock_server):
+    client = OllamaAPI(base_url=mock_server.base_url)
+    yield client
+    if client.session:
+        run(client.session.close())
+
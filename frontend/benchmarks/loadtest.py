@@ -0,0 +1,322 @@
+# benchmarks/loadtest.py
+"""
+End-to-end load generator for the client stack.
+
+Drives OllamaAPI.generate_stream plus the RAG retrieval path with many
+concurrent multi-turn chat sessions and writes a JSON report.
+
+    python benchmarks/loadtest.py --mock --sessions 200 --turns 3
+    python benchmarks/loadtest.py --base-url http://gpu-box:11434/api --model llama3 \\
+        --arrival open --rate 5 --sessions 100 --output v2.json --compare v1.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.pipeline import ChatRequest
+from utils.api_client import GenerateStats, OllamaAPI
+from utils.mock_server import MockConfig, MockOllamaServer
+from workloads import rag_pipeline, synthetic_corpus, synthetic_question
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+REPORT_VERSION = 1
+
+
+@dataclass
+class TurnResult:
+    session: int
+    turn: int
+    queued_at: float
+    retrieval_time: float = 0.0
+    ttft: Optional[float] = None
+    inter_token: List[float] = field(default_factory=list)
+    total: float = 0.0
+    tokens: int = 0
+    error: Optional[str] = None
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile, None for an empty sample"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = math.ceil(pct / 100.0 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+def summarize(values: List[float]) -> Dict[str, Optional[float]]:
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else None,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else None,
+    }
+
+
+class ResourceSampler:
+    """Samples client CPU and RSS on a background thread while the load runs"""
+
+    def __init__(self, interval: float = 0.2):
+        self.interval = interval
+        self.rss_samples: List[int] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._process = psutil.Process() if psutil else None
+
+    def _rss(self) -> Optional[int]:
+        """Current RSS in bytes, None without psutil or the resource module"""
+        if self._process:
+            return self._process.memory_info().rss
+        if resource is None:
+            return None
+        # ru_maxrss is in kilobytes on Linux; it is a high-water mark, not current RSS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _sample(self) -> None:
+        rss = self._rss()
+        if rss is not None:
+            self.rss_samples.append(rss)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self._cpu_start = time.process_time()
+        self._wall_start = time.perf_counter()
+        self._sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stop.set()
+        self._thread.join()
+        self.cpu_seconds = time.process_time() - self._cpu_start
+        self.wall_seconds = time.perf_counter() - self._wall_start
+        self._sample()
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "cpu_seconds": self.cpu_seconds,
+            "cpu_utilization": self.cpu_seconds / self.wall_seconds if self.wall_seconds else None,
+            "rss_start_bytes": self.rss_samples[0] if self.rss_samples else None,
+            "rss_peak_bytes": max(self.rss_samples) if self.rss_samples else None,
+            "rss_end_bytes": self.rss_samples[-1] if self.rss_samples else None,
+        }
+
+
+class LoadTest:
+    def __init__(self, api: OllamaAPI, args: argparse.Namespace):
+        self.api = api
+        self.args = args
+        self.results: List[TurnResult] = []
+        self.pipeline = rag_pipeline(synthetic_corpus(args.corpus_size)) if args.corpus_size else None
+
+    def retrieve(self, message: str) -> str:
+        if self.pipeline is None:
+            return message
+        return self.pipeline.retrieve(ChatRequest(message, self.args.model))
+
+    async def run_turn(self, session: int, turn: int, message: str, context: Optional[List[int]]):
+        loop = asyncio.get_running_loop()
+        result = TurnResult(session=session, turn=turn, queued_at=time.perf_counter())
+        self.results.append(result)
+        try:
+            started = time.perf_counter()
+            # Retrieval is synchronous in the app; keep it off the event loop like the GUI thread does
+            prompt = await loop.run_in_executor(None, self.retrieve, message)
+            result.retrieval_time = time.perf_counter() - started
+
+            last_token_at = None
+            final_context = None
+            async for chunk in self.api.generate_stream(prompt=prompt, model=self.args.model, context=context):
+                now = time.perf_counter()
+                if isinstance(chunk, GenerateStats):
+                    final_context = chunk.context
+                    continue
+                if last_token_at is None:
+                    result.ttft = now - started
+                else:
+                    result.inter_token.append(now - last_token_at)
+                last_token_at = now
+                result.tokens += 1
+            result.total = time.perf_counter() - started
+            return final_context
+        except Exception as e:
+            result.total = time.perf_counter() - result.queued_at
+            result.error = f"{type(e).__name__}: {e}"
+            return None
+
+    async def run_session(self, session: int):
+        rng = random.Random(self.args.seed + session)
+        context = None
+        for turn in range(self.args.turns):
+            context = await self.run_turn(session, turn, synthetic_question(rng), context)
+            if self.args.think_time:
+                await asyncio.sleep(rng.expovariate(1.0 / self.args.think_time))
+
+    async def closed_loop(self):
+        """Fixed population: every session runs its turns back to back"""
+        await asyncio.gather(*(self.run_session(i) for i in range(self.args.sessions)))
+
+    async def open_loop(self):
+        """Poisson session arrivals at --rate, independent of how fast the server responds"""
+        rng = random.Random(self.args.seed)
+        tasks = []
+        for i in range(self.args.sessions):
+            tasks.append(asyncio.create_task(self.run_session(i)))
+            await asyncio.sleep(rng.expovariate(self.args.rate))
+        await asyncio.gather(*tasks)
+
+    async def run(self):
+        if self.args.arrival == "open":
+            await self.open_loop()
+        else:
+            await self.closed_loop()
+
+    def report(self, sampler: ResourceSampler) -> Dict[str, Any]:
+        ok = [r for r in self.results if r.error is None]
+        errors: Dict[str, int] = {}
+        for r in self.results:
+            if r.error:
+                errors[r.error] = errors.get(r.error, 0) + 1
+        inter_token = [gap for r in ok for gap in r.inter_token]
+        tokens = sum(r.tokens for r in ok)
+        return {
+            "report_version": REPORT_VERSION,
+            "client_version": git_revision(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(time.time() - sampler.wall_seconds)),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "config": {k: v for k, v in vars(self.args).items() if k not in ("output", "compare")},
+            "requests": len(self.results),
+            "errors": len(self.results) - len(ok),
+            "error_rate": (len(self.results) - len(ok)) / len(self.results) if self.results else 0.0,
+            "error_kinds": errors,
+            "wall_seconds": sampler.wall_seconds,
+            "throughput_rps": len(ok) / sampler.wall_seconds if sampler.wall_seconds else None,
+            "tokens_per_second": tokens / sampler.wall_seconds if sampler.wall_seconds else None,
+            "latency": {
+                "time_to_first_token": summarize([r.ttft for r in ok if r.ttft is not None]),
+                "inter_token": summarize(inter_token),
+                "total": summarize([r.total for r in ok]),
+                "retrieval": summarize([r.retrieval_time for r in ok]),
+            },
+            "client": sampler.report(),
+        }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare_reports(old: Dict[str, Any], new: Dict[str, Any]) -> List[str]:
+    """Human readable deltas for the headline numbers of two reports"""
+    lines = []
+    for metric in ("time_to_first_token", "inter_token", "total", "retrieval"):
+        for pct in ("p50", "p95", "p99"):
+            before = old["latency"][metric][pct]
+            after = new["latency"][metric][pct]
+            if before and after is not None:
+                lines.append(f"{metric:>20} {pct}: {before * 1000:9.2f}ms -> {after * 1000:9.2f}ms "
+                             f"({(after - before) / before * 100:+.1f}%)")
+    lines.append(f"{'error_rate':>20}    : {old['error_rate']:.3%} -> {new['error_rate']:.3%}")
+    before, after = old['client']['rss_peak_bytes'], new['client']['rss_peak_bytes']
+    if before is not None and after is not None:
+        lines.append(f"{'rss_peak':>20}    : {before / 2**20:.1f}MB -> {after / 2**20:.1f}MB")
+    return lines
+
+
+async def main_async(args: argparse.Namespace) -> Dict[str, Any]:
+    server = None
+    base_url = args.base_url
+    if args.mock:
+        server = await MockOllamaServer(MockConfig(
+            latency=args.mock_latency,
+            token_rate=args.mock_token_rate,
+            tokens=args.mock_tokens,
+        )).start()
+        base_url = server.base_url
+
+    api = OllamaAPI(base_url=base_url, timeout=args.timeout)
+    load = LoadTest(api, args)
+    try:
+        with ResourceSampler() as sampler:
+            await load.run()
+    finally:
+        if api.session:
+            await api.session.close()
+        if server:
+            await server.stop()
+    return load.report(sampler)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Concurrent chat-session load test for the Ollama client")
+    parser.add_argument("--base-url", default="http://localhost:11434/api")
+    parser.add_argument("--model", default="llama2-3.2-vision:latest")
+    parser.add_argument("--sessions", type=int, default=200, help="number of simulated users")
+    parser.add_argument("--turns", type=int, default=3, help="turns per session")
+    parser.add_argument("--arrival", choices=["closed", "open"], default="closed")
+    parser.add_argument("--rate", type=float, default=10.0, help="session arrivals per second (open loop)")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean seconds between turns")
+    parser.add_argument("--corpus-size", type=int, default=1000, help="synthetic KB entries, 0 disables RAG")
+    parser.add_argument("--timeout", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--mock", action="store_true", help="run against a local mock server")
+    parser.add_argument("--mock-latency", type=float, default=0.05)
+    parser.add_argument("--mock-token-rate", type=float, default=50.0)
+    parser.add_argument("--mock-tokens", type=int, default=64)
+    parser.add_argument("--output", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", help="previous JSON report to diff against")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = asyncio.run(main_async(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        print("\n".join(compare_reports(previous, report)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
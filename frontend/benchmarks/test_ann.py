@@ -0,0 +1,92 @@
+# benchmarks/test_ann.py
+import numpy as np
+import pytest
+
+from rag.ann import create_index, hnswlib, load_index
+from workloads import synthetic_vectors
+
+CORPUS = 100000
+QUERIES = 100
+K = 10
+
+
+@pytest.fixture(scope="module")
+def vectors():
+    # One draw so the queries come from the same topics as the corpus
+    data = synthetic_vectors(CORPUS + QUERIES)
+    return data[:CORPUS], data[CORPUS:]
+
+
+@pytest.fixture(scope="module")
+def exact(vectors):
+    index = create_index("exact")
+    index.add(range(CORPUS), vectors[0])
+    return index
+
+
+@pytest.fixture(scope="module")
+def truth(exact, vectors):
+    return [set(exact.search(query, K)[0].tolist()) for query in vectors[1]]
+
+
+def recall_at_k(index, queries, truth):
+    found = sum(len(set(index.search(query, K)[0].tolist()) & expected) for query, expected in zip(queries, truth))
+    return found / (K * len(queries))
+
+
+def search_all(index, queries):
+    for query in queries:
+        index.search(query, K)
+
+
+CONFIGS = [
+    ("exact", {}, 1.0),
+    ("exact", {"storage": "float16"}, 0.99),
+    ("exact", {"storage": "int8", "rerank": 0}, 0.85),
+    ("exact", {"storage": "int8"}, 0.99),
+    ("ivf", {"nprobe": 4}, 0.8),
+    ("ivf", {"nprobe": 16}, 0.95),
+    ("ivf", {"nprobe": 16, "storage": "int8"}, 0.95),
+    pytest.param("hnsw", {"ef_search": 64}, 0.9,
+                 marks=pytest.mark.skipif(hnswlib is None, reason="hnswlib not installed")),
+]
+CONFIG_IDS = [
+    "exact", "exact-float16", "exact-int8-norerank", "exact-int8",
+    "ivf-nprobe4", "ivf-nprobe16", "ivf-nprobe16-int8", "hnsw-ef64",
+]
+
+
+@pytest.mark.parametrize("kind,options,min_recall", CONFIGS, ids=CONFIG_IDS)
+def test_vector_search(benchmark, vectors, exact, truth, kind, options, min_recall):
+    corpus, queries = vectors
+    if kind == "exact" and not options:
+        index = exact
+    else:
+        index = create_index(kind, **options)
+        index.add(range(CORPUS), corpus)
+    benchmark(search_all, index, queries)
+    recall = recall_at_k(index, queries, truth)
+    benchmark.extra_info[f"recall@{K}"] = recall
+    if hasattr(index, "nbytes"):
+        # Against float32: about 1/2 for float16 and 1/4 for int8
+        benchmark.extra_info["memory_mb"] = index.nbytes / 1e6
+    assert recall >= min_recall
+
+
+@pytest.mark.parametrize("storage", ["float32", "int8"])
+def test_ivf_updates(vectors, tmp_path, storage):
+    corpus, queries = vectors
+    index = create_index("ivf", nprobe=16, storage=storage)
+    for start in range(0, CORPUS, 10000):
+        index.add(range(start, start + 10000), corpus[start:start + 10000])
+    index.remove(range(0, CORPUS, 2))
+    assert len(index) == CORPUS // 2
+    labels, _ = index.search(corpus[1], K)
+    assert labels[0] == 1 and not np.any(labels % 2 == 0)
+
+    path = str(tmp_path / "vectors.npz")
+    index.save(path)
+    reopened = load_index(path)
+    assert len(reopened) == len(index) and reopened.nprobe == 16 and reopened.storage == storage
+    for query in queries[:10]:
+        assert reopened.search(query, K)[0].tolist() == index.search(query, K)[0].tolist()
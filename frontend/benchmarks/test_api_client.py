@@ -0,0 +1,122 @@
+# benchmarks/test_api_client.py
+import pytest
+
+import time
+
+from conftest import start_mock
+from core.knowledge import KnowledgeStore
+from core.pipeline import ChatPipeline, ChatRequest
+from utils.api_client import CircuitOpenError, OllamaAPI, OllamaAPIError
+from utils.mock_server import MockConfig
+from utils.resilience import RetryPolicy
+
+
+def test_make_request_overhead(benchmark, run, api):
+    # Warm the session so connection setup is not part of the measurement
+    run(api._make_request("GET", "tags"))
+    data, status = benchmark(lambda: run(api._make_request("GET", "tags")))
+    assert status == 200
+    assert data["models"]
+
+
+@pytest.mark.parametrize("tokens", [256, 2048])
+def test_generate_stream_throughput(benchmark, run, tokens):
+    server = start_mock(run, MockConfig(tokens=tokens))
+    api = OllamaAPI(base_url=server.base_url)
+
+    async def consume():
+        count = 0
+        async for _ in api.generate_stream(prompt="benchmark", model="mock"):
+            count += 1
+        return count
+
+    try:
+        count = benchmark(lambda: run(consume()))
+        assert count == tokens + 1  # every token plus the final stats record
+    finally:
+        run(api.session.close())
+        run(server.stop())
+
+
+@pytest.mark.parametrize("model_count", [10, 500])
+def test_list_models_parsing(benchmark, run, model_count):
+    server = start_mock(run, MockConfig(models=[f"model{i}:latest" for i in range(model_count)]))
+    api = OllamaAPI(base_url=server.base_url)
+    try:
+        models = benchmark(lambda: run(api.list_models()))
+        assert len(models) == model_count
+    finally:
+        run(api.session.close())
+        run(server.stop())
+
+
+@pytest.mark.parametrize("hedge_percentile", [None, 90], ids=["unhedged", "hedged-p90"])
+def test_tail_latency(benchmark, run, hedge_percentile):
+    # One request in twenty stalls; a hedge should hide the stall from the caller
+    server = start_mock(run, MockConfig(latency=0.002, tail_every=20, tail_latency=0.2))
+    api = OllamaAPI(base_url=server.base_url, hedge_percentile=hedge_percentile)
+
+    async def requests():
+        latencies = []
+        for _ in range(200):
+            started = time.perf_counter()
+            await api.list_models()
+            latencies.append(time.perf_counter() - started)
+        return sorted(latencies)
+
+    try:
+        run(requests())  # fill the latency window the hedge delay is picked from
+        latencies = benchmark.pedantic(lambda: run(requests()), rounds=1, iterations=1)
+        p99 = latencies[int(len(latencies) * 0.99)]
+        benchmark.extra_info["p99_ms"] = p99 * 1000
+        if hedge_percentile:
+            assert p99 < 0.1
+    finally:
+        run(api.session.close())
+        run(server.stop())
+
+
+def test_retries_and_circuit_breaker(run):
+    server = start_mock(run, MockConfig(failures=2))
+    api = OllamaAPI(base_url=server.base_url, retry=RetryPolicy(base_delay=0.01), breaker_threshold=3)
+    try:
+        # Idempotent calls ride out transient 503s
+        assert run(api.list_models())
+        assert server.request_count == 3
+        # Generations are not repeated behind the caller's back
+        server.config.failures = 3
+        for _ in range(3):
+            with pytest.raises(OllamaAPIError):
+                run(api.generate(prompt="x", model="mock"))
+        assert server.request_count == 6
+        # Three failures in a row open the circuit, so the next call never reaches the server
+        with pytest.raises(CircuitOpenError):
+            run(api.generate(prompt="x", model="mock"))
+        assert server.request_count == 6
+        api.breakers["generate"].opened_at -= api.breaker_reset
+        assert run(api.generate(prompt="x", model="mock")).response
+        assert api.breakers["generate"].state == "closed"
+    finally:
+        run(api.session.close())
+        run(server.stop())
+
+
+@pytest.mark.parametrize("models", [1, 4])
+def test_compare_fanout(benchmark, run, models):
+    # Models stream concurrently, so four should take about as long as one
+    server = start_mock(run, MockConfig(tokens=64, token_rate=500))
+    api = OllamaAPI(base_url=server.base_url)
+    pipeline = ChatPipeline(api, KnowledgeStore())
+    names = [f"model{i}" for i in range(models)]
+
+    def compare():
+        turns = pipeline.prepare_comparison(ChatRequest("benchmark", names[0]), names)
+        return run(pipeline.compare(turns, lambda turn, text: None))
+
+    try:
+        turns = benchmark(compare)
+        assert all(turn.timing.success and turn.timing.eval_count == 64 for turn in turns)
+        assert len({turn.timing.comparison for turn in turns}) == 1
+    finally:
+        run(api.session.close())
+        run(server.stop())
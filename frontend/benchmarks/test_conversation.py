@@ -0,0 +1,154 @@
+# benchmarks/test_conversation.py
+import asyncio
+
+from conftest import start_mock
+from core.knowledge import KnowledgeStore
+from core.pipeline import ChatPipeline, ChatRequest
+from utils.api_client import OllamaAPI
+from utils.conversation import Conversation, ConversationCompactor
+from utils.mock_server import MockConfig
+
+
+def long_conversation(pipeline, turns=6):
+    conversation = pipeline.new_conversation()
+    for i in range(turns):
+        conversation.add("user" if i % 2 == 0 else "assistant", f"message {i} " + "word " * 20)
+    return conversation
+
+
+def compacting_pipeline(api, wait=1.0, summary_api=None):
+    compactor = ConversationCompactor(summary_api or api, max_summary_tokens=16)
+    return ChatPipeline(api, KnowledgeStore(), compactor=compactor, history_budget=40, keep_recent=2,
+                        compaction_wait=wait)
+
+
+async def reply(pipeline, conversation, message="next question"):
+    turn = await asyncio.to_thread(pipeline.prepare, ChatRequest(message, "mock", use_rag=False), conversation)
+    async for _ in pipeline.stream(turn, conversation):
+        pass
+    return turn
+
+
+def test_needs_compaction():
+    conversation = Conversation(budget_tokens=40, keep_recent=2)
+    conversation.add("user", "word " * 100)
+    # Over budget, but the only turn is one of the recent ones kept verbatim
+    assert not conversation.needs_compaction()
+    conversation.add("assistant", "short")
+    conversation.add("user", "short")
+    assert conversation.needs_compaction()
+    conversation.clear()
+    assert not conversation.needs_compaction()
+
+
+def test_compactor_folds_old_turns(run, api):
+    pipeline = compacting_pipeline(api)
+    conversation = long_conversation(pipeline)
+    recent = conversation.turns[-2:]
+    before = conversation.history_tokens
+
+    assert run(pipeline.compactor.compact(conversation, "mock"))
+    assert conversation.turns == recent
+    assert conversation.summary.startswith("tok0")
+    assert conversation.render().startswith("Summary of the earlier conversation: tok0")
+    assert conversation.history_tokens < before
+
+
+def test_summary_of_rewritten_history_is_dropped():
+    conversation = Conversation(budget_tokens=10, keep_recent=1)
+    conversation.add("user", "first")
+    conversation.add("assistant", "second")
+    _, turns = conversation.compactable()
+    conversation.clear()
+    conversation.add("user", "other")
+    conversation.apply_summary("stale", turns)
+    assert not conversation.summary
+    assert [turn.text for turn in conversation.turns] == ["other"]
+
+
+def test_send_waits_for_running_compaction(run):
+    server = start_mock(run, MockConfig(tokens=16, token_rate=400))
+    api = OllamaAPI(base_url=server.base_url)
+    pipeline = compacting_pipeline(api, wait=5.0)
+    conversation = long_conversation(pipeline)
+
+    async def chat():
+        await reply(pipeline, conversation)
+        assert not pipeline._compactions[conversation].done()
+        # Sent while the summary is generated: the prompt waits for it
+        return await reply(pipeline, conversation)
+
+    try:
+        turn = run(chat())
+        assert turn.history.startswith("Summary of the earlier conversation")
+    finally:
+        run(api.session.close())
+        run(server.stop())
+
+
+def test_slow_compaction_applies_to_later_turn(run, api):
+    # Summaries come from a server far slower than the chat model
+    server = start_mock(run, MockConfig(tokens=16, token_rate=50))
+    summary_api = OllamaAPI(base_url=server.base_url)
+    pipeline = compacting_pipeline(api, wait=0, summary_api=summary_api)
+    conversation = long_conversation(pipeline)
+
+    async def chat():
+        await reply(pipeline, conversation)
+        compaction = pipeline._compactions[conversation]
+        turn = await reply(pipeline, conversation)
+        # Neither cancelled nor restarted by the new message
+        assert pipeline._compactions[conversation] is compaction
+        await compaction
+        return turn
+
+    try:
+        turn = run(chat())
+        assert not turn.history.startswith("Summary")
+        assert conversation.summary
+        # Turns added while the summary was generated are kept after it
+        assert conversation.turns[-1].text == turn.response
+    finally:
+        run(summary_api.session.close())
+        run(server.stop())
+
+
+def test_cancelled_compaction_retries_after_next_reply(run):
+    server = start_mock(run, MockConfig(tokens=16, token_rate=200))
+    api = OllamaAPI(base_url=server.base_url)
+    pipeline = compacting_pipeline(api, wait=0)
+    conversation = long_conversation(pipeline)
+
+    async def chat():
+        await reply(pipeline, conversation)
+        cancelled = pipeline._compactions[conversation]
+        pipeline.cancel_compaction(conversation)
+        await asyncio.gather(cancelled, return_exceptions=True)
+        assert cancelled.cancelled() and not conversation.summary
+        await reply(pipeline, conversation)
+        await pipeline._compactions[conversation]
+
+    try:
+        run(chat())
+        assert conversation.summary
+        assert not conversation.needs_compaction()
+    finally:
+        run(api.session.close())
+        run(server.stop())
+
+
+def test_failed_compaction_retries_after_next_reply(run, mock_server, api):
+    pipeline = compacting_pipeline(api)
+    conversation = long_conversation(pipeline)
+
+    async def chat():
+        await reply(pipeline, conversation)
+        # The summary request is the only one the server refuses
+        mock_server.config.failures = 1
+        await pipeline._compactions[conversation]
+        assert not conversation.summary
+        await reply(pipeline, conversation)
+        await pipeline._compactions[conversation]
+
+    run(chat())
+    assert conversation.summary
@@ -0,0 +1,47 @@
+# benchmarks/test_hybrid.py
+import pytest
+
+from core.knowledge import KnowledgeStore
+from rag.ann import create_index
+from workloads import SyntheticEmbedder, synthetic_corpus
+
+QUESTION = "retrieval latency of the vector index"
+
+
+@pytest.fixture(scope="module")
+def store():
+    # Embedding is instant while indexing; searches then pay a 5 ms embedding round trip
+    knowledge = KnowledgeStore(cache_entries=0, embedder=SyntheticEmbedder(), vectors=create_index("exact"))
+    for entry in synthetic_corpus(10000):
+        knowledge.add(entry["content"], entry["source"])
+    knowledge.embedder.delay = 0.005
+    return knowledge
+
+
+@pytest.mark.parametrize("workers", [2, 0], ids=["concurrent", "sequential"])
+def test_hybrid_search(benchmark, store, workers):
+    executor = store.hybrid._executor
+    if not workers:
+        store.hybrid._executor = None
+    try:
+        results, timings = benchmark(store.search, QUESTION)
+    finally:
+        store.hybrid._executor = executor
+    benchmark.extra_info["lexical_ms"] = timings.lexical * 1000
+    benchmark.extra_info["vector_ms"] = timings.vector * 1000
+    fused = {chunk.id for chunk, _ in results[:20]}
+    # Fusion keeps the best of both searches
+    assert {chunk.id for chunk, _ in store.retriever.search(QUESTION, 5)} <= fused
+    assert {chunk.id for chunk, _ in store.similar(QUESTION, 5)} <= fused
+
+
+def test_hybrid_search_cached(benchmark, store):
+    store.hybrid.results.max_entries = 128
+    try:
+        store.prefetch(QUESTION)
+        # Sent with different case and punctuation than the draft
+        results, timings = benchmark(store.search, "Retrieval latency of the vector index?")
+    finally:
+        store.hybrid.results.max_entries = 0
+        store.hybrid.invalidate()
+    assert timings.cached and results
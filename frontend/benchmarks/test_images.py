@@ -0,0 +1,29 @@
+# benchmarks/test_images.py
+import numpy as np
+import pytest
+from PIL import Image
+
+from core.images import ImageEncoder
+
+
+@pytest.fixture(scope="module")
+def photo(tmp_path_factory):
+    # A 12-megapixel camera shot: noisy enough that JPEG cannot shrink it much
+    pixels = np.random.default_rng(0).normal(128, 40, (3000, 4000, 3)).clip(0, 255).astype(np.uint8)
+    path = tmp_path_factory.mktemp("images") / "photo.jpg"
+    Image.fromarray(pixels).save(path, quality=92)
+    return str(path)
+
+
+def test_encode_photo(benchmark, photo):
+    image = benchmark(lambda: ImageEncoder().encode(photo))
+    benchmark.extra_info["original_kb"] = image.original_size / 1024
+    benchmark.extra_info["payload_kb"] = image.payload_size / 1024
+    assert max(image.width, image.height) == 1120
+    assert image.payload_size < image.original_size / 10
+
+
+def test_encode_photo_cached(benchmark, photo):
+    encoder = ImageEncoder()
+    first = encoder.encode(photo)
+    assert benchmark(encoder.encode, photo) is first
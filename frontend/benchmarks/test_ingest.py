@@ -0,0 +1,78 @@
+# benchmarks/test_ingest.py
+import random
+import threading
+import tracemalloc
+
+import pytest
+
+from core.knowledge import KnowledgeStore
+from rag.ann import create_index
+from rag.segment import SegmentFile
+from workloads import SyntheticEmbedder, synthetic_corpus
+
+
+def mirrored_corpus(size, mirror_share=0.2, seed=99):
+    """Corpus where some documents reappear as reformatted copies, like printer-friendly pages"""
+    rng = random.Random(seed)
+    corpus = synthetic_corpus(size, words_per_doc=600)
+    mirrors = [
+        {**entry, "content": entry["content"].upper().replace(" ", "\n"), "source": entry["source"] + "?print=1"}
+        for entry in rng.sample(corpus, int(size * mirror_share))
+    ]
+    return corpus + mirrors
+
+
+def build(corpus, dedup_threshold, compress=False):
+    store = KnowledgeStore(dedup_threshold=dedup_threshold, segment=SegmentFile(compress=compress))
+    for entry in corpus:
+        store.add(entry["content"], entry["source"])
+    return store
+
+
+@pytest.mark.parametrize("dedup_threshold", [0, 0.85], ids=["no-dedup", "dedup"])
+def test_ingest(benchmark, dedup_threshold):
+    corpus = mirrored_corpus(200)
+    store = benchmark.pedantic(build, args=(corpus, dedup_threshold), rounds=3)
+    if dedup_threshold:
+        # Every mirror is recognised and none of its chunks are indexed
+        assert store.skipped_chunks == sum(entry.chunks for entry in store.entries[200:])
+    else:
+        assert store.skipped_chunks == 0
+
+
+@pytest.mark.parametrize("compress", [False, True], ids=["plain", "compressed"])
+def test_ingest_memory(benchmark, compress):
+    corpus = synthetic_corpus(400, words_per_doc=2000)
+    text_bytes = sum(len(entry["content"]) for entry in corpus)
+    store = benchmark.pedantic(build, args=(corpus, 0, compress), rounds=3)
+
+    tracemalloc.start()
+    store = build(corpus, 0, compress)
+    heap = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    benchmark.extra_info["heap_per_text_byte"] = heap / text_bytes
+    benchmark.extra_info["segment_bytes"] = store.segment.size
+    # Text lives in the segment file; the heap only holds the index
+    assert heap < text_bytes / 2
+    assert store.get(1).content == corpus[0]["content"]
+
+
+def test_embedding_outside_lock():
+    store = KnowledgeStore(embedder=SyntheticEmbedder(delay=0.5), vectors=create_index("exact"))
+    first, second = synthetic_corpus(2, words_per_doc=600)
+    adding = threading.Thread(target=store.add, args=(first["content"], first["source"]))
+    adding.start()
+    try:
+        # While the embedding request runs, writers get the lock and the chunks are searchable by keyword
+        assert store._lock.acquire(timeout=0.25)
+        store._lock.release()
+        assert len(store.retriever.search("model")) and not len(store.vectors)
+        # A document removed before its embeddings arrive gets none
+        store.remove([1])
+    finally:
+        adding.join()
+    assert len(store.vectors) == 0
+
+    store.embedder.delay = 0
+    report = store.add(second["content"], second["source"])
+    assert len(store.vectors) == report.indexed
@@ -0,0 +1,125 @@
+# benchmarks/test_metrics.py
+import urllib.request
+
+import pytest
+
+from conftest import start_mock
+from utils.api_client import OllamaAPI, OllamaAPIError
+from utils.metrics import (OPENMETRICS_CONTENT_TYPE, PROMETHEUS_CONTENT_TYPE, MetricsExporter, MetricsRegistry,
+                           metrics)
+from utils.mock_server import MockConfig
+from utils.resilience import RetryPolicy
+
+
+@pytest.fixture
+def registry():
+    registry = MetricsRegistry(prefix="test")
+    registry.request_latency.observe(0.02, "llama3", "generate")
+    registry.request_latency.observe(0.3, "llama3", "generate")
+    registry.retries.inc("llama3", "tags")
+    registry.retries.inc("llama3", "tags", amount=2)
+    return registry
+
+
+@pytest.fixture
+def enabled():
+    # The client reports into the process-wide registry
+    was_enabled, metrics.enabled = metrics.enabled, True
+    yield metrics
+    metrics.enabled = was_enabled
+
+
+def test_counter_and_histogram_values(registry):
+    assert registry.retries.value("llama3", "tags") == 3
+    assert registry.retries.value("other", "tags") == 0
+    assert registry.request_latency.count("llama3", "generate") == 2
+
+
+def test_prometheus_exposition(registry):
+    lines = registry.render().splitlines()
+    assert "# TYPE test_retries_total counter" in lines
+    assert 'test_retries_total{model="llama3",endpoint="tags"} 3.0' in lines
+    assert "# TYPE test_request_latency_seconds histogram" in lines
+    # Buckets are cumulative and end with +Inf
+    assert 'test_request_latency_seconds_bucket{model="llama3",endpoint="generate",le="0.01"} 0' in lines
+    assert 'test_request_latency_seconds_bucket{model="llama3",endpoint="generate",le="0.025"} 1' in lines
+    assert 'test_request_latency_seconds_bucket{model="llama3",endpoint="generate",le="0.5"} 2' in lines
+    assert 'test_request_latency_seconds_bucket{model="llama3",endpoint="generate",le="+Inf"} 2' in lines
+    assert 'test_request_latency_seconds_count{model="llama3",endpoint="generate"} 2' in lines
+    assert any(line.startswith('test_request_latency_seconds_sum{model="llama3",endpoint="generate"} 0.32')
+               for line in lines)
+    # Series without observations are left out
+    assert not any(line.startswith("test_cache_hits_total{") for line in lines)
+    assert "# EOF" not in lines
+
+
+def test_openmetrics_exposition(registry):
+    lines = registry.render(openmetrics=True).splitlines()
+    # OpenMetrics names the family without the _total suffix its samples carry
+    assert "# TYPE test_retries counter" in lines
+    assert 'test_retries_total{model="llama3",endpoint="tags"} 3.0' in lines
+    assert lines[-1] == "# EOF"
+
+
+def test_label_escaping():
+    registry = MetricsRegistry(prefix="test")
+    registry.errors.inc('say "hi"\\\n', "generate")
+    assert 'test_errors_total{model="say \\"hi\\"\\\\\\n",endpoint="generate"} 1.0' in registry.render()
+
+
+def test_textfile(registry, tmp_path):
+    path = tmp_path / "collector" / "ollama.prom"
+    registry.write_textfile(str(path))
+    assert path.read_text() == registry.render()
+    # Written through a temporary file that is renamed into place
+    assert [p.name for p in path.parent.iterdir()] == ["ollama.prom"]
+
+
+def test_exporter_negotiates_format(registry):
+    exporter = MetricsExporter(registry, port=0).start()
+    try:
+        assert registry.enabled
+        url = f"http://127.0.0.1:{exporter.port}/metrics"
+        with urllib.request.urlopen(url) as response:
+            assert response.headers["Content-Type"] == PROMETHEUS_CONTENT_TYPE
+            assert response.read().decode() == registry.render()
+        request = urllib.request.Request(url, headers={"Accept": "application/openmetrics-text; version=1.0.0"})
+        with urllib.request.urlopen(request) as response:
+            assert response.headers["Content-Type"] == OPENMETRICS_CONTENT_TYPE
+            assert response.read().decode().endswith("# EOF\n")
+    finally:
+        exporter.stop()
+
+
+def test_retries_are_counted(run, enabled):
+    server = start_mock(run, MockConfig(failures=2))
+    api = OllamaAPI(base_url=server.base_url, retry=RetryPolicy(base_delay=0.01))
+    retries = enabled.retries.value("", "tags")
+    errors = enabled.errors.value("", "tags")
+    generate_retries = enabled.retries.value("mock", "generate")
+    try:
+        assert run(api.list_models())
+        assert enabled.retries.value("", "tags") == retries + 2
+        assert enabled.errors.value("", "tags") == errors + 2
+        # Generations are never retried, so they never count as retries
+        server.config.failures = 1
+        with pytest.raises(OllamaAPIError):
+            run(api.generate(prompt="x", model="mock"))
+        assert enabled.retries.value("mock", "generate") == generate_retries
+    finally:
+        run(api.session.close())
+        run(server.stop())
+
+
+def test_connection_failures_are_retried(run, enabled):
+    # Nothing listens on the port any more, so every attempt fails to connect
+    server = start_mock(run, MockConfig())
+    run(server.stop())
+    api = OllamaAPI(base_url=server.base_url, retry=RetryPolicy(max_tries=3, base_delay=0.01))
+    retries = enabled.retries.value("", "tags")
+    try:
+        with pytest.raises(OllamaAPIError):
+            run(api.list_models())
+        assert enabled.retries.value("", "tags") == retries + 2
+    finally:
+        run(api.session.close())
@@ -0,0 +1,40 @@
+# benchmarks/test_ndjson.py
+import json
+
+import pytest
+
+from utils.ndjson import NDJSONDecoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKENDS = [pytest.param(json.loads, id="json")]
+if orjson:
+    BACKENDS.append(pytest.param(orjson.loads, id="orjson"))
+
+
+def _stream_bytes(tokens: int) -> bytes:
+    lines = [
+        json.dumps({"model": "mock", "created_at": "2024-01-01T00:00:00Z", "response": f"tok{i} ", "done": False})
+        for i in range(tokens)
+    ]
+    return ("\n".join(lines) + "\n").encode()
+
+
+@pytest.mark.parametrize("loads", BACKENDS)
+@pytest.mark.parametrize("read_size", [17, 4096])
+def test_decoder_throughput(benchmark, loads, read_size):
+    # Odd read sizes split lines (and records) across chunk boundaries
+    payload = _stream_bytes(5000)
+    reads = [payload[i:i + read_size] for i in range(0, len(payload), read_size)]
+
+    def decode():
+        decoder = NDJSONDecoder(loads)
+        count = 0
+        for data in reads:
+            count += len(decoder.feed(data))
+        return count + len(decoder.flush())
+
+    assert benchmark(decode) == 5000
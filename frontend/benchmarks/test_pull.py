@@ -0,0 +1,120 @@
+# benchmarks/test_pull.py
+import asyncio
+
+import pytest
+
+from conftest import start_mock
+from models.pull_manager import PullManager
+from utils.api_client import OllamaAPI
+from utils.metrics import metrics
+from utils.mock_server import MockConfig
+
+LAYER_SIZE = 1000
+
+
+@pytest.fixture
+def pulls(run):
+    """Factory for a PullManager against its own mock server"""
+    started = []
+
+    def create(**config):
+        server = start_mock(run, MockConfig(pull_layer_size=LAYER_SIZE, pull_steps=10, **config))
+        api = OllamaAPI(base_url=server.base_url)
+        started.append((server, api))
+        snapshots = []
+        manager = PullManager(api, retry_delay=0.01, update_interval=0,
+                              on_update=lambda status: snapshots.append((status.state, status.completed)))
+        return server, manager, snapshots
+
+    yield create
+    for server, api in started:
+        if api.session:
+            run(api.session.close())
+        run(server.stop())
+
+
+def test_pull(run, pulls):
+    _, manager, _ = pulls()
+    status = run(manager.pull("mistral"))
+    assert status.state == "done" and status.attempts == 1
+    assert status.completed == status.total == 2 * LAYER_SIZE
+    assert status.fraction == 1.0
+    assert manager.statuses["mistral"] is status
+
+
+def test_interrupted_pull_resumes(run, pulls):
+    _, manager, snapshots = pulls(pull_drops=2)
+    was_enabled, metrics.enabled = metrics.enabled, True
+    retries = metrics.retries.value("mistral", "pull")
+    try:
+        status = run(manager.pull("mistral"))
+        assert metrics.retries.value("mistral", "pull") == retries + 2
+    finally:
+        metrics.enabled = was_enabled
+
+    assert status.state == "done" and status.attempts == 3 and status.error is None
+    assert status.completed == 2 * LAYER_SIZE
+    states = [state for state, _ in snapshots]
+    assert states.count("retrying") == 2 and states[-1] == "done"
+    # Each attempt picks up where the previous one was cut off instead of starting over
+    first_retry = states.index("retrying")
+    assert min(completed for _, completed in snapshots[first_retry:]) >= LAYER_SIZE // 2
+
+
+def test_pull_gives_up_after_max_attempts(run, pulls):
+    server, manager, _ = pulls(pull_drops=10)
+    manager.max_attempts = 2
+    status = run(manager.pull("mistral"))
+    assert status.state == "failed" and status.attempts == 2
+    assert status.error
+    assert server.request_count == 2
+
+
+def test_refused_pull_is_retried(run, pulls):
+    _, manager, _ = pulls(failures=1)
+    status = run(manager.pull("mistral"))
+    assert status.state == "done" and status.attempts == 2
+
+
+def test_duplicate_pull_awaits_running_one(run, pulls):
+    server, manager, _ = pulls(token_rate=200)
+
+    async def pull_twice():
+        first = asyncio.ensure_future(manager.pull("mistral"))
+        await asyncio.sleep(0.02)
+        assert manager.statuses["mistral"].state == "pulling"
+        return await asyncio.gather(first, manager.pull("mistral"))
+
+    first, second = run(pull_twice())
+    assert first is second
+    assert second.state == "done"
+    assert server.request_count == 1
+
+    # Once finished, pulling again starts a new download
+    assert run(manager.pull("mistral")) is not first
+    assert server.request_count == 2
+
+
+def test_cancelled_caller_leaves_shared_pull_running(run, pulls):
+    server, manager, _ = pulls(token_rate=200)
+
+    async def cancel_one():
+        first = asyncio.ensure_future(manager.pull("mistral"))
+        second = asyncio.ensure_future(manager.pull("mistral"))
+        await asyncio.sleep(0.02)
+        first.cancel()
+        return await second
+
+    status = run(cancel_one())
+    assert status.state == "done"
+    assert server.request_count == 1
+
+
+def test_pull_many_is_bounded(run, pulls):
+    _, manager, _ = pulls(token_rate=2000)
+    manager.max_concurrent = 1
+    statuses = run(manager.pull_many(["a", "b", "a"]))
+    assert [status.model for status in statuses] == ["a", "b"]
+    assert all(status.state == "done" for status in statuses)
+    # With one slot the second model stays queued until the first is done
+    assert statuses[1].started_at >= statuses[0].finished_at
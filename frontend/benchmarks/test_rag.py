@@ -0,0 +1,56 @@
+# benchmarks/test_rag.py
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from core.pipeline import ChatRequest
+from rag.packer import ContextPacker, estimate_tokens
+from workloads import rag_pipeline, synthetic_corpus
+
+
+@pytest.mark.parametrize("corpus_size", [100, 1000, 10000])
+def test_process_with_rag_retrieval(benchmark, corpus_size):
+    pipeline = rag_pipeline(synthetic_corpus(corpus_size))
+    # A query whose terms never match forces a scan of the whole corpus
+    prompt = benchmark(pipeline.retrieve, ChatRequest("unmatched zebra question", "bench"))
+    assert prompt == "unmatched zebra question"
+
+
+@pytest.mark.parametrize("corpus_size", [100, 1000, 10000])
+def test_process_with_rag_hit(benchmark, corpus_size):
+    pipeline = rag_pipeline(synthetic_corpus(corpus_size))
+    prompt = benchmark(pipeline.retrieve, ChatRequest("retrieval latency", "bench"))
+    assert "relevant contexts" in prompt
+
+
+@pytest.mark.parametrize("corpus_size", [1000, 10000])
+def test_process_with_rag_prefetched(benchmark, corpus_size):
+    pipeline = rag_pipeline(synthetic_corpus(corpus_size), cache=True)
+    # The draft was retrieved while typing; Send only differs in case and punctuation
+    pipeline.knowledge.prefetch("retrieval latency")
+    prompt = benchmark(pipeline.retrieve, ChatRequest("Retrieval latency?", "bench"))
+    assert "relevant contexts" in prompt
+
+
+@pytest.mark.parametrize("corpus_size", [1000, 10000])
+def test_pack_context(benchmark, corpus_size):
+    pipeline = rag_pipeline(synthetic_corpus(corpus_size, words_per_doc=600))
+    results = pipeline.knowledge.retriever.search("retrieval latency window")
+    budget = pipeline.packer.budget(4096, 2000, "retrieval latency window")
+    packed = benchmark(pipeline.packer.pack, results, budget, 10)
+    assert 0 < packed.tokens <= budget
+
+
+def test_token_cache_shared_across_threads():
+    # Requests prepare their turns on worker threads that share the pipeline's packer
+    packer = ContextPacker(cache_size=8)
+    texts = [f"chunk {i} " * (i + 1) for i in range(32)]
+
+    def count(worker):
+        return [packer.count_tokens(f"doc:{(worker + i) % 32}", texts[(worker + i) % 32]) for i in range(5000)]
+
+    with ThreadPoolExecutor(8) as pool:
+        counts = list(pool.map(count, range(8)))
+    for worker, values in enumerate(counts):
+        assert values == [estimate_tokens(texts[(worker + i) % 32]) for i in range(5000)]
+    assert len(packer._token_cache) <= 8
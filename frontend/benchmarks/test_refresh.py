@@ -0,0 +1,120 @@
+# benchmarks/test_refresh.py
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from core.ingestion import ingest_url
+from core.knowledge import KnowledgeStore
+from core.refresh import SourceRefresher
+
+
+class Site:
+    """Pages served with ETags, answering If-None-Match with 304 like a real server"""
+
+    def __init__(self):
+        self.pages = {
+            "index": ("<p>The vector index answers nearest-neighbour queries.</p>", '"v1"'),
+            "bread": ("<p>Sourdough needs a long, cool fermentation.</p>", '"v1"'),
+        }
+        self.requests = []
+
+    async def handle(self, request: web.Request) -> web.Response:
+        name = request.match_info["name"]
+        self.requests.append((name, request.headers.get("If-None-Match")))
+        if name not in self.pages:
+            raise web.HTTPNotFound()
+        html, etag = self.pages[name]
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(text=f"<html><body>{html}</body></html>", content_type="text/html",
+                            headers={"ETag": etag})
+
+
+@pytest.fixture
+def site(run):
+    site = Site()
+
+    async def start():
+        app = web.Application()
+        app.router.add_get("/{name}", site.handle)
+        server = TestServer(app)
+        await server.start_server()
+        return server
+
+    server = run(start())
+    site.url = lambda name: str(server.make_url(f"/{name}"))
+    yield site
+    run(server.close())
+
+
+@pytest.fixture
+def store(run, site):
+    store = KnowledgeStore()
+    # requests blocks, and the site is served by the same loop
+    for name in ("index", "bread"):
+        run(asyncio.to_thread(ingest_url, store, site.url(name)))
+    site.requests.clear()
+    return store
+
+
+def state(store, entry):
+    return entry.content, entry.added, store.retriever.document_chunks(entry.id)
+
+
+def test_unchanged_page_is_left_alone(run, site, store):
+    before = [state(store, entry) for entry in store.entries]
+    version = store.hybrid.results.version
+
+    report = run(SourceRefresher(store).refresh())
+
+    assert (report.checked, report.unchanged, report.changed) == (2, 2, 0)
+    # Revalidated with the ETag each page was served with, and answered 304
+    assert sorted(site.requests) == [("bread", '"v1"'), ("index", '"v1"')]
+    assert [state(store, entry) for entry in store.entries] == before
+    # Nothing was re-indexed, so cached searches stay valid
+    assert store.hybrid.results.version == version
+    assert all("checked_at" in entry.metadata for entry in store.entries)
+
+
+def test_changed_page_is_rechunked_alone(run, site, store):
+    index, bread = store.entries
+    before = state(store, bread)
+    site.pages["index"] = ("<p>The vector index now uses product quantisation.</p>", '"v2"')
+
+    report = run(SourceRefresher(store).refresh())
+
+    assert (report.checked, report.unchanged, report.changed) == (2, 1, 1)
+    assert store.entries == [index, bread]
+    assert "product quantisation" in index.content
+    assert index.metadata["etag"] == '"v2"'
+    assert state(store, bread) == before
+    results, _ = store.search("product quantisation")
+    assert results and results[0][0].doc_id == index.id
+
+    # The next refresh revalidates with the new ETag
+    site.requests.clear()
+    report = run(SourceRefresher(store).refresh())
+    assert report.unchanged == 2
+    assert ("index", '"v2"') in site.requests
+
+
+def test_new_etag_with_same_text_is_not_rechunked(run, site, store):
+    index, _ = store.entries
+    before = state(store, index)
+    html, _ = site.pages["index"]
+    site.pages["index"] = (html, '"v2"')
+
+    report = run(SourceRefresher(store).refresh())
+
+    assert (report.unchanged, report.changed) == (2, 0)
+    assert state(store, index) == before
+    assert index.metadata["etag"] == '"v2"'
+
+
+def test_gone_page_is_removed(run, site, store):
+    del site.pages["bread"]
+    report = run(SourceRefresher(store).refresh())
+    assert (report.removed, report.unchanged) == (1, 1)
+    assert [entry.source for entry in store.entries] == [f"URL: {site.url('index')}"]
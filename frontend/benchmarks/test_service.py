@@ -0,0 +1,132 @@
+# benchmarks/test_service.py
+import json
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from core.knowledge import KnowledgeStore
+from core.pipeline import ChatPipeline
+from core.service import ChatService
+from utils.metrics import MetricsRegistry
+
+TOKENS = "".join(f"tok{i} " for i in range(64))  # what the mock server generates
+
+
+@pytest.fixture
+def service(api):
+    knowledge = KnowledgeStore()
+    knowledge.add("The vector index answers nearest-neighbour queries in a few milliseconds.", "index.md")
+    knowledge.add("Sourdough needs a long, cool fermentation.", "bread.md")
+    return ChatService(ChatPipeline(api, knowledge), "mock", registry=MetricsRegistry())
+
+
+@pytest.fixture
+def client(run, service):
+    async def start():
+        client = TestClient(TestServer(service.create_app()))
+        await client.start_server()
+        return client
+
+    client = run(start())
+    yield client
+    run(client.close())
+
+
+def events(body: str):
+    """(event, data) pairs of a Server-Sent Events body"""
+    parsed = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        parsed.append((fields["event"], json.loads(fields["data"])))
+    return parsed
+
+
+def chat(run, client, **body):
+    async def post():
+        response = await client.post("/chat", json=body)
+        return response, await response.text()
+    return run(post())
+
+
+def get_json(run, client, path, **params):
+    async def get():
+        response = await client.get(path, params=params)
+        return response.status, await response.json()
+    return run(get())
+
+
+def test_chat_streams_reply(run, client, service):
+    response, body = chat(run, client, message="How fast is the vector index?", session="s1")
+    assert response.status == 200
+    assert response.headers["Content-Type"] == "text/event-stream"
+    assert response.headers["X-Session-Id"] == "s1"
+
+    parsed = events(body)
+    assert {event for event, _ in parsed[:-1]} == {"token"}
+    assert "".join(data["text"] for _, data in parsed[:-1]) == TOKENS
+    event, done = parsed[-1]
+    assert event == "done"
+    assert done["session"] == "s1" and done["success"] and done["eval_count"] == 64
+    assert [turn.role for turn in service.sessions["s1"].turns] == ["user", "assistant"]
+
+
+def test_chat_keeps_history_per_session(run, client, service):
+    chat(run, client, message="first", session="s1")
+    chat(run, client, message="second", session="s1")
+    response, _ = chat(run, client, message="other")
+    assert len(service.sessions["s1"].turns) == 4
+    # A request without a session id gets a fresh one
+    assert response.headers["X-Session-Id"] != "s1"
+    assert len(service.sessions) == 2
+
+
+def test_chat_rejects_invalid_requests(run, client):
+    response, body = chat(run, client, model="mock")
+    assert response.status == 400 and "Invalid chat request" in json.loads(body)["error"]
+    response, body = chat(run, client, message="   ")
+    assert response.status == 400 and json.loads(body)["error"] == "Empty message"
+    response, _ = chat(run, client, message="hi", context_size="many")
+    assert response.status == 400
+
+
+def test_chat_reports_generation_errors(run, client, mock_server):
+    mock_server.config.failures = 1
+    response, body = chat(run, client, message="hello", session="s1")
+    assert response.status == 200
+    event, data = events(body)[-1]
+    assert event == "error" and data["session"] == "s1" and data["error"]
+
+
+def test_search(run, client):
+    status, body = get_json(run, client, "/search", q="vector index queries", limit="1")
+    assert status == 200
+    assert len(body["results"]) == 1
+    result = body["results"][0]
+    assert result["source"] == "index.md" and "nearest-neighbour" in result["text"]
+    assert result["score"] > 0
+    assert set(body["timings"]) >= {"lexical", "vector", "fusion", "total", "cached"}
+
+
+def test_search_rejects_invalid_requests(run, client):
+    status, body = get_json(run, client, "/search")
+    assert status == 400 and body["error"] == "Missing query parameter 'q'"
+    status, _ = get_json(run, client, "/search", q="index", limit="ten")
+    assert status == 400
+
+
+def test_documents_and_sessions(run, client):
+    status, body = get_json(run, client, "/documents")
+    assert status == 200
+    assert [doc["source"] for doc in body["documents"]] == ["index.md", "bread.md"]
+
+    async def delete(path):
+        response = await client.delete(path)
+        return response.status
+
+    assert run(delete(f"/documents/{body['documents'][1]['id']}")) == 200
+    status, body = get_json(run, client, "/health")
+    assert status == 200 and body["documents"] == 1
+
+    chat(run, client, message="hello", session="s1")
+    assert run(delete("/sessions/s1")) == 200
+    assert run(delete("/sessions/s1")) == 404
@@ -0,0 +1,73 @@
+# benchmarks/test_snapshot.py
+import shutil
+
+import pytest
+
+from core.knowledge import KnowledgeStore
+from core.snapshot import KnowledgeSnapshots
+from workloads import synthetic_corpus
+
+QUERIES = ["model latency window", "vector index query", "socket buffer thread cache"]
+
+
+def open_store(directory):
+    snapshots = KnowledgeSnapshots(directory, verify=False)
+    store = KnowledgeStore(segment=snapshots.segment())
+    snapshots.load(store)
+    return snapshots, store
+
+
+def results(store):
+    return [[(chunk.id, round(score, 6)) for chunk, score in store.retriever.search(query)] for query in QUERIES]
+
+
+@pytest.fixture(scope="module", params=[200, 1000], ids=["200-docs", "1000-docs"])
+def saved(request, tmp_path_factory):
+    corpus = synthetic_corpus(request.param, words_per_doc=600)
+    directory = str(tmp_path_factory.mktemp("knowledge"))
+    snapshots, store = open_store(directory)
+    for entry in corpus:
+        store.add(entry["content"], entry["source"])
+    snapshots.save(store)
+    return corpus, directory, results(store)
+
+
+def test_cold_start(benchmark, saved):
+    corpus, directory, expected = saved
+    _, store = benchmark(open_store, directory)
+    store._dedup_ready.wait()
+    assert len(store) == len(corpus)
+    assert results(store) == expected
+
+
+def test_rebuild(benchmark, saved):
+    # What a start without snapshots costs: ingesting every document again
+    corpus, _, expected = saved
+
+    def rebuild():
+        store = KnowledgeStore()
+        for entry in corpus:
+            store.add(entry["content"], entry["source"])
+        return store
+
+    store = benchmark.pedantic(rebuild, rounds=3)
+    assert results(store) == expected
+
+
+def test_save_delta(benchmark, saved, tmp_path):
+    corpus, directory, _ = saved
+    # A copy, so the other benchmarks keep loading the base alone
+    directory = shutil.copytree(directory, str(tmp_path / "knowledge"))
+    snapshots, store = open_store(directory)
+    extra = synthetic_corpus(10, words_per_doc=600, seed=7)
+
+    def change():
+        # A few new documents since the last save, as between two periodic saves
+        for entry in extra:
+            store.add(entry["content"], entry["source"])
+        return snapshots.save(store)
+
+    info = benchmark.pedantic(change, rounds=1, iterations=1)
+    benchmark.extra_info["delta_kb"] = info.size / 1024
+    assert info.kind == "delta"
+    assert info.size < sum(f["size"] for f in snapshots.base["files"].values()) / 4
@@ -0,0 +1,86 @@
+# benchmarks/test_watchdog.py
+import heapq
+import itertools
+import os
+import time
+
+import pytest
+
+from utils.watchdog import ProfilerToggle, UIWatchdog
+
+
+class FakeRoot:
+    """Just enough of Tk's after() scheduler, run on the calling (main) thread"""
+
+    def __init__(self):
+        self._queue = []
+        self._order = itertools.count()
+
+    def after(self, ms, callback, *args):
+        heapq.heappush(self._queue, (time.perf_counter() + ms / 1000.0, next(self._order), callback, args))
+
+    def run_for(self, seconds):
+        until = time.perf_counter() + seconds
+        while time.perf_counter() < until:
+            if self._queue and self._queue[0][0] <= time.perf_counter():
+                _, _, callback, args = heapq.heappop(self._queue)
+                callback(*args)
+            else:
+                time.sleep(0.001)
+
+
+def blocking_handler(seconds):
+    time.sleep(seconds)
+
+
+@pytest.fixture
+def watchdog():
+    root = FakeRoot()
+    watchdog = UIWatchdog(root, interval_ms=20, stall_threshold=0.1).start()
+    yield root, watchdog
+    watchdog.stop()
+
+
+def test_responsive_loop_has_no_stalls(watchdog):
+    root, watchdog = watchdog
+    root.run_for(0.3)
+    stats = watchdog.stats()
+    assert len(watchdog.lags) >= 5
+    assert stats["stalls"] == 0
+    assert stats["max"] < 0.1
+
+
+def test_stalled_loop_trips_watchdog(watchdog):
+    root, watchdog = watchdog
+    root.run_for(0.1)
+    root.after(0, blocking_handler, 0.4)
+    # The stall is reported once the heartbeat comes back
+    root.run_for(0.6)
+
+    assert len(watchdog.stalls) == 1
+    stall = watchdog.stalls[0]
+    assert 0.2 < stall.duration < 0.6
+    # The stack was captured while the main thread was still blocked
+    assert "blocking_handler" in "".join(stall.stack)
+    assert stall.culprit.endswith("in blocking_handler")
+    stats = watchdog.stats()
+    assert stats["stalls"] == 1 and stats["max"] >= 0.3
+
+
+@pytest.mark.parametrize("mode, suffix", [("cprofile", ".prof"), ("sampling", ".folded")])
+def test_profiler_toggle(tmp_path, mode, suffix):
+    profiler = ProfilerToggle(str(tmp_path))
+    profiler.start(mode)
+    assert profiler.active
+    blocking_handler(0.05)
+    path = profiler.stop()
+    assert not profiler.active
+    assert path.endswith(suffix) and os.path.getsize(path)
+    if mode == "sampling":
+        with open(path) as f:
+            assert "blocking_handler" in f.read()
+
+
+def test_profiler_rejects_unknown_mode(tmp_path):
+    with pytest.raises(ValueError):
+        ProfilerToggle(str(tmp_path)).start("perf")
@@ -0,0 +1,70 @@
+# benchmarks/workloads.py
+import random
+import time
+import zlib
+
+import numpy as np
+
+from core.knowledge import KnowledgeStore
+from core.pipeline import ChatPipeline
+
+WORDS = [
+    "model", "token", "latency", "context", "window", "vector", "index", "query",
+    "stream", "chunk", "server", "client", "python", "ollama", "prompt", "answer",
+    "document", "retrieval", "cache", "memory", "thread", "socket", "buffer", "queue",
+]
+
+
+def rag_pipeline(corpus, cache=False) -> ChatPipeline:
+    """The app's chat pipeline over a synthetic knowledge base, without a server or database"""
+    # Without the cache every call measures a full search
+    knowledge = KnowledgeStore(cache_entries=128 if cache else 0)
+    for entry in corpus:
+        knowledge.add(entry["content"], entry["source"])
+    return ChatPipeline(api=None, knowledge=knowledge)
+
+
+def synthetic_corpus(size: int, words_per_doc: int = 200, seed: int = 1234):
+    """Knowledge-base entries shaped like KnowledgeStore.add produces"""
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(size):
+        content = " ".join(rng.choice(WORDS) for _ in range(words_per_doc))
+        corpus.append({
+            "id": i + 1,
+            "content": content,
+            "source": f"File: doc{i}.txt",
+            "size": len(content),
+        })
+    return corpus
+
+
+def synthetic_question(rng: random.Random, length: int = 6) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(length)) + "?"
+
+
+def synthetic_vectors(size: int, dim: int = 64, clusters: int = 200, spread: float = 0.35, seed: int = 1234):
+    """Embedding-like vectors: points scattered around cluster centres, as topics are"""
+    rng = np.random.RandomState(seed)
+    centres = rng.randn(clusters, dim)
+    return (centres[rng.randint(0, clusters, size)] + spread * rng.randn(size, dim)).astype(np.float32)
+
+
+class SyntheticEmbedder:
+    """Stands in for Embedder: hashed bag-of-words vectors, after a fixed delay per request like a server round trip"""
+    model = "synthetic"
+
+    def __init__(self, dim: int = 64, delay: float = 0.0):
+        self.dim = dim
+        self.delay = delay
+
+    def embed(self, texts):
+        time.sleep(self.delay)
+        vectors = np.full((len(texts), self.dim), 0.01, dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, zlib.crc32(word.encode()) % self.dim] += 1
+        return vectors
+
+    def embed_query(self, text: str):
+        return self.embed([text])[0]
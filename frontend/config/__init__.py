@@ -1,4 +1,3 @@
-__init__.py
 from .settings import Settings
 
 __all__ = ['Settings']
\ No newline at end of file
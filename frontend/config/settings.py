@@ -7,14 +7,87 @@ class Settings:
         self.config_file = 'config/config.json'
         self.default_settings = {
             'api_base': 'http://localhost:11434/api',
+            'api': {
+                'connect_timeout': 5,
+                'first_byte_timeout': 30,
+                'request_timeout': 30,
+                'generation_timeout': 600,
+                'max_tries': 3,
+                'hedge_percentile': 0,
+                'breaker_threshold': 5,
+                'breaker_reset': 30
+            },
             'default_model': 'llama2-3.2-vision:latest',
             'temperature': 0.7,
             'max_tokens': 2000,
+            'max_concurrent_pulls': 2,
             'db_path': 'data/ollama_gui.db',
             'rag_settings': {
                 'chunk_size': 1000,
                 'chunk_overlap': 200,
-                'similarity_threshold': 0.7
+                'similarity_threshold': 0.5,
+                'retrieval_candidates': 50,
+                'rrf_k': 60,
+                'dedup_threshold': 0.85,
+                'segment_dir': '',
+                'compress_text': False,
+                'embedding_model': '',
+                'vector_index': {
+                    'kind': 'ivf',
+                    'nlist': 0,
+                    'nprobe': 8,
+                    'storage': 'float32',
+                    'rerank': 64
+                }
+            },
+            'snapshots': {
+                'enabled': True,
+                'directory': 'data/knowledge',
+                'save_interval_minutes': 10,
+                'delta_ratio': 0.25,
+                'verify': True
+            },
+            'refresh': {
+                'enabled': True,
+                'interval_hours': 24,
+                'concurrency': 4
+            },
+            'vision': {
+                'max_side': 1120,
+                'quality': 85,
+                'cache_entries': 64,
+                'ocr_fallback': True
+            },
+            'prefetch': {
+                'enabled': True,
+                'debounce_ms': 300,
+                'warm_model': True,
+                'keep_alive': '10m'
+            },
+            'compaction': {
+                'enabled': True,
+                'history_budget': 1024,
+                'keep_recent_turns': 4,
+                'model': '',
+                'max_summary_tokens': 256,
+                'max_wait': 1.0
+            },
+            'server': {
+                'host': '127.0.0.1',
+                'port': 8080,
+                'max_sessions': 1000
+            },
+            'metrics': {
+                'enabled': False,
+                'host': '127.0.0.1',
+                'port': 9464,
+                'textfile': ''
+            },
+            'diagnostics': {
+                'watchdog': True,
+                'lag_interval_ms': 100,
+                'stall_threshold_ms': 250,
+                'profile_dir': 'data/profiles'
             }
         }
         self.current_settings = self.load_settings()
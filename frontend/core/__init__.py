@@ -0,0 +1,12 @@
+from .knowledge import Document, IngestReport, KnowledgeStore
+from .pipeline import ChatPipeline, ChatRequest, ChatTurn
+from .images import EncodedImage, ImageEncoder
+from .ingestion import Page, fetch_page, ingest_file, ingest_url, read_file
+from .refresh import RefreshReport, SourceRefresher
+from .snapshot import KnowledgeSnapshots, SnapshotInfo
+
+__all__ = [
+    'Document', 'IngestReport', 'KnowledgeStore', 'ChatPipeline', 'ChatRequest', 'ChatTurn',
+    'Page', 'fetch_page', 'ingest_file', 'ingest_url', 'read_file', 'RefreshReport', 'SourceRefresher',
+    'EncodedImage', 'ImageEncoder', 'KnowledgeSnapshots', 'SnapshotInfo'
+]
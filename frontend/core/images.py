@@ -0,0 +1,125 @@
+# core/images.py
+import base64
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from PIL import Image, ImageOps
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp')
+
+# EXIF tag holding the camera orientation
+ORIENTATION = 0x0112
+
+
+@dataclass
+class EncodedImage:
+    """An image ready for the `images` field of /api/generate"""
+    digest: str            # sha256 of the original file
+    data: str              # base64 payload
+    source: str
+    width: int
+    height: int
+    original_size: int     # bytes before re-encoding
+    path: Optional[str] = None
+
+    @property
+    def payload_size(self) -> int:
+        return len(self.data)
+
+    def summary(self) -> str:
+        return (f"{self.source} ({self.width}x{self.height}, "
+                f"{self.original_size / 1024:.0f} KB -> {self.payload_size / 1024:.0f} KB)")
+
+
+class ImageEncoder:
+    def __init__(self, max_side: int = 1120, quality: int = 85, cache_entries: int = 64):
+        """
+        Downscale and re-encode images for vision models, once per image.
+
+        Vision models resize their input to a fixed resolution anyway
+        (1120 px covers llama3.2-vision's largest tiling), so anything
+        bigger only inflates the request. Payloads are cached by content
+        hash: the same photo attached again, or a chat re-sent to another
+        model, is not decoded twice. Blocking; run off the UI thread.
+
+        Args:
+            max_side: Longest side sent to the model, in pixels
+            quality: JPEG quality of the re-encoded image
+            cache_entries: Encoded images remembered
+        """
+        self.max_side = max_side
+        self.quality = quality
+        self.cache_entries = cache_entries
+        self._cache: "OrderedDict[str, EncodedImage]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def encode(self, file_path: str) -> EncodedImage:
+        with open(file_path, 'rb') as f:
+            raw = f.read()
+        return self.encode_bytes(raw, os.path.basename(file_path), file_path)
+
+    def encode_bytes(self, raw: bytes, source: str = "image", path: Optional[str] = None) -> EncodedImage:
+        digest = hashlib.sha256(raw).hexdigest()
+        with self._lock:
+            cached = self._cache.get(digest)
+            if cached is not None:
+                self._cache.move_to_end(digest)
+                return cached
+
+        data, width, height = self._shrink(raw)
+        image = EncodedImage(digest, base64.b64encode(data).decode('ascii'), source,
+                             width, height, len(raw), path)
+        with self._lock:
+            self._cache[digest] = image
+            if len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        return image
+
+    def _shrink(self, raw: bytes):
+        img = Image.open(io.BytesIO(raw))
+        original_format = img.format
+        # Models do not apply EXIF rotation, so a rotated original cannot be sent as is
+        upright = img.getexif().get(ORIENTATION, 1) == 1
+        resized = max(img.size) > self.max_side
+        size = (self.max_side, self.max_side)
+        # JPEG can decode straight at 1/2, 1/4 or 1/8 scale, far cheaper than full size
+        img.draft('RGB', size)
+        img = ImageOps.exif_transpose(img)
+        if max(img.size) > self.max_side:
+            img.thumbnail(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+        if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+            # JPEG has no alpha; flatten onto white like a viewer would show it
+            background = Image.new('RGB', img.size, 'white')
+            background.paste(img, mask=img.convert('RGBA').getchannel('A'))
+            img = background
+        elif img.mode != 'RGB':
+            img = img.convert('RGB')
+
+        out = io.BytesIO()
+        img.save(out, 'JPEG', quality=self.quality, optimize=True)
+        data = out.getvalue()
+        # A small screenshot is often smaller, and sharper, as the original PNG
+        if upright and not resized and original_format in ('JPEG', 'PNG') and len(raw) <= len(data):
+            data = raw
+        return data, img.width, img.height
+
+
+def image_text(image: EncodedImage) -> Optional[str]:
+    """OCR text of an image for models that cannot see it; None without pytesseract"""
+    if pytesseract is None:
+        return None
+    if image.path and os.path.exists(image.path):
+        img = Image.open(image.path)
+    else:
+        img = Image.open(io.BytesIO(base64.b64decode(image.data)))
+    return pytesseract.image_to_string(img).strip()
@@ -0,0 +1,161 @@
+# core/ingestion.py
+import hashlib
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import docx
+import pandas as pd
+import PyPDF2
+import requests
+from bs4 import BeautifulSoup
+from PIL import Image
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+from utils.metrics import metrics
+from .knowledge import IngestReport, KnowledgeStore
+
+SUPPORTED_EXTENSIONS = ('.txt', '.pdf', '.docx', '.csv', '.jpg', '.jpeg', '.png')
+
+
+def read_pdf(file_path: str) -> str:
+    with open(file_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        return "\n".join(page.extract_text() for page in reader.pages)
+
+
+def read_docx(file_path: str) -> str:
+    doc = docx.Document(file_path)
+    return "\n".join(paragraph.text for paragraph in doc.paragraphs)
+
+
+def read_csv(file_path: str) -> str:
+    df = pd.read_csv(file_path)
+    return df.to_string()
+
+
+def read_image(file_path: str) -> str:
+    if pytesseract is None:
+        return "OCR not available. Please install pytesseract."
+    try:
+        img = Image.open(file_path)
+        return pytesseract.image_to_string(img)
+    except Exception as e:
+        return f"Failed to process image: {str(e)}"
+
+
+def read_text(file_path: str) -> str:
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
+        return file.read()
+
+
+def read_file(file_path: str) -> str:
+    """Extract the text of a document based on its extension"""
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == '.pdf':
+        return read_pdf(file_path)
+    if extension == '.docx':
+        return read_docx(file_path)
+    if extension == '.csv':
+        return read_csv(file_path)
+    if extension in ('.jpg', '.jpeg', '.png'):
+        return read_image(file_path)
+    return read_text(file_path)
+
+
+@dataclass
+class Page:
+    status: int
+    text: str = ""
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @property
+    def content_hash(self) -> str:
+        return content_hash(self.text)
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def extract_text(html: str) -> str:
+    """Visible text of an HTML page"""
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Clean content
+    for tag in soup(['script', 'style']):
+        tag.decompose()
+
+    text = soup.get_text(separator='\n')
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    return '\n'.join(lines)
+
+
+def fetch_page(
+    url: str,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+    timeout: float = 10
+) -> Page:
+    """
+    Download a page, conditionally when validators from an earlier fetch are given.
+
+    Returns:
+        Page with status 304 and no text when the server says it is unchanged
+    """
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    response = requests.get(url, timeout=timeout, headers=headers)
+    page = Page(
+        response.status_code,
+        etag=response.headers.get('ETag') or etag,
+        last_modified=response.headers.get('Last-Modified') or last_modified
+    )
+    if response.status_code == 200:
+        page.text = extract_text(response.text)
+    return page
+
+
+def record_ingestion(kind: str, size: int, elapsed: float) -> None:
+    if metrics.enabled and elapsed > 0:
+        metrics.ingestion_throughput.observe(size / elapsed, "", kind)
+
+
+def ingest_file(store: KnowledgeStore, file_path: str, name: Optional[str] = None) -> IngestReport:
+    """Read a document into the knowledge base. Blocking; run off the UI/event loop"""
+    started = time.perf_counter()
+    content = read_file(file_path)
+    report = store.add(content, f"File: {name or os.path.basename(file_path)}")
+    record_ingestion("file", len(content), time.perf_counter() - started)
+    return report
+
+
+def ingest_url(store: KnowledgeStore, url: str) -> IngestReport:
+    """Fetch a page into the knowledge base. Blocking; run off the UI/event loop"""
+    started = time.perf_counter()
+    page = fetch_page(url)
+    if page.status != 200:
+        raise ValueError(f"HTTP {page.status}")
+    report = store.add(page.text, f"URL: {url}", source_metadata(url, page))
+    record_ingestion("url", len(page.text), time.perf_counter() - started)
+    return report
+
+
+def source_metadata(url: str, page: Page) -> Dict[str, Any]:
+    """Entry fields the refresh job needs to revalidate a page"""
+    return {
+        'url': url,
+        'etag': page.etag,
+        'last_modified': page.last_modified,
+        'content_hash': page.content_hash,
+        'checked_at': datetime.now()
+    }
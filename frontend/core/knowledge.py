@@ -0,0 +1,661 @@
+# core/knowledge.py
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from rag.ann import VectorIndex, create_index, open_index
+from rag.cache import CachedRetriever
+from rag.dedup import NearDuplicateIndex, shingle_hashes
+from rag.embeddings import Embedder
+from rag.hybrid import HybridRetriever, RetrievalTimings
+from rag.retriever import Chunk, KeywordRetriever
+from rag.segment import SegmentFile
+
+logger = logging.getLogger(__name__)
+
+# (doc_id, chunk index) of a chunk that was not indexed; its text is re-split from the document
+DroppedChunk = Tuple[int, int]
+
+# Vector labels pack (doc_id, chunk index) into one integer
+CHUNK_BITS = 24
+
+
+def chunk_label(doc_id: int, index: int) -> int:
+    return doc_id << CHUNK_BITS | index
+
+
+def label_chunk_id(label: int) -> str:
+    return f"{label >> CHUNK_BITS}:{label & ((1 << CHUNK_BITS) - 1)}"
+
+
+class Document:
+    """A knowledge-base entry; its text stays in the segment file until asked for"""
+    __slots__ = ("id", "source", "added", "size", "chunks", "skipped", "metadata", "_segment", "_record")
+
+    def __init__(self, doc_id: int, source: str, segment: SegmentFile, content: str, metadata: Optional[Dict[str, Any]] = None):
+        self.id = doc_id
+        self.source = source
+        self.metadata: Dict[str, Any] = metadata or {}
+        self.chunks = 0
+        self.skipped = 0
+        self._segment = segment
+        self.set_content(content)
+
+    def set_content(self, content: str) -> None:
+        self._record = self._segment.append(content)
+        self.size = len(content)
+        self.added = time.time()
+
+    @property
+    def content(self) -> str:
+        return self._segment.read(*self._record)
+
+    def row(self) -> Dict[str, Any]:
+        """The entry's fields for a snapshot; the text stays where it is in the segment"""
+        return {"id": self.id, "source": self.source, "added": self.added, "size": self.size,
+                "chunks": self.chunks, "skipped": self.skipped, "record": list(self._record),
+                "metadata": self.metadata}
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any], segment: SegmentFile) -> "Document":
+        entry = cls.__new__(cls)
+        entry.id = row["id"]
+        entry.source = row["source"]
+        entry.added = row["added"]
+        entry.size = row["size"]
+        entry.chunks = row["chunks"]
+        entry.skipped = row["skipped"]
+        entry.metadata = row["metadata"]
+        entry._segment = segment
+        entry._record = tuple(row["record"])
+        return entry
+
+    @property
+    def date(self) -> datetime:
+        return datetime.fromtimestamp(self.added)
+
+
+@dataclass
+class IngestReport:
+    entry: Document
+    chunks: int = 0
+    skipped: int = 0
+    duplicate_of: List[str] = field(default_factory=list)
+
+    @property
+    def indexed(self) -> int:
+        return self.chunks - self.skipped
+
+    def summary(self) -> str:
+        if not self.skipped:
+            return f"Indexed {self.chunks} chunks from {self.entry.source}"
+        return (f"Skipped {self.skipped} of {self.chunks} chunks from {self.entry.source} "
+                f"already in the knowledge base via {', '.join(self.duplicate_of)}")
+
+
+class KnowledgeStore:
+    def __init__(
+        self,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        cache_entries: int = 128,
+        dedup_threshold: float = 0.85,
+        dedup_permutations: int = 64,
+        segment: Optional[SegmentFile] = None,
+        embedder: Optional[Embedder] = None,
+        vectors: Optional[VectorIndex] = None,
+        retrieval_candidates: int = 50,
+        rrf_k: int = 60
+    ):
+        """
+        Documents added to the knowledge base and the index searched for them.
+
+        Shared by the desktop window and the HTTP service; additions and
+        removals may come from any thread.
+
+        Document and chunk text is kept in an append-only segment file and
+        read back only when needed, so memory use follows the number of
+        chunks rather than the amount of text.
+
+        With an embedder, every indexed chunk is also embedded into a vector
+        index for similarity search. Embedding happens once the store's lock
+        is released, so a chunk is searchable by keyword first. A chunk
+        whose embedding fails stays searchable by keyword only. search()
+        runs both and fuses the rankings.
+
+        Documents and chunks that are near-copies of ones already indexed
+        (mirrors, printer-friendly pages, re-uploads) are kept aside rather
+        than indexed. They are indexed again if the original is removed.
+
+        Args:
+            chunk_size: Characters per retrieval chunk
+            chunk_overlap: Characters shared by consecutive chunks
+            cache_entries: Search results memoised, 0 disables the cache
+            dedup_threshold: Estimated Jaccard similarity of word 5-grams above
+                which a chunk is a duplicate, 0 disables deduplication
+            dedup_permutations: MinHash signature length
+            segment: File text is appended to, None for a private temporary file
+            embedder: Embeds chunks and queries, None disables similarity search
+            vectors: Index the embeddings go into, IVF if not given
+            retrieval_candidates: Results search() takes from each of keyword and vector search
+            rrf_k: Rank damping of the reciprocal-rank fusion in search()
+        """
+        self.entries: List[Document] = []
+        self.next_doc_id = 0
+        self.segment = segment or SegmentFile()
+        self.retriever = CachedRetriever(
+            KeywordRetriever(chunk_size, chunk_overlap, self.segment), max_entries=cache_entries)
+        self.dedup = None
+        self.doc_dedup = None
+        if dedup_threshold:
+            # Whole documents catch variants whose chunk boundaries don't line up
+            self.dedup = NearDuplicateIndex(dedup_threshold, dedup_permutations)
+            self.doc_dedup = NearDuplicateIndex(dedup_threshold, dedup_permutations)
+        self._dropped: Dict[str, List[DroppedChunk]] = {}
+        self._duplicate_docs: Dict[int, List[int]] = {}
+        self.embedder = embedder
+        self.vectors = None
+        if embedder is not None:
+            self.vectors = vectors if vectors is not None else create_index("ivf")
+        self.hybrid = HybridRetriever(
+            self.retriever,
+            self.similar if embedder is not None else None,
+            candidates=retrieval_candidates,
+            rrf_k=rrf_k,
+            max_entries=cache_entries
+        )
+        self._by_id: Dict[int, Document] = {}
+        self._lock = threading.RLock()
+        # Held only around index operations, so searches don't wait for embedding requests
+        self._vectors_lock = threading.Lock()
+        # Bumped by every change, so an unchanged store is not snapshotted again
+        self.revision = 0
+        # Changes since the last base snapshot, which is what a delta snapshot holds
+        self._changed_docs: Set[int] = set()
+        self._removed_docs: Set[int] = set()
+        self._added_vectors: Set[int] = set()
+        self._removed_vectors: Set[int] = set()
+        self._needs_base = False
+        # Chunks indexed but not yet embedded: (entry, vector generation, pieces). They are embedded
+        # after the lock is released, so a slow embedding request holds up neither searches nor writers
+        self._unembedded: List[Tuple[Document, int, List[Tuple[int, int, str]]]] = []
+        # Bumped when a document's vectors are dropped, so embeddings still in flight are discarded
+        self._vector_generation: Dict[int, int] = {}
+        # Cleared while the dedup indexes are rebuilt from a snapshot; ingestion waits for it
+        self._dedup_ready = threading.Event()
+        self._dedup_ready.set()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @contextmanager
+    def _changing(self):
+        """Hold the lock for a change; fused search results are dropped once it is done"""
+        with self._lock:
+            try:
+                yield
+            finally:
+                self.hybrid.invalidate()
+
+    @property
+    def skipped_chunks(self) -> int:
+        return sum(entry.skipped for entry in self.entries)
+
+    def _filter(self, doc_id: int, pieces: Iterable[Tuple[int, int, str]]) -> Tuple[list, set]:
+        """Split pieces into those to index and the documents the rest duplicate"""
+        if self.dedup is None:
+            return list(pieces), set()
+        keep, matched = [], set()
+        for index, start, text in pieces:
+            signature = self.dedup.hasher.signature(text)
+            if signature is not None:
+                match = self.dedup.find(signature)
+                if match is not None:
+                    self._dropped.setdefault(match[0], []).append((doc_id, index))
+                    # Chunk ids are "doc:index"; repeats within this document aren't indexed yet
+                    original = int(match[0].split(":")[0])
+                    if original != doc_id:
+                        matched.add(original)
+                    continue
+                self.dedup.add(f"{doc_id}:{index}", signature)
+            keep.append((index, start, text))
+        return keep, matched
+
+    def _covered(self, text: str, original: np.ndarray) -> bool:
+        hashes = shingle_hashes(text)
+        return bool(len(hashes)) and np.isin(hashes, original).mean() >= self.doc_dedup.threshold
+
+    def _index(self, entry: Document, content: str) -> set:
+        """Index an entry's chunks, returning the ids of documents it duplicates"""
+        doc_id = entry.id
+        self._changed_docs.add(doc_id)
+        pieces = self.retriever.split(content)
+        entry.chunks = len(pieces)
+        matched = set()
+        if self.doc_dedup is not None:
+            signature = self.doc_dedup.hasher.signature(content)
+            match = self.doc_dedup.find(signature) if signature is not None else None
+            if match is not None:
+                # A copy of a whole document: keep only the chunks the original doesn't contain
+                original = int(match[0])
+                self._duplicate_docs.setdefault(original, []).append(doc_id)
+                covered = shingle_hashes(self.get(original).content)
+                pieces = [piece for piece in pieces if not self._covered(piece[2], covered)]
+                matched.add(original)
+            elif signature is not None:
+                self.doc_dedup.add(str(doc_id), signature)
+        keep, chunk_matches = self._filter(doc_id, pieces)
+        entry.skipped = entry.chunks - len(keep)
+        self.retriever.add_chunks(doc_id, entry.source, keep)
+        self._embed(entry, keep)
+        return matched | chunk_matches
+
+    def _embed(self, entry: Document, pieces: List[Tuple[int, int, str]]) -> None:
+        """Queue indexed chunks for _embed_pending(); called with _lock held"""
+        if self.vectors is None or not pieces:
+            return
+        self._unembedded.append((entry, self._vector_generation.get(entry.id, 0), pieces))
+
+    def _embed_pending(self) -> None:
+        """Embed the queued chunks. Blocking; called without _lock, which is taken only to insert vectors"""
+        with self._lock:
+            pending, self._unembedded = self._unembedded, []
+        for entry, generation, pieces in pending:
+            try:
+                vectors = self.embedder.embed([text for _, _, text in pieces])
+            except Exception as e:
+                logger.warning(f"Embedding {entry.source} failed, it is searchable by keyword only: {e}")
+                continue
+            labels = [chunk_label(entry.id, index) for index, _, _ in pieces]
+            with self._changing():
+                # Removed, re-chunked or cleared while the request ran
+                if self._by_id.get(entry.id) is not entry or self._vector_generation.get(entry.id, 0) != generation:
+                    continue
+                self.revision += 1
+                with self._vectors_lock:
+                    self.vectors.add(labels, vectors)
+                    self._added_vectors.update(labels)
+
+    def _drop_vectors(self, doc_id: int) -> None:
+        if self.vectors is not None:
+            self._vector_generation[doc_id] = self._vector_generation.get(doc_id, 0) + 1
+            labels = [chunk_label(doc_id, int(chunk_id.split(":")[1]))
+                      for chunk_id in self.retriever.document_chunks(doc_id)]
+            with self._vectors_lock:
+                self.vectors.remove(labels)
+                self._added_vectors.difference_update(labels)
+                self._removed_vectors.update(labels)
+
+    def similar(self, query: str, limit: int = 10) -> List[Tuple[Chunk, float]]:
+        """Chunks nearest to the query by embedding, best first"""
+        if self.vectors is None or not len(self.vectors):
+            return []
+        vector = self.embedder.embed_query(query)
+        with self._vectors_lock:
+            labels, scores = self.vectors.search(vector, limit)
+        results = []
+        for label, score in zip(labels.tolist(), scores.tolist()):
+            chunk = self.retriever.get(label_chunk_id(label))
+            if chunk is not None:
+                results.append((chunk, score))
+        return results
+
+    def search(
+        self,
+        query: str,
+        limit: Optional[int] = None,
+        min_score: float = 0.0,
+        model: str = ""
+    ) -> Tuple[List[Tuple[Chunk, float]], RetrievalTimings]:
+        """Keyword and vector search fused by reciprocal rank, see HybridRetriever.search"""
+        return self.hybrid.search(query, limit, min_score, model)
+
+    def prefetch(self, query: str) -> None:
+        """Search ahead for a draft message so sending it finds the results ready"""
+        self.hybrid.prefetch(query)
+
+    def cached(self, query: str) -> bool:
+        """Whether search() for the query would find its results ready or in flight"""
+        return self.hybrid.cached(query)
+
+    def add(self, content: str, source: str, metadata: Optional[Dict[str, Any]] = None) -> IngestReport:
+        """
+        Add and index a document.
+
+        Args:
+            content: Document text
+            source: Label shown with the document and its chunks
+            metadata: Extra fields stored on the entry, e.g. a URL's validators
+        """
+        self._dedup_ready.wait()
+        with self._changing():
+            self.revision += 1
+            self.next_doc_id += 1
+            entry = Document(self.next_doc_id, source, self.segment, content, metadata)
+            self.entries.append(entry)
+            self._by_id[entry.id] = entry
+            matched = self._index(entry, content)
+            duplicate_of = [self._by_id[doc_id].source for doc_id in sorted(matched)]
+        self._embed_pending()
+        return IngestReport(entry, entry.chunks, entry.skipped, duplicate_of)
+
+    def update(self, doc_id: int, content: str, metadata: Optional[Dict[str, Any]] = None) -> Optional[IngestReport]:
+        """Replace a document's text and re-chunk only that document, keeping its id and position"""
+        self._dedup_ready.wait()
+        with self._changing():
+            entry = self.get(doc_id)
+            if entry is None:
+                return None
+            self.revision += 1
+            position = self.entries.index(entry)
+            self._remove({doc_id})
+            entry.metadata.update(metadata or {})
+            entry.set_content(content)
+            self.entries.insert(position, entry)
+            self._by_id[doc_id] = entry
+            matched = self._index(entry, content)
+            duplicate_of = [self._by_id[other].source for other in sorted(matched)]
+        self._embed_pending()
+        return IngestReport(entry, entry.chunks, entry.skipped, duplicate_of)
+
+    def get(self, doc_id: int) -> Optional[Document]:
+        return self._by_id.get(doc_id)
+
+    def set_metadata(self, doc_id: int, metadata: Dict[str, Any]) -> None:
+        """Update an entry's metadata without touching its text"""
+        with self._lock:
+            entry = self.get(doc_id)
+            if entry is not None:
+                entry.metadata.update(metadata)
+                self._changed_docs.add(doc_id)
+                self.revision += 1
+
+    def remove(self, doc_ids: Iterable[int]) -> int:
+        self._dedup_ready.wait()
+        removed = self._remove(set(doc_ids))
+        # Copies indexed in place of a removed original are embedded now
+        self._embed_pending()
+        return removed
+
+    def _remove(self, doc_ids: Set[int]) -> int:
+        with self._changing():
+            before = len(self.entries)
+            self.entries = [entry for entry in self.entries if entry.id not in doc_ids]
+            removed = before - len(self.entries)
+            if removed:
+                self.revision += 1
+            for doc_id in doc_ids:
+                if self._by_id.pop(doc_id, None) is not None:
+                    self._changed_docs.discard(doc_id)
+                    self._removed_docs.add(doc_id)
+
+            orphans: List[DroppedChunk] = []
+            orphan_docs: List[int] = []
+            for doc_id in doc_ids:
+                for chunk_id in self.retriever.document_chunks(doc_id):
+                    if self.dedup is not None:
+                        self.dedup.remove(chunk_id)
+                    orphans.extend(self._dropped.pop(chunk_id, []))
+                if self.doc_dedup is not None:
+                    self.doc_dedup.remove(str(doc_id))
+                orphan_docs.extend(self._duplicate_docs.pop(doc_id, []))
+                self._drop_vectors(doc_id)
+                self.retriever.remove_document(doc_id)
+            for original in list(self._duplicate_docs):
+                self._duplicate_docs[original] = [d for d in self._duplicate_docs[original] if d not in doc_ids]
+                if not self._duplicate_docs[original]:
+                    del self._duplicate_docs[original]
+            if doc_ids & {dropped[0] for chunks in self._dropped.values() for dropped in chunks}:
+                for chunk_id in list(self._dropped):
+                    remaining = [dropped for dropped in self._dropped[chunk_id] if dropped[0] not in doc_ids]
+                    if remaining:
+                        self._dropped[chunk_id] = remaining
+                    else:
+                        del self._dropped[chunk_id]
+            # Copies of a removed document become originals in their own right
+            reindexed = set()
+            for doc_id in orphan_docs:
+                entry = self.get(doc_id)
+                if entry is not None:
+                    self._unindex(doc_id)
+                    self._index(entry, entry.content)
+                    reindexed.add(doc_id)
+            self._restore([dropped for dropped in orphans if dropped[0] not in doc_ids | reindexed])
+        return removed
+
+    def _unindex(self, doc_id: int) -> None:
+        for chunk_id in self.retriever.document_chunks(doc_id):
+            self.dedup.remove(chunk_id)
+        for chunk_id in list(self._dropped):
+            self._dropped[chunk_id] = [dropped for dropped in self._dropped[chunk_id] if dropped[0] != doc_id]
+            if not self._dropped[chunk_id]:
+                del self._dropped[chunk_id]
+        self._drop_vectors(doc_id)
+        self.retriever.remove_document(doc_id)
+
+    def _restore(self, orphans: List[DroppedChunk]) -> None:
+        """Index duplicates whose original was removed, unless another copy is still indexed"""
+        by_doc: Dict[int, set] = {}
+        for doc_id, index in orphans:
+            by_doc.setdefault(doc_id, set()).add(index)
+        for doc_id, indices in by_doc.items():
+            entry = self.get(doc_id)
+            if entry is None:
+                continue
+            pieces = [piece for piece in self.retriever.split(entry.content) if piece[0] in indices]
+            keep, _ = self._filter(doc_id, pieces)
+            entry.skipped -= len(keep)
+            self._changed_docs.add(doc_id)
+            self.retriever.add_chunks(doc_id, entry.source, keep)
+            self._embed(entry, keep)
+
+    def clear(self) -> None:
+        self._dedup_ready.wait()
+        with self._changing():
+            self.revision += 1
+            self._changed_docs.clear()
+            self._removed_docs.clear()
+            self._added_vectors.clear()
+            self._removed_vectors.clear()
+            self._needs_base = True
+            self._unembedded = []
+            self.entries = []
+            self._by_id.clear()
+            self._dropped.clear()
+            self._duplicate_docs.clear()
+            if self.dedup is not None:
+                self.dedup.clear()
+                self.doc_dedup.clear()
+            if self.vectors is not None:
+                with self._vectors_lock:
+                    self.vectors.clear()
+            self.retriever.clear()
+
+    def _snapshot(self, delta: bool = False) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        """
+        Arrays and JSON fields of a base snapshot, or of a delta with the
+        changes since the last base. Called with _lock held.
+        """
+        self._dedup_ready.wait()
+        arrays = {f"retriever.{name}": array for name, array in self.retriever.snapshot(delta).items()}
+        if delta:
+            entries = [self._by_id[doc_id] for doc_id in sorted(self._changed_docs) if doc_id in self._by_id]
+        else:
+            entries = self.entries
+        fields = {
+            "next_doc_id": self.next_doc_id,
+            "documents": [entry.row() for entry in entries],
+            "removed": sorted(self._removed_docs) if delta else [],
+            "dropped": {chunk_id: [list(dropped) for dropped in chunks] for chunk_id, chunks in self._dropped.items()},
+            "duplicate_docs": {str(doc_id): copies for doc_id, copies in self._duplicate_docs.items()},
+            "chunk_size": self.retriever.retriever.chunk_size,
+            "chunk_overlap": self.retriever.retriever.chunk_overlap,
+            "embedding_model": self.embedder.model if self.embedder is not None else None,
+        }
+
+        if self.dedup is not None:
+            # Chunk signatures by slot, for the slots the retriever arrays cover
+            doc_ids = arrays["retriever.chunks.doc_ids"].tolist()
+            indices = arrays["retriever.chunks.indices"].tolist()
+            signatures = np.zeros((len(doc_ids), self.dedup.hasher.num_perm), dtype=np.uint32)
+            present = np.zeros(len(doc_ids), dtype=np.uint8)
+            for row, (doc_id, index) in enumerate(zip(doc_ids, indices)):
+                signature = self.dedup.get(f"{doc_id}:{index}")
+                if signature is not None:
+                    signatures[row] = signature
+                    present[row] = 1
+            arrays["dedup.chunks"] = signatures
+            arrays["dedup.chunks_present"] = present
+            documents = [(entry.id, self.doc_dedup.get(str(entry.id))) for entry in entries]
+            documents = [(doc_id, signature) for doc_id, signature in documents if signature is not None]
+            arrays["dedup.document_ids"] = np.array([doc_id for doc_id, _ in documents], dtype=np.int64)
+            arrays["dedup.documents"] = np.array([signature for _, signature in documents], dtype=np.uint32).reshape(
+                len(documents), self.doc_dedup.hasher.num_perm)
+
+        if self.vectors is not None:
+            with self._vectors_lock:
+                if delta:
+                    labels = sorted(self._added_vectors)
+                    arrays["vectors.added"] = np.array(labels, dtype=np.int64)
+                    arrays["vectors.vectors"] = self.vectors.get(labels)
+                    arrays["vectors.removed"] = np.array(sorted(self._removed_vectors), dtype=np.int64)
+                elif len(self.vectors):
+                    arrays.update({f"vectors.{name}": array for name, array in self.vectors._state().items()})
+        return arrays, fields
+
+    def _rebased(self, retriever: Dict[str, np.ndarray]) -> None:
+        """Start tracking changes afresh once a base snapshot is written; called with _lock held"""
+        self.retriever.restore(retriever, {entry.id: entry.source for entry in self.entries})
+        self._changed_docs.clear()
+        self._removed_docs.clear()
+        with self._vectors_lock:
+            self._added_vectors.clear()
+            self._removed_vectors.clear()
+        self._needs_base = False
+
+    def _restore_snapshot(
+        self,
+        base: Tuple[Dict[str, np.ndarray], Dict[str, Any]],
+        delta: Optional[Tuple[Dict[str, np.ndarray], Dict[str, Any]]] = None
+    ) -> None:
+        """
+        Replace the contents with a base snapshot and the delta written on
+        top of it. The arrays, normally memory-mapped, are used in place;
+        only the dedup indexes are rebuilt, on a background thread that
+        ingestion waits for.
+        """
+        arrays, fields = base
+        latest = delta[1] if delta else fields
+        with self._changing():
+            by_id = {row["id"]: Document.from_row(row, self.segment) for row in fields["documents"]}
+            if delta:
+                for doc_id in latest["removed"]:
+                    by_id.pop(doc_id, None)
+                by_id.update((row["id"], Document.from_row(row, self.segment)) for row in latest["documents"])
+            self._by_id = by_id
+            self.entries = sorted(by_id.values(), key=lambda entry: entry.id)
+            self.next_doc_id = latest["next_doc_id"]
+            self._dropped = {chunk_id: [tuple(dropped) for dropped in chunks]
+                             for chunk_id, chunks in latest["dropped"].items()}
+            self._duplicate_docs = {int(doc_id): copies for doc_id, copies in latest["duplicate_docs"].items()}
+            if (fields["chunk_size"], fields["chunk_overlap"]) != (self.retriever.retriever.chunk_size,
+                                                                  self.retriever.retriever.chunk_overlap):
+                logger.warning("Chunk size settings changed since the snapshot; "
+                               "documents keep their old chunks until they are added again")
+
+            def part(state, prefix):
+                return {name[len(prefix):]: array for name, array in state.items() if name.startswith(prefix)}
+
+            self.retriever.restore(part(arrays, "retriever."), {entry.id: entry.source for entry in self.entries},
+                                   part(delta[0], "retriever.") if delta else None)
+            self._changed_docs = {row["id"] for row in latest["documents"]} if delta else set()
+            self._removed_docs = set(latest["removed"])
+            self._restore_vectors(part(arrays, "vectors."), part(delta[0], "vectors.") if delta else None,
+                                  fields.get("embedding_model"))
+            self.revision += 1
+
+            if self.dedup is not None:
+                self._dedup_ready.clear()
+                threading.Thread(target=self._restore_dedup, args=(part(arrays, "dedup."),
+                                 part(delta[0], "dedup.") if delta else None), daemon=True).start()
+
+    def _restore_vectors(self, base: Dict[str, np.ndarray], delta: Optional[Dict[str, np.ndarray]],
+                         model: Optional[str]) -> None:
+        if self.vectors is None:
+            # Embeddings switched off: the next base leaves them out
+            self._needs_base = bool(base)
+            return
+        with self._vectors_lock:
+            self.vectors.clear()
+            self._added_vectors.clear()
+            self._removed_vectors.clear()
+            if model != self.embedder.model:
+                found = f"embeddings from {model}" if model else "no embeddings"
+                logger.warning(f"The knowledge-base snapshot has {found}; its documents are searchable "
+                               f"by keyword only until they are added again")
+                self._needs_base = True
+                return
+            if base:
+                self.vectors = open_index(base, self.vectors)
+            if delta:
+                self.vectors.remove(delta["removed"].tolist())
+                self.vectors.add(delta["added"].tolist(), delta["vectors"])
+                self._added_vectors.update(delta["added"].tolist())
+                self._removed_vectors.update(delta["removed"].tolist())
+
+    def _restore_dedup(self, base: Dict[str, np.ndarray], delta: Optional[Dict[str, np.ndarray]]) -> None:
+        """Refill the dedup indexes from the snapshot's signatures; runs on its own thread"""
+        started = time.perf_counter()
+        try:
+            table = self.retriever.retriever._table
+            alive = np.frombuffer(bytes(table.alive), dtype=np.uint8).astype(bool)
+            # Signatures of another length, or none at all, are taken from the text again
+            if "chunks" not in base or base["chunks"].shape[1] != self.dedup.hasher.num_perm:
+                self._rehash(table, alive)
+            else:
+                self._load_signatures(table, alive, base, delta)
+            logger.info(f"Rebuilt duplicate detection for {len(self.dedup)} chunks "
+                        f"in {time.perf_counter() - started:.1f}s")
+        except Exception as e:
+            logger.error(f"Rebuilding duplicate detection from the snapshot failed: {e}")
+        finally:
+            self._dedup_ready.set()
+
+    def _rehash(self, table, alive: np.ndarray) -> None:
+        for slot in np.flatnonzero(alive).tolist():
+            chunk = table.chunk(slot)
+            signature = self.dedup.hasher.signature(chunk.text)
+            if signature is not None:
+                self.dedup.add(chunk.id, signature)
+        copies = {doc_id for docs in self._duplicate_docs.values() for doc_id in docs}
+        for entry in self.entries:
+            signature = self.doc_dedup.hasher.signature(entry.content) if entry.id not in copies else None
+            if signature is not None:
+                self.doc_dedup.add(str(entry.id), signature)
+
+    def _load_signatures(self, table, alive: np.ndarray, base: Dict[str, np.ndarray],
+                         delta: Optional[Dict[str, np.ndarray]]) -> None:
+        first = 0
+        for part in [base] + ([delta] if delta else []):
+            # Rows line up with the slots the part's retriever arrays cover
+            signatures = part["chunks"]
+            present = part["chunks_present"].astype(bool)
+            for row in np.flatnonzero(present & alive[first:first + len(present)]).tolist():
+                self.dedup.add(table.chunk(first + row).id, signatures[row])
+            first += len(present)
+        documents = dict(zip(base["document_ids"].tolist(), base["documents"]))
+        if delta:
+            # Documents changed since the base may have stopped being originals
+            for doc_id in self._changed_docs:
+                documents.pop(doc_id, None)
+            documents.update(zip(delta["document_ids"].tolist(), delta["documents"]))
+        for entry in self.entries:
+            signature = documents.get(entry.id)
+            if signature is not None:
+                self.doc_dedup.add(str(entry.id), signature)
@@ -0,0 +1,372 @@
+# core/pipeline.py
+import asyncio
+import logging
+import threading
+import time
+import uuid
+import weakref
+from dataclasses import dataclass, field, replace
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+
+from rag.ann import create_index
+from rag.embeddings import Embedder
+from rag.packer import ContextPacker, build_rag_prompt
+from rag.segment import SegmentFile
+from utils.api_client import GenerateStats, GenerationMetrics, OllamaAPI
+from utils.conversation import Conversation, ConversationCompactor
+from utils.metrics import metrics
+from .images import EncodedImage, ImageEncoder, image_text
+from .knowledge import KnowledgeStore
+from .snapshot import KnowledgeSnapshots
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ChatRequest:
+    message: str
+    model: str
+    use_rag: bool = True
+    context_size: int = 4
+    relevance_threshold: Optional[float] = None  # None: the pipeline's
+    context_window: int = 4096
+    max_tokens: int = 2000
+    images: List[EncodedImage] = field(default_factory=list)
+
+
+@dataclass
+class ChatTurn:
+    request: ChatRequest
+    prompt: str
+    options: Dict[str, Any]
+    timing: GenerationMetrics
+    queued_at: float = field(default_factory=time.perf_counter)
+    response: str = ""
+    images: List[str] = field(default_factory=list)  # base64 payloads sent with the prompt
+    history: str = ""
+
+    @property
+    def full_prompt(self) -> str:
+        """The current message after the rendered conversation, as sent to the model"""
+        if not self.history:
+            return self.prompt
+        return f"{self.history}\n\nUser: {self.prompt}\nAssistant:"
+
+
+class ChatPipeline:
+    def __init__(
+        self,
+        api: OllamaAPI,
+        knowledge: KnowledgeStore,
+        db=None,
+        packer: Optional[ContextPacker] = None,
+        keep_alive: Optional[Union[str, int]] = None,
+        compactor: Optional[ConversationCompactor] = None,
+        history_budget: int = 1024,
+        keep_recent: int = 4,
+        compaction_wait: float = 1.0,
+        images: Optional[ImageEncoder] = None,
+        ocr_fallback: bool = True,
+        snapshots: Optional[KnowledgeSnapshots] = None,
+        relevance_threshold: float = 0.0
+    ):
+        """
+        Retrieval, prompt assembly, generation and bookkeeping for one chat turn,
+        independent of how the turn is displayed.
+
+        Args:
+            api: Client used for generation
+            knowledge: Knowledge base searched for context
+            db: DatabaseManager to record turns in, None skips recording
+            packer: Context packer (shared so its token cache is too)
+            keep_alive: Passed to the server with every generation
+            compactor: Summarises long histories, None disables compaction
+            history_budget: Token size at which a conversation gets compacted
+            keep_recent: Turns compaction always keeps verbatim
+            compaction_wait: Seconds prepare() waits for a summary still being generated;
+                if it takes longer the turn goes out with the full history
+            images: Encoder for attached images (shared so its cache is too)
+            ocr_fallback: Send the OCR text of attached images to models that cannot see them
+            snapshots: Keeps the knowledge base across restarts, None holds it in memory only
+            relevance_threshold: Keyword share or cosine similarity a chunk needs to be used
+                as context, for requests that don't set one
+        """
+        self.api = api
+        self.knowledge = knowledge
+        self.db = db
+        self.packer = packer or ContextPacker()
+        self.keep_alive = keep_alive
+        self.compactor = compactor
+        self.history_budget = history_budget
+        self.keep_recent = keep_recent
+        self.compaction_wait = compaction_wait
+        self.images = images or ImageEncoder()
+        self.ocr_fallback = ocr_fallback
+        self.snapshots = snapshots
+        self.relevance_threshold = relevance_threshold
+        self._vision: Dict[str, bool] = {}
+        self._compactions: "weakref.WeakKeyDictionary[Conversation, asyncio.Task]" = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def from_settings(cls, api: OllamaAPI, settings: Dict[str, Any], db=None) -> "ChatPipeline":
+        rag_settings = settings.get('rag_settings', {})
+        prefetch = settings.get('prefetch', {})
+        compaction = settings.get('compaction', {})
+        vision = settings.get('vision', {})
+        embedder = vectors = None
+        if rag_settings.get('embedding_model'):
+            embedder = Embedder(settings.get('api_base', 'http://localhost:11434/api'), rag_settings['embedding_model'])
+            vectors = create_index(**rag_settings.get('vector_index', {}))
+        snapshots = KnowledgeSnapshots.from_settings(settings)
+        if snapshots is not None:
+            segment = snapshots.segment(rag_settings.get('compress_text', False))
+        else:
+            segment = SegmentFile(
+                compress=rag_settings.get('compress_text', False),
+                directory=rag_settings.get('segment_dir') or None
+            )
+        knowledge = KnowledgeStore(
+            rag_settings.get('chunk_size', 1000),
+            rag_settings.get('chunk_overlap', 200),
+            dedup_threshold=rag_settings.get('dedup_threshold', 0.85),
+            segment=segment,
+            embedder=embedder,
+            vectors=vectors,
+            retrieval_candidates=rag_settings.get('retrieval_candidates', 50),
+            rrf_k=rag_settings.get('rrf_k', 60)
+        )
+        if snapshots is not None:
+            snapshots.load(knowledge)
+        compactor = None
+        if compaction.get('enabled', True):
+            compactor = ConversationCompactor(
+                api, compaction.get('model') or None, compaction.get('max_summary_tokens', 256))
+        return cls(
+            api,
+            knowledge,
+            db=db,
+            keep_alive=prefetch.get('keep_alive'),
+            compactor=compactor,
+            history_budget=compaction.get('history_budget', 1024),
+            keep_recent=compaction.get('keep_recent_turns', 4),
+            compaction_wait=compaction.get('max_wait', 1.0),
+            images=ImageEncoder(
+                vision.get('max_side', 1120),
+                vision.get('quality', 85),
+                vision.get('cache_entries', 64)
+            ),
+            ocr_fallback=vision.get('ocr_fallback', True),
+            snapshots=snapshots,
+            relevance_threshold=rag_settings.get('similarity_threshold', 0.5)
+        )
+
+    def new_conversation(self) -> Conversation:
+        return Conversation(self.history_budget, self.keep_recent)
+
+    def retrieve(self, request: ChatRequest, history_tokens: int = 0) -> str:
+        """The message wrapped in knowledge-base context that fits the request's window"""
+        if not request.use_rag or not len(self.knowledge):
+            return request.message
+
+        budget = self.packer.budget(request.context_window, request.max_tokens, request.message, history_tokens)
+        threshold = request.relevance_threshold
+        if threshold is None:
+            threshold = self.relevance_threshold
+        # Every candidate is passed on: the packer skips overlapping and duplicate ones
+        results, timings = self.knowledge.search(request.message, min_score=threshold, model=request.model)
+        logger.debug(f"Retrieval for {request.model}: {timings.summary()}")
+        packed = self.packer.pack(results, budget, max_chunks=request.context_size)
+        return build_rag_prompt(request.message, packed)
+
+    def prepare(self, request: ChatRequest, conversation: Conversation) -> ChatTurn:
+        """Retrieve and assemble the prompt. Blocking; runs off the event loop"""
+        # A summary about to land shortens this prompt; a slower one is left running and
+        # applies to a later turn, as the turns it folds stay at the head of the history
+        self.wait_for_compaction(conversation, self.compaction_wait)
+        history = conversation.render()
+
+        prompt, retrieval_time = self._retrieve_timed(request, conversation.history_tokens)
+        return ChatTurn(request, prompt, self._options(request),
+                        GenerationMetrics(model=request.model, retrieval_time=retrieval_time),
+                        images=[image.data for image in request.images], history=history)
+
+    def prepare_comparison(self, request: ChatRequest, models: List[str]) -> List[ChatTurn]:
+        """
+        One turn per model with the same prompt, for compare(). Blocking.
+
+        Retrieval runs once, so every model sees the same knowledge-base
+        context. The turns share a comparison id in their timings.
+        """
+        prompt, retrieval_time = self._retrieve_timed(request)
+        comparison = uuid.uuid4().hex[:12]
+        turns = []
+        for model in models:
+            model_request = replace(request, model=model)
+            turns.append(ChatTurn(model_request, prompt, self._options(model_request), GenerationMetrics(
+                model=model, retrieval_time=retrieval_time, comparison=comparison),
+                images=[image.data for image in request.images]))
+        return turns
+
+    def _retrieve_timed(self, request: ChatRequest, history_tokens: int = 0) -> Tuple[str, float]:
+        started = time.perf_counter()
+        prompt = self.retrieve(request, history_tokens)
+        retrieval_time = time.perf_counter() - started
+        if metrics.enabled:
+            metrics.retrieval_time.observe(retrieval_time, request.model, "rag")
+        return prompt, retrieval_time
+
+    @staticmethod
+    def _options(request: ChatRequest) -> Dict[str, Any]:
+        # Make the server use the same window the prompt was packed for
+        return {"num_ctx": request.context_window, "num_predict": request.max_tokens}
+
+    async def supports_images(self, model: str) -> bool:
+        """Whether the server reports the model as vision-capable; True when it cannot tell"""
+        known = self._vision.get(model)
+        if known is not None:
+            return known
+        try:
+            info = await self.api.show_model(model)
+        except Exception as e:
+            logger.warning(f"Could not check whether {model} accepts images: {e}")
+            return True
+        details = info.details
+        if 'capabilities' in details:
+            known = 'vision' in details['capabilities']
+        else:
+            # Older servers: vision models carry a projector (clip / mllama family)
+            families = (details.get('details') or {}).get('families') or []
+            known = 'projector_info' in details or bool({'clip', 'mllama'} & set(families))
+        self._vision[model] = known
+        return known
+
+    def _describe_images(self, turn: ChatTurn) -> None:
+        """Replace the turn's images with their OCR text. Blocking"""
+        texts = []
+        for image in turn.request.images:
+            try:
+                text = image_text(image)
+                if text is None:
+                    text = "(image not shown: the model cannot see images and OCR is not installed)"
+            except Exception as e:
+                logger.warning(f"OCR of {image.source} failed: {e}")
+                text = ""
+            texts.append(f"[Image {image.source}]\n{text or '(no text found)'}")
+        turn.images = []
+        turn.prompt = "\n\n".join(texts) + "\n\n" + turn.prompt
+
+    async def _generate(self, turn: ChatTurn) -> AsyncIterator[str]:
+        """Stream the turn's reply, filling in turn.timing and turn.response; never raises"""
+        started = time.perf_counter()
+        timing = turn.timing
+        timing.queue_time = started - turn.queued_at
+        parts = []
+        try:
+            if turn.images and self.ocr_fallback and not await self.supports_images(turn.request.model):
+                await asyncio.to_thread(self._describe_images, turn)
+            async for chunk in self.api.generate_stream(
+                prompt=turn.full_prompt, model=turn.request.model, options=turn.options,
+                keep_alive=self.keep_alive, images=turn.images or None
+            ):
+                if isinstance(chunk, GenerateStats):
+                    timing.update_from_stats(chunk)
+                if chunk.response:
+                    if timing.time_to_first_token is None:
+                        timing.time_to_first_token = time.perf_counter() - started
+                    parts.append(chunk.response)
+                    yield chunk.response
+        except Exception as e:
+            timing.success = False
+            timing.error = str(e)
+        timing.total_time = time.perf_counter() - started
+        turn.response = "".join(parts)
+
+    async def stream(self, turn: ChatTurn, conversation: Conversation) -> AsyncIterator[str]:
+        """
+        Generate the reply, yielding text as it arrives.
+
+        Failures end the stream early with turn.timing.success False and the
+        message in turn.timing.error. Once the stream is exhausted the turn
+        has been added to the conversation and recorded.
+        """
+        async for text in self._generate(turn):
+            yield text
+
+        if turn.timing.success:
+            conversation.add("user", turn.request.message)
+            conversation.add("assistant", turn.response)
+            running = self._compactions.get(conversation)
+            # A failed or cancelled compaction is retried after the next reply
+            if self.compactor and conversation.needs_compaction() and (running is None or running.done()):
+                self._compactions[conversation] = asyncio.ensure_future(
+                    self.compact(conversation, turn.request.model))
+
+        if self.db is not None:
+            # sqlite writes block, keep them off the event loop
+            await asyncio.get_running_loop().run_in_executor(None, self.record, turn)
+
+    async def compare(self, turns: List[ChatTurn], on_text: Callable[[ChatTurn, str], None]) -> List[ChatTurn]:
+        """
+        Generate every turn from prepare_comparison() at once.
+
+        on_text(turn, text) is called on the event loop as each model's text
+        arrives. Timings are recorded, but comparisons stay out of the chat
+        history and conversations.
+        """
+        async def run(turn: ChatTurn) -> None:
+            async for text in self._generate(turn):
+                on_text(turn, text)
+            if self.db is not None:
+                await asyncio.get_running_loop().run_in_executor(None, self.record, turn, False)
+
+        await asyncio.gather(*(run(turn) for turn in turns))
+        return turns
+
+    def record(self, turn: ChatTurn, history: bool = True) -> None:
+        try:
+            self.db.add_generation_metrics(turn.timing)
+            if history and turn.timing.success:
+                self.db.add_chat_entry(turn.request.model, turn.request.message, turn.response,
+                                       turn.timing.eval_count, turn.timing.total_time)
+        except Exception as e:
+            logger.error(f"Failed to record generation metrics: {e}")
+
+    async def compact(self, conversation: Conversation, model: str) -> None:
+        # Raw turns are already in chat_history; only the in-memory history is summarised
+        try:
+            await self.compactor.compact(conversation, model)
+        except asyncio.CancelledError:
+            logger.info("History compaction cancelled")
+            raise
+        except Exception as e:
+            logger.warning(f"History compaction failed: {e}")
+
+    def wait_for_compaction(self, conversation: Conversation, timeout: float) -> bool:
+        """
+        Block until a running summary is done, up to timeout seconds. Must not
+        be called on the event loop the summary runs on.
+
+        Returns:
+            Whether no summary is running any more
+        """
+        task = self._compactions.get(conversation)
+        if task is None or task.done():
+            return True
+        if not timeout:
+            return False
+        finished = threading.Event()
+        task.get_loop().call_soon_threadsafe(task.add_done_callback, lambda _: finished.set())
+        return finished.wait(timeout)
+
+    def cancel_compaction(self, conversation: Conversation) -> None:
+        """Stop a running summary; safe to call from any thread"""
+        task = self._compactions.pop(conversation, None)
+        if task is not None and not task.done():
+            task.get_loop().call_soon_threadsafe(task.cancel)
+
+    async def warm(self, model: str) -> None:
+        """Load the model ahead of the first request"""
+        try:
+            await self.api.load_model(model, self.keep_alive or "5m")
+        except Exception as e:
+            logger.warning(f"Failed to warm {model}: {e}")
@@ -0,0 +1,126 @@
+# core/refresh.py
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Optional
+
+from .ingestion import fetch_page, source_metadata
+from .knowledge import Document, KnowledgeStore
+
+logger = logging.getLogger(__name__)
+
+# Statuses meaning the page no longer exists
+GONE_STATUSES = (404, 410)
+
+
+@dataclass
+class RefreshReport:
+    checked: int = 0
+    unchanged: int = 0
+    changed: int = 0
+    removed: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+
+    def summary(self) -> str:
+        return (f"Refreshed {self.checked} URLs in {self.elapsed:.1f}s: {self.changed} changed, "
+                f"{self.unchanged} unchanged, {self.removed} removed, {self.failed} failed")
+
+
+class SourceRefresher:
+    def __init__(
+        self,
+        store: KnowledgeStore,
+        interval: float = 24 * 3600,
+        concurrency: int = 4,
+        timeout: float = 10,
+        on_report: Optional[Callable[[RefreshReport], None]] = None
+    ):
+        """
+        Keep URL sources in the knowledge base current.
+
+        Each page is revalidated with the ETag/Last-Modified it was last
+        served with, so unchanged pages usually cost a 304 and no parsing.
+        Pages that come back with new text are hashed and only re-chunked
+        if the extracted text actually differs. Pages that are gone are
+        removed from the knowledge base.
+
+        Args:
+            store: Knowledge base whose URL entries are refreshed
+            interval: Seconds between scheduled refreshes
+            concurrency: Pages fetched at the same time
+            timeout: Per-request timeout in seconds
+            on_report: Called with a RefreshReport after each scheduled refresh
+        """
+        self.store = store
+        self.interval = interval
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.on_report = on_report
+        self.running = False
+        self.last_report: Optional[RefreshReport] = None
+
+    async def refresh(self) -> Optional[RefreshReport]:
+        """Revalidate every URL entry once; None if a refresh is already running"""
+        if self.running:
+            return None
+        self.running = True
+        started = time.perf_counter()
+        report = RefreshReport()
+        try:
+            semaphore = asyncio.Semaphore(self.concurrency)
+            entries = [entry for entry in list(self.store.entries) if entry.metadata.get('url')]
+            await asyncio.gather(*(self._refresh_entry(entry, semaphore, report) for entry in entries))
+        finally:
+            self.running = False
+        report.elapsed = time.perf_counter() - started
+        self.last_report = report
+        logger.info(report.summary())
+        return report
+
+    async def _refresh_entry(self, entry: Document, semaphore: asyncio.Semaphore, report: RefreshReport):
+        url = entry.metadata['url']
+        async with semaphore:
+            try:
+                # requests and BeautifulSoup block, keep them off the event loop
+                page = await asyncio.to_thread(
+                    fetch_page, url, entry.metadata.get('etag'), entry.metadata.get('last_modified'), self.timeout)
+            except Exception as e:
+                report.failed += 1
+                logger.warning(f"Refresh of {url} failed: {e}")
+                return
+
+        report.checked += 1
+        if page.status == 304:
+            # Waits for the store lock, which ingestion holds while chunking
+            await asyncio.to_thread(self.store.set_metadata, entry.id, {'checked_at': datetime.now()})
+            report.unchanged += 1
+        elif page.status in GONE_STATUSES:
+            await asyncio.to_thread(self.store.remove, [entry.id])
+            report.removed += 1
+            logger.info(f"Removed {url}: HTTP {page.status}")
+        elif page.status == 200:
+            metadata = source_metadata(url, page)
+            if metadata['content_hash'] == entry.metadata.get('content_hash'):
+                await asyncio.to_thread(self.store.set_metadata, entry.id, metadata)
+                report.unchanged += 1
+            else:
+                await asyncio.to_thread(self.store.update, entry.id, page.text, metadata)
+                report.changed += 1
+        else:
+            report.failed += 1
+            logger.warning(f"Refresh of {url} failed: HTTP {page.status}")
+
+    async def run(self) -> None:
+        """Refresh every interval until cancelled"""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                report = await self.refresh()
+            except Exception as e:
+                logger.error(f"Scheduled refresh failed: {e}")
+                continue
+            if report is not None and self.on_report:
+                self.on_report(report)
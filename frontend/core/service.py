@@ -0,0 +1,322 @@
+# core/service.py
+import asyncio
+import base64
+import json
+import logging
+import os
+import tempfile
+import uuid
+from collections import OrderedDict
+from contextlib import aclosing
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional
+
+import validators
+from aiohttp import web
+
+from utils.api_client import OllamaAPI
+from utils.conversation import Conversation
+from utils.metrics import OPENMETRICS_CONTENT_TYPE, PROMETHEUS_CONTENT_TYPE, MetricsRegistry, metrics
+from .images import EncodedImage
+from .ingestion import SUPPORTED_EXTENSIONS, ingest_file, ingest_url
+from .knowledge import Document, IngestReport
+from .pipeline import ChatPipeline, ChatRequest
+from .refresh import SourceRefresher
+
+logger = logging.getLogger(__name__)
+
+
+def _error(message: str, status: int = 400) -> web.Response:
+    return web.json_response({"error": message}, status=status)
+
+
+def _entry_info(entry: Document) -> Dict[str, Any]:
+    return {
+        "id": entry.id,
+        "source": entry.source,
+        "size": entry.size,
+        "date": entry.date.isoformat(),
+        "chunks": entry.chunks,
+        "skipped_chunks": entry.skipped
+    }
+
+
+class ChatService:
+    def __init__(
+        self,
+        pipeline: ChatPipeline,
+        default_model: str,
+        max_sessions: int = 1000,
+        registry: MetricsRegistry = metrics,
+        refresher: Optional[SourceRefresher] = None
+    ):
+        """
+        HTTP front end for a ChatPipeline.
+
+        Every request shares the pipeline's knowledge base, API connection
+        pool and caches. Conversations are kept per session id; the least
+        recently used is dropped once max_sessions is exceeded.
+
+        Args:
+            pipeline: Pipeline that does the work
+            default_model: Model used when a chat request names none
+            max_sessions: Conversations kept in memory
+            registry: Metrics served on /metrics
+            refresher: Re-crawls URL sources in the background, None disables it
+        """
+        self.pipeline = pipeline
+        self.default_model = default_model
+        self.max_sessions = max_sessions
+        self.registry = registry
+        self.refresher = refresher
+        self.sessions: "OrderedDict[str, Conversation]" = OrderedDict()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._snapshot_task: Optional[asyncio.Task] = None
+
+    def create_app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/chat", self.handle_chat)
+        app.router.add_post("/ingest", self.handle_ingest)
+        app.router.add_post("/refresh", self.handle_refresh)
+        app.router.add_get("/search", self.handle_search)
+        app.router.add_get("/documents", self.handle_documents)
+        app.router.add_delete("/documents/{doc_id}", self.handle_delete_document)
+        app.router.add_delete("/sessions/{session}", self.handle_delete_session)
+        app.router.add_get("/metrics", self.handle_metrics)
+        app.router.add_get("/health", self.handle_health)
+        app.on_startup.append(self._start)
+        app.on_cleanup.append(self._close)
+        return app
+
+    async def _start(self, app: web.Application) -> None:
+        if self.refresher is not None:
+            self._refresh_task = asyncio.create_task(self.refresher.run())
+        snapshots = self.pipeline.snapshots
+        if snapshots is not None:
+            snapshots.check()
+            self._snapshot_task = asyncio.create_task(snapshots.run(self.pipeline.knowledge))
+
+    async def _close(self, app: web.Application) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+        if self._snapshot_task is not None:
+            self._snapshot_task.cancel()
+            try:
+                await asyncio.to_thread(self.pipeline.snapshots.save, self.pipeline.knowledge)
+            except Exception as e:
+                logger.error(f"Saving the knowledge-base snapshot failed: {e}")
+        if self.pipeline.api.session:
+            await self.pipeline.api.session.close()
+
+    def conversation(self, session: str) -> Conversation:
+        conversation = self.sessions.get(session)
+        if conversation is None:
+            conversation = self.sessions[session] = self.pipeline.new_conversation()
+            if len(self.sessions) > self.max_sessions:
+                _, dropped = self.sessions.popitem(last=False)
+                self.pipeline.cancel_compaction(dropped)
+        else:
+            self.sessions.move_to_end(session)
+        return conversation
+
+    @staticmethod
+    def _sse(event: str, data: Dict[str, Any]) -> bytes:
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+    async def handle_chat(self, request: web.Request) -> web.StreamResponse:
+        """
+        POST {"message", "model"?, "session"?, "use_rag"?, "context_size"?, "relevance_threshold"?,
+        "context_window"?, "max_tokens"?, "images"? (base64)} and receive Server-Sent Events:
+        "token" per text chunk, then "done" with the turn's timings or "error".
+        """
+        try:
+            body = await request.json()
+            chat = ChatRequest(
+                message=str(body["message"]).strip(),
+                model=body.get("model") or self.default_model,
+                use_rag=bool(body.get("use_rag", True)),
+                context_size=int(body.get("context_size", 4)),
+                relevance_threshold=(float(body["relevance_threshold"])
+                                     if body.get("relevance_threshold") is not None else None),
+                context_window=int(body.get("context_window", 4096)),
+                max_tokens=int(body.get("max_tokens", 2000))
+            )
+        except (ValueError, KeyError, TypeError) as e:
+            return _error(f"Invalid chat request: {e}")
+        if not chat.message:
+            return _error("Empty message")
+        if body.get("images"):
+            try:
+                # Decoding and downscaling is CPU-bound too
+                chat.images = await asyncio.to_thread(self._encode_images, body["images"])
+            except (ValueError, TypeError, OSError) as e:
+                return _error(f"Invalid image: {e}")
+
+        session = str(body.get("session") or uuid.uuid4().hex)
+        conversation = self.conversation(session)
+        # Retrieval is CPU-bound; keep it off the event loop
+        turn = await asyncio.to_thread(self.pipeline.prepare, chat, conversation)
+
+        response = web.StreamResponse(headers={
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            "X-Session-Id": session
+        })
+        await response.prepare(request)
+        async with aclosing(self.pipeline.stream(turn, conversation)) as stream:
+            async for text in stream:
+                await response.write(self._sse("token", {"text": text}))
+        if turn.timing.success:
+            await response.write(self._sse("done", {
+                "session": session,
+                **asdict(turn.timing),
+                "tokens_per_second": turn.timing.tokens_per_second
+            }))
+        else:
+            await response.write(self._sse("error", {"session": session, "error": turn.timing.error}))
+        await response.write_eof()
+        return response
+
+    def _encode_images(self, images: List[str]) -> List[EncodedImage]:
+        if not isinstance(images, list):
+            raise ValueError("'images' must be a list of base64 strings")
+        return [
+            self.pipeline.images.encode_bytes(base64.b64decode(data, validate=True), f"image {i + 1}")
+            for i, data in enumerate(images)
+        ]
+
+    async def handle_ingest(self, request: web.Request) -> web.Response:
+        """JSON {"url"} or {"text", "source"?}, or a multipart upload with a "file" field"""
+        store = self.pipeline.knowledge
+        try:
+            if request.content_type.startswith("multipart/"):
+                report = await self._ingest_upload(request)
+                if report is None:
+                    return _error("Expected a multipart field named 'file'")
+            else:
+                body = await request.json()
+                if body.get("url"):
+                    if not validators.url(body["url"]):
+                        return _error("Invalid URL")
+                    report = await asyncio.to_thread(ingest_url, store, body["url"])
+                elif body.get("text"):
+                    report = await asyncio.to_thread(store.add, body["text"], body.get("source") or "API")
+                else:
+                    return _error("Expected 'url' or 'text'")
+        except ValueError as e:
+            return _error(f"Invalid ingest request: {e}")
+        except Exception as e:
+            logger.error(f"Ingestion failed: {e}")
+            return _error(f"Ingestion failed: {e}", 502)
+        return web.json_response({**_entry_info(report.entry), "duplicate_of": report.duplicate_of}, status=201)
+
+    async def _ingest_upload(self, request: web.Request) -> Optional[IngestReport]:
+        reader = await request.multipart()
+        async for part in reader:
+            if part.name != "file" or not part.filename:
+                continue
+            name = os.path.basename(part.filename)
+            extension = os.path.splitext(name)[1].lower()
+            if extension not in SUPPORTED_EXTENSIONS:
+                raise ValueError(f"unsupported file type {extension or name}")
+            fd, path = tempfile.mkstemp(suffix=extension)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    while True:
+                        data = await part.read_chunk()
+                        if not data:
+                            break
+                        f.write(data)
+                return await asyncio.to_thread(ingest_file, self.pipeline.knowledge, path, name)
+            finally:
+                os.unlink(path)
+        return None
+
+    async def handle_refresh(self, request: web.Request) -> web.Response:
+        """Revalidate every URL source now and report what changed"""
+        refresher = self.refresher or SourceRefresher(self.pipeline.knowledge)
+        report = await refresher.refresh()
+        if report is None:
+            return _error("A refresh is already running", 409)
+        return web.json_response(asdict(report))
+
+    async def handle_search(self, request: web.Request) -> web.Response:
+        query = request.query.get("q", "").strip()
+        if not query:
+            return _error("Missing query parameter 'q'")
+        try:
+            limit = int(request.query.get("limit", 10))
+            min_score = float(request.query.get("min_score", 0.0))
+        except ValueError as e:
+            return _error(f"Invalid search parameters: {e}")
+        model = request.query.get("model", "")
+
+        def search():
+            # Chunk text is read from disk on access, so build the response off the loop too
+            results, timings = self.pipeline.knowledge.search(query, limit, min_score, model)
+            return {
+                "results": [
+                    {"chunk": chunk.id, "doc_id": chunk.doc_id, "source": chunk.source, "score": score,
+                     "text": chunk.text}
+                    for chunk, score in results
+                ],
+                "timings": asdict(timings)
+            }
+
+        return web.json_response(await asyncio.to_thread(search))
+
+    async def handle_documents(self, request: web.Request) -> web.Response:
+        return web.json_response({"documents": [_entry_info(entry) for entry in self.pipeline.knowledge.entries]})
+
+    async def handle_delete_document(self, request: web.Request) -> web.Response:
+        try:
+            doc_id = int(request.match_info["doc_id"])
+        except ValueError:
+            return _error("Invalid document id")
+        if not await asyncio.to_thread(self.pipeline.knowledge.remove, [doc_id]):
+            return _error("Document not found", 404)
+        return web.json_response({"removed": doc_id})
+
+    async def handle_delete_session(self, request: web.Request) -> web.Response:
+        conversation = self.sessions.pop(request.match_info["session"], None)
+        if conversation is None:
+            return _error("Session not found", 404)
+        self.pipeline.cancel_compaction(conversation)
+        return web.json_response({"removed": request.match_info["session"]})
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        openmetrics = "application/openmetrics-text" in request.headers.get("Accept", "")
+        return web.Response(
+            body=self.registry.render(openmetrics).encode("utf-8"),
+            headers={"Content-Type": OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE}
+        )
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "status": "ok",
+            "documents": len(self.pipeline.knowledge),
+            "chunks": len(self.pipeline.knowledge.retriever),
+            "skipped_chunks": self.pipeline.knowledge.skipped_chunks,
+            "sessions": len(self.sessions)
+        })
+
+
+def create_service(settings: Dict[str, Any], db=None) -> ChatService:
+    """Build the service from the same settings dictionary the desktop app uses"""
+    api = OllamaAPI.from_settings(settings)
+    pipeline = ChatPipeline.from_settings(api, settings, db)
+    refresh = settings.get('refresh', {})
+    refresher = None
+    if refresh.get('enabled', True):
+        refresher = SourceRefresher(
+            pipeline.knowledge,
+            interval=refresh.get('interval_hours', 24) * 3600,
+            concurrency=refresh.get('concurrency', 4)
+        )
+    return ChatService(
+        pipeline,
+        settings.get('default_model', ''),
+        settings.get('server', {}).get('max_sessions', 1000),
+        refresher=refresher
+    )
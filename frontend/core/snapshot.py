@@ -0,0 +1,402 @@
+# core/snapshot.py
+import asyncio
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from rag.segment import SegmentFile
+from .knowledge import KnowledgeStore
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the layout changes; older snapshots are ignored rather than misread
+FORMAT = 1
+POINTER = "CURRENT"
+MANIFEST = "manifest.json"
+FIELDS = "fields.json"
+SEGMENT = "text.seg"
+
+# (arrays, JSON fields) of one snapshot
+Snapshot = Tuple[Dict[str, np.ndarray], Dict[str, Any]]
+
+
+class SnapshotError(Exception):
+    pass
+
+
+@dataclass
+class SnapshotInfo:
+    name: str
+    kind: str           # "base" or "delta"
+    version: int
+    documents: int      # entries written: all of them for a base, changed ones for a delta
+    size: int           # bytes written
+    elapsed: float
+
+    def summary(self) -> str:
+        return (f"Saved {self.kind} snapshot {self.version} ({self.documents} documents, "
+                f"{self.size / 1024 / 1024:.1f} MB) in {self.elapsed:.2f}s")
+
+
+def _crc32(path: str, start: int = 0, end: Optional[int] = None, crc: int = 0, block: int = 1 << 20) -> int:
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = None if end is None else end - start
+        while remaining is None or remaining > 0:
+            data = f.read(block if remaining is None else min(block, remaining))
+            if not data:
+                break
+            crc = zlib.crc32(data, crc)
+            if remaining is not None:
+                remaining -= len(data)
+    return crc
+
+
+def _fsync_dir(path: str) -> None:
+    # Makes a rename durable; directories can't be opened for this on Windows
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _json_default(value):
+    # Entry metadata holds datetimes, e.g. when a URL was last checked
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+class KnowledgeSnapshots:
+    def __init__(self, directory: str, delta_ratio: float = 0.25, verify: bool = True, interval: float = 600):
+        """
+        Versioned snapshots of a KnowledgeStore, so a restart doesn't rebuild its indexes.
+
+        The store's text segment lives in the directory and survives
+        restarts. A snapshot holds everything derived from that text: the
+        document table, chunk metadata, lexical postings, dedup signatures
+        and the embedding matrix, each as a flat .npy file. Loading
+        memory-maps the files and the indexes search them in place, so
+        startup reads a few headers however large the knowledge base is
+        and the OS pages in what searches touch.
+
+        A base snapshot holds everything. A delta holds what changed since
+        its base and is rewritten on every save, until it grows past
+        delta_ratio of the base and a new base replaces both. Snapshots are
+        written to a temporary directory and renamed into place before the
+        CURRENT pointer is swapped, so a crash leaves the previous one
+        intact. After loading, the checksums of every file and of the text
+        segment are verified on a background thread, see check().
+
+        Args:
+            directory: Where the snapshots and the text segment live
+            delta_ratio: Size of a delta, as a share of its base, above which a new base is written
+            verify: Whether check() verifies checksums or does nothing
+            interval: Seconds between the saves run() makes
+        """
+        self.directory = directory
+        self.delta_ratio = delta_ratio
+        self.verify_checksums = verify
+        self.interval = interval
+        self.segment_path = os.path.join(directory, SEGMENT)
+        # Manifests of the live base and delta
+        self.base: Optional[Dict[str, Any]] = None
+        self.delta: Optional[Dict[str, Any]] = None
+        self.damage: List[str] = []
+        self._saved_revision: Optional[int] = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._read_pointer()
+
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Any]) -> Optional["KnowledgeSnapshots"]:
+        """Snapshots configured by the 'snapshots' block, None if they are switched off"""
+        snapshots = settings.get('snapshots', {})
+        if not snapshots.get('enabled', True):
+            return None
+        return cls(
+            snapshots.get('directory', 'data/knowledge'),
+            delta_ratio=snapshots.get('delta_ratio', 0.25),
+            verify=snapshots.get('verify', True),
+            interval=snapshots.get('save_interval_minutes', 10) * 60
+        )
+
+    @property
+    def latest(self) -> Optional[Dict[str, Any]]:
+        return self.delta or self.base
+
+    def _path(self, *names: str) -> str:
+        return os.path.join(self.directory, *names)
+
+    def _read_manifest(self, name: str) -> Dict[str, Any]:
+        with open(self._path(name, MANIFEST), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("format") != FORMAT:
+            raise SnapshotError(f"{name} has snapshot format {manifest.get('format')}, expected {FORMAT}")
+        # Cheap checks now; checksums are left to verify()
+        for file_name, info in manifest["files"].items():
+            path = self._path(name, file_name)
+            if not os.path.exists(path) or os.path.getsize(path) != info["size"]:
+                raise SnapshotError(f"{name}/{file_name} is missing or truncated")
+        return manifest
+
+    def _read_pointer(self) -> None:
+        try:
+            with open(self._path(POINTER), "r", encoding="utf-8") as f:
+                pointer = json.load(f)
+        except FileNotFoundError:
+            return
+        try:
+            self.base = self._read_manifest(pointer["base"])
+            self.delta = self._read_manifest(pointer["delta"]) if pointer.get("delta") else None
+            if self.delta is not None and self.delta["base"] != self.base["name"]:
+                raise SnapshotError(f"{self.delta['name']} was taken against {self.delta['base']}")
+        except (OSError, ValueError, KeyError, SnapshotError) as e:
+            logger.error(f"Knowledge-base snapshot in {self.directory} is unusable, starting empty: {e}")
+            self.base = self.delta = None
+            self.damage = [str(e)]
+
+    def segment(self, compress: bool = False) -> SegmentFile:
+        """
+        The text segment a store must use for its snapshots to be valid.
+
+        Text appended after the last snapshot belongs to nothing that was
+        saved and is cut off. The snapshot's compression setting wins over
+        compress, since its records can only be read back the way they were
+        written.
+        """
+        latest = self.latest
+        if latest is not None:
+            if latest["segment"]["compress"] != compress:
+                logger.warning("Keeping the knowledge-base snapshot's text compression setting")
+            compress = latest["segment"]["compress"]
+        segment = SegmentFile(self.segment_path, compress=compress)
+        if latest is None:
+            # Left alone if a damaged snapshot may still need it
+            if not self.damage:
+                segment.truncate(0)
+        elif segment.size < latest["segment"]["size"]:
+            logger.error(f"{self.segment_path} is shorter than the snapshot expects; starting empty")
+            self.base = self.delta = None
+            self.damage = [f"{SEGMENT} is truncated"]
+        else:
+            segment.truncate(latest["segment"]["size"])
+        return segment
+
+    def _open(self, manifest: Dict[str, Any]) -> Snapshot:
+        name = manifest["name"]
+        arrays = {}
+        for file_name in manifest["files"]:
+            if file_name.endswith(".npy"):
+                array = np.load(self._path(name, file_name), mmap_mode="c")
+                # Scalars (index kind, counts) are read as plain values, not memmaps
+                arrays[file_name[:-len(".npy")]] = np.array(array) if array.ndim == 0 else array
+        with open(self._path(name, FIELDS), "r", encoding="utf-8") as f:
+            fields = json.load(f)
+        return arrays, fields
+
+    def load(self, store: KnowledgeStore) -> bool:
+        """
+        Restore the latest snapshot into a store built on segment().
+
+        Returns:
+            Whether there was a snapshot to restore
+        """
+        if self.base is None:
+            return False
+        if store.segment.path is None or os.path.abspath(store.segment.path) != os.path.abspath(self.segment_path):
+            raise ValueError("The store must use the snapshot directory's text segment")
+        started = time.perf_counter()
+        try:
+            store._restore_snapshot(self._open(self.base), self._open(self.delta) if self.delta else None)
+        except Exception as e:
+            logger.error(f"Restoring the knowledge-base snapshot failed, starting empty: {e}")
+            store.clear()
+            self.base = self.delta = None
+            return False
+        self._saved_revision = store.revision
+        logger.info(f"Restored {len(store)} documents from snapshot {self.latest['version']} "
+                    f"in {time.perf_counter() - started:.3f}s")
+        return True
+
+    def save(self, store: KnowledgeStore, base: bool = False) -> Optional[SnapshotInfo]:
+        """
+        Write a delta against the current base, or a new base when there is
+        none, the delta has outgrown it, or base is set. Blocking; ingestion
+        waits while it runs, searches don't.
+
+        Returns:
+            What was written, None if nothing changed since the last save
+            (and, for base, there is no delta to fold in)
+        """
+        with self._lock, store._lock:
+            if store.revision == self._saved_revision and not self.damage and not (base and self.delta is not None):
+                return None
+            started = time.perf_counter()
+            snapshot = None
+            # A damaged snapshot is replaced whole rather than patched
+            if not base and self.base is not None and not store._needs_base and not self.damage:
+                snapshot = store._snapshot(delta=True)
+                size = sum(array.nbytes for array in snapshot[0].values())
+                base_size = sum(info["size"] for info in self.base["files"].values())
+                if size > self.delta_ratio * base_size:
+                    snapshot = None
+            kind = "delta" if snapshot is not None else "base"
+            if snapshot is None:
+                snapshot = store._snapshot()
+
+            version = (self.latest["version"] if self.latest else 0) + 1
+            manifest = self._write(f"{kind}-{version:06d}", kind, version, snapshot, store.segment)
+            if kind == "base":
+                self.base, self.delta = manifest, None
+                self.damage = []
+                # Index what was just written in place, so the next delta holds only later changes
+                arrays, _ = self._open(manifest)
+                store._rebased({name[len("retriever."):]: array for name, array in arrays.items()
+                                if name.startswith("retriever.")})
+            else:
+                self.delta = manifest
+            self._point()
+            self._saved_revision = store.revision
+        self._prune()
+        info = SnapshotInfo(manifest["name"], kind, version, len(snapshot[1]["documents"]),
+                            sum(f["size"] for f in manifest["files"].values()), time.perf_counter() - started)
+        logger.info(info.summary())
+        return info
+
+    def _write(self, name: str, kind: str, version: int, snapshot: Snapshot, segment: SegmentFile) -> Dict[str, Any]:
+        arrays, fields = snapshot
+        tmp = self._path(f"{name}.tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        files = {}
+        for array_name, array in arrays.items():
+            path = os.path.join(tmp, f"{array_name}.npy")
+            with open(path, "wb") as f:
+                np.save(f, np.asarray(array, order="C"), allow_pickle=False)
+                f.flush()
+                os.fsync(f.fileno())
+            files[f"{array_name}.npy"] = {"size": os.path.getsize(path), "crc32": _crc32(path)}
+        path = os.path.join(tmp, FIELDS)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(fields, f, default=_json_default)
+            f.flush()
+            os.fsync(f.fileno())
+        files[FIELDS] = {"size": os.path.getsize(path), "crc32": _crc32(path)}
+
+        # The segment checksum continues from the previous snapshot's, reading only the new text
+        size = segment.flush()
+        latest = self.latest
+        if latest is not None and latest["segment"]["size"] <= size:
+            crc = _crc32(self.segment_path, latest["segment"]["size"], size, latest["segment"]["crc32"])
+        else:
+            crc = _crc32(self.segment_path, 0, size)
+        manifest = {
+            "format": FORMAT,
+            "name": name,
+            "kind": kind,
+            "version": version,
+            "base": self.base["name"] if kind == "delta" else None,
+            "created": time.time(),
+            "segment": {"size": size, "crc32": crc, "compress": segment.compress},
+            "files": files,
+        }
+        with open(os.path.join(tmp, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        # A leftover from a save that crashed before moving the pointer
+        shutil.rmtree(self._path(name), ignore_errors=True)
+        os.replace(tmp, self._path(name))
+        _fsync_dir(self.directory)
+        return manifest
+
+    def _point(self) -> None:
+        tmp = self._path(f"{POINTER}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"base": self.base["name"], "delta": self.delta["name"] if self.delta else None}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._path(POINTER))
+        _fsync_dir(self.directory)
+
+    def _prune(self) -> None:
+        """Delete snapshots the pointer no longer names"""
+        keep = {SEGMENT, POINTER, self.base["name"]} | ({self.delta["name"]} if self.delta else set())
+        for name in os.listdir(self.directory):
+            path = self._path(name)
+            if name not in keep and os.path.isdir(path):
+                # Fails on Windows while the old base is still mapped; the next save retries
+                shutil.rmtree(path, ignore_errors=True)
+
+    def verify(self) -> List[str]:
+        """Compare every file of the live snapshot, and the text segment, with its checksum"""
+        problems = []
+        for manifest in filter(None, (self.base, self.delta)):
+            for file_name, info in manifest["files"].items():
+                try:
+                    if _crc32(self._path(manifest["name"], file_name)) != info["crc32"]:
+                        problems.append(f"{manifest['name']}/{file_name} does not match its checksum")
+                except OSError as e:
+                    problems.append(f"{manifest['name']}/{file_name}: {e}")
+        latest = self.latest
+        if latest is not None:
+            try:
+                if _crc32(self.segment_path, 0, latest["segment"]["size"]) != latest["segment"]["crc32"]:
+                    problems.append(f"{SEGMENT} does not match its checksum")
+            except OSError as e:
+                problems.append(f"{SEGMENT}: {e}")
+        return problems
+
+    def check(self, on_damage: Optional[Callable[[List[str]], None]] = None) -> Optional[threading.Thread]:
+        """
+        Verify the live snapshot on a background thread, unless verification is off.
+
+        Args:
+            on_damage: Called from that thread with the problems found, if any
+        """
+        if not self.verify_checksums or self.base is None:
+            return None
+
+        def run():
+            started = time.perf_counter()
+            latest = self.latest
+            problems = self.verify()
+            if self.latest is not latest:
+                # A save replaced the snapshot mid-check; the new one was written from memory
+                return
+            self.damage = problems
+            if problems:
+                logger.error(f"Knowledge-base snapshot failed its integrity check: {'; '.join(problems)}")
+                if on_damage:
+                    on_damage(problems)
+            else:
+                logger.info(f"Knowledge-base snapshot verified in {time.perf_counter() - started:.1f}s")
+
+        thread = threading.Thread(target=run, name="snapshot-verify", daemon=True)
+        thread.start()
+        return thread
+
+    async def run(self, store: KnowledgeStore) -> None:
+        """Save every interval until cancelled"""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(self.save, store)
+            except Exception as e:
+                logger.error(f"Saving the knowledge-base snapshot failed: {e}")
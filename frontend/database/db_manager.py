@@ -1,8 +1,16 @@
 # database/db_manager.py
+import os
 import sqlite3
 from datetime import datetime
 
 class DatabaseManager:
+    def __init__(self, db_path='data/ollama_gui.db'):
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.init_database()
+
     def add_interaction_metrics(self, model_name, prompt, response, tokens_used, response_time, success_rate):
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
@@ -43,6 +51,37 @@ class DatabaseManager:
                     total_conversations INTEGER
                 )
             ''')
+
+            # One row per generation; durations in seconds
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS generation_metrics (
+                    id INTEGER PRIMARY KEY,
+                    timestamp DATETIME,
+                    model TEXT,
+                    queue_time FLOAT,
+                    retrieval_time FLOAT,
+                    time_to_first_token FLOAT,
+                    total_time FLOAT,
+                    load_duration FLOAT,
+                    prompt_eval_duration FLOAT,
+                    eval_duration FLOAT,
+                    server_total_duration FLOAT,
+                    prompt_eval_count INTEGER,
+                    eval_count INTEGER,
+                    tokens_per_second FLOAT,
+                    success INTEGER,
+                    error TEXT,
+                    comparison TEXT
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_generation_metrics_timestamp
+                ON generation_metrics (timestamp)
+            ''')
+            # Databases created before model comparisons lack the column
+            columns = {row[1] for row in cursor.execute("PRAGMA table_info(generation_metrics)")}
+            if "comparison" not in columns:
+                cursor.execute("ALTER TABLE generation_metrics ADD COLUMN comparison TEXT")
             
             conn.commit()
 
@@ -54,3 +93,59 @@ class DatabaseManager:
                 VALUES (?, ?, ?, ?, ?, ?)
             ''', (datetime.now(), model, message, response, tokens, response_time))
             conn.commit()
+
+    def add_generation_metrics(self, metrics):
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO generation_metrics
+                (timestamp, model, queue_time, retrieval_time, time_to_first_token, total_time,
+                load_duration, prompt_eval_duration, eval_duration, server_total_duration,
+                prompt_eval_count, eval_count, tokens_per_second, success, error, comparison)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                datetime.now(), metrics.model, metrics.queue_time, metrics.retrieval_time,
+                metrics.time_to_first_token, metrics.total_time, metrics.load_duration,
+                metrics.prompt_eval_duration, metrics.eval_duration, metrics.server_total_duration,
+                metrics.prompt_eval_count, metrics.eval_count, metrics.tokens_per_second,
+                int(metrics.success), metrics.error, metrics.comparison
+            ))
+            conn.commit()
+
+    def get_daily_metrics(self, start_date, end_date):
+        """Per-day totals between two dates (inclusive), newest first"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT date(timestamp) AS day,
+                       SUM(prompt_eval_count + eval_count),
+                       AVG(total_time),
+                       AVG(time_to_first_token),
+                       AVG(tokens_per_second),
+                       AVG(success)
+                FROM generation_metrics
+                WHERE date(timestamp) BETWEEN ? AND ?
+                GROUP BY day
+                ORDER BY day DESC
+            ''', (str(start_date), str(end_date)))
+            return cursor.fetchall()
+
+    def get_model_latency(self, start_date, end_date):
+        """Per-model averages between two dates (inclusive), fastest first token first"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT model,
+                       COUNT(*),
+                       AVG(load_duration),
+                       AVG(time_to_first_token),
+                       MAX(time_to_first_token),
+                       AVG(tokens_per_second),
+                       AVG(total_time),
+                       AVG(success)
+                FROM generation_metrics
+                WHERE date(timestamp) BETWEEN ? AND ?
+                GROUP BY model
+                ORDER BY AVG(time_to_first_token)
+            ''', (str(start_date), str(end_date)))
+            return cursor.fetchall()
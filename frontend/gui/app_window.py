@@ -1,14 +1,69 @@
+import logging
 import tkinter as tk
-from tkinter import ttk
+from tkinter import ttk, messagebox
+from config.settings import Settings
+from core.pipeline import ChatPipeline
+from core.refresh import SourceRefresher
+from database.db_manager import DatabaseManager
+from models.pull_manager import PullManager
+from utils.api_client import OllamaAPI
+from utils.async_runner import AsyncRunner
+from utils.metrics import MetricsExporter, metrics
+from utils.watchdog import ProfilerToggle, UIWatchdog
 from .frames.model_frame import ModelFrame
 from .frames.chat_frame import ChatFrame
 from .frames.control_frame import ControlFrame
 
+logger = logging.getLogger(__name__)
+
 class OllamaGUI:
     def __init__(self, root):
         self.root = root
         self.root.title("Ollama Chat Interface")
         self.root.geometry("1200x800")
+
+        # Shared services used by the frames
+        self.settings = Settings()
+        config = self.settings.current_settings
+        self.db = DatabaseManager(config.get('db_path', 'data/ollama_gui.db'))
+        self.runner = AsyncRunner()
+        self.api = OllamaAPI.from_settings(config)
+        self.pull_manager = PullManager(self.api, max_concurrent=config.get('max_concurrent_pulls', 2))
+        self.pipeline = ChatPipeline.from_settings(self.api, config, self.db)
+        refresh = config.get('refresh', {})
+        self.refresher = SourceRefresher(
+            self.pipeline.knowledge,
+            interval=refresh.get('interval_hours', 24) * 3600,
+            concurrency=refresh.get('concurrency', 4)
+        )
+        if refresh.get('enabled', True):
+            self.runner.submit(self.refresher.run())
+        snapshots = self.pipeline.snapshots
+        if snapshots is not None:
+            if snapshots.damage:
+                self.root.after(0, self.snapshot_damaged, snapshots.damage)
+            snapshots.check(lambda problems: self.root.after(0, self.snapshot_damaged, problems))
+            self.runner.submit(snapshots.run(self.pipeline.knowledge))
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        self.metrics_exporter = None
+        metrics_config = config.get('metrics', {})
+        if metrics_config.get('enabled'):
+            self.metrics_exporter = MetricsExporter(
+                metrics,
+                port=metrics_config.get('port', 9464),
+                host=metrics_config.get('host', '127.0.0.1'),
+                textfile=metrics_config.get('textfile') or None
+            ).start()
+
+        diagnostics = config.get('diagnostics', {})
+        self.profiler = ProfilerToggle(diagnostics.get('profile_dir', 'data/profiles'))
+        self.watchdog = None
+        if diagnostics.get('watchdog', True):
+            self.watchdog = UIWatchdog(
+                root,
+                interval_ms=diagnostics.get('lag_interval_ms', 100),
+                stall_threshold=diagnostics.get('stall_threshold_ms', 250) / 1000.0
+            ).start()
         
         # Initialize main container
         self.main_container = ttk.PanedWindow(root, orient=tk.HORIZONTAL)
@@ -26,4 +81,20 @@ class OllamaGUI:
         self.right_pane.add(self.chat_frame)
         
         self.control_frame = ControlFrame(self.right_pane, self)  # Pass self as controller
-        self.right_pane.add(self.control_frame)
\ No newline at end of file
+        self.right_pane.add(self.control_frame)
+
+    def snapshot_damaged(self, problems):
+        messagebox.showwarning(
+            "Knowledge Base",
+            "The saved knowledge base is damaged; it will be rewritten from memory on the next save:\n"
+            + "\n".join(problems[:5])
+        )
+
+    def on_closing(self):
+        # Keep what was ingested since the last periodic save
+        if self.pipeline.snapshots is not None:
+            try:
+                self.pipeline.snapshots.save(self.pipeline.knowledge)
+            except Exception as e:
+                logger.error(f"Saving the knowledge-base snapshot failed: {e}")
+        self.root.destroy()
@@ -1,3 +1,4 @@
 from .chat_frame import ChatFrame
 from .model_frame import ModelFrame
-from .control_frame import ControlFrame
\ No newline at end of file
+from .control_frame import ControlFrame
+from .compare_frame import CompareWindow
\ No newline at end of file
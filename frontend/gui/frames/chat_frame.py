@@ -1,24 +1,18 @@
 # ========== START OF PART 1 ==========
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, scrolledtext
-import subprocess
 import os
-from PIL import Image
-try:
-    import pytesseract
-except ImportError:
-    pytesseract = None
-import PyPDF2
-import pandas as pd
-import docx
-import io
-from datetime import datetime
-import requests
-from bs4 import BeautifulSoup
+import time
+import asyncio
+import logging
 import threading
 from queue import Queue
 import validators
-from urllib.parse import urlparse
+from core.images import IMAGE_EXTENSIONS
+from core.ingestion import ingest_file, ingest_url
+from core.pipeline import ChatRequest
+
+logger = logging.getLogger(__name__)
 
 class ChatFrame(ttk.Frame):
     def __init__(self, parent, controller):
@@ -27,7 +21,16 @@ class ChatFrame(ttk.Frame):
         self.current_model = None
         self.file_content = None
         self.current_file = None
-        self.knowledge_base = []
+        # Images attached to the next message, already encoded for the model
+        self.pending_images = []
+        # Chat, retrieval and ingestion logic is shared with the HTTP service
+        self.pipeline = controller.pipeline
+        self.knowledge = self.pipeline.knowledge
+        self.conversation = self.pipeline.new_conversation()
+        self.prefetch_settings = controller.settings.current_settings.get('prefetch', {})
+        self.prefetch_job = None
+        self.warmed_at = {}
+        controller.refresher.on_report = self.on_refresh_report
         self.url_history = []
         self.processing_queue = Queue()
         self.create_widgets()
@@ -64,6 +67,7 @@ class ChatFrame(ttk.Frame):
             wrap=tk.WORD
         )
         self.message_input.bind('<Return>', self.handle_return)
+        self.message_input.bind('<KeyRelease>', self.schedule_prefetch)
         self.message_input.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0,5))
 
         self.send_button = ttk.Button(
@@ -105,6 +109,8 @@ class ChatFrame(ttk.Frame):
                   command=self.add_url).pack(side=tk.LEFT, padx=2)
         ttk.Button(url_buttons, text="Batch URLs", 
                   command=self.batch_urls).pack(side=tk.LEFT, padx=2)
+        ttk.Button(url_buttons, text="Refresh URLs", 
+                  command=self.refresh_urls).pack(side=tk.LEFT, padx=2)
 
         # RAG Settings
         rag_frame = ttk.LabelFrame(self.kb_frame, text="Knowledge Base Settings")
@@ -118,7 +124,7 @@ class ChatFrame(ttk.Frame):
 
         ttk.Label(rag_frame, text="Relevance Threshold:").pack(padx=5, pady=2)
         self.relevance_threshold = ttk.Scale(rag_frame, from_=0, to=1, orient=tk.HORIZONTAL)
-        self.relevance_threshold.set(0.7)
+        self.relevance_threshold.set(self.pipeline.relevance_threshold)
         self.relevance_threshold.pack(fill=tk.X, padx=5, pady=2)
 
         # RAG toggle
@@ -161,7 +167,7 @@ class ChatFrame(ttk.Frame):
                     func(*args)
                     self.processing_queue.task_done()
                 except Exception as e:
-                    self.add_system_message(f"Error in processing: {str(e)}")
+                    self.after(0, self.add_system_message, f"Error in processing: {str(e)}")
 
         thread = threading.Thread(target=process_queue, daemon=True)
         thread.start()
@@ -172,68 +178,93 @@ class ChatFrame(ttk.Frame):
             return 'break'
         return None
 
+    def schedule_prefetch(self, event=None):
+        # Retrieve for the draft once typing pauses so Send finds the results ready
+        if not self.prefetch_settings.get('enabled', True):
+            return
+        if self.prefetch_job is not None:
+            self.after_cancel(self.prefetch_job)
+        self.prefetch_job = self.after(self.prefetch_settings.get('debounce_ms', 300), self.prefetch_draft)
+        self.warm_model()
+
+    def prefetch_draft(self):
+        self.prefetch_job = None
+        if not self.use_rag.get() or not len(self.knowledge):
+            return
+        draft = self.message_input.get("1.0", tk.END).strip()
+        if draft and not self.knowledge.cached(draft):
+            self.controller.runner.submit(asyncio.to_thread(self.knowledge.prefetch, draft))
+
+    def warm_model(self):
+        # Load the model while the user types instead of on the first token
+        model = self.current_model
+        if not model or not self.prefetch_settings.get('warm_model', True):
+            return
+        now = time.monotonic()
+        if now - self.warmed_at.get(model, float('-inf')) < 60:
+            return
+        self.warmed_at[model] = now
+        self.controller.runner.submit(self.pipeline.warm(model))
+
     def attach_file(self):
         file_path = filedialog.askopenfilename(
             filetypes=[
-                ("All supported", "*.txt *.pdf *.docx *.csv *.jpg *.jpeg *.png"),
+                ("All supported", "*.txt *.pdf *.docx *.csv " + " ".join(f"*{ext}" for ext in IMAGE_EXTENSIONS)),
                 ("Text files", "*.txt"),
                 ("PDF files", "*.pdf"),
                 ("Word documents", "*.docx"),
                 ("CSV files", "*.csv"),
-                ("Images", "*.jpg *.jpeg *.png"),
+                ("Images", " ".join(f"*{ext}" for ext in IMAGE_EXTENSIONS)),
                 ("All files", "*.*")
             ]
         )
-        if file_path:
+        if not file_path:
+            return
+        if os.path.splitext(file_path)[1].lower() in IMAGE_EXTENSIONS:
+            self.attach_image(file_path)
+        else:
             self.process_file(file_path)
 
-    def process_file(self, file_path):
+    def attach_image(self, file_path):
+        # Images go to the model with the next message; decode and resize off the UI thread
+        self.file_label.config(text=f"Preparing image: {os.path.basename(file_path)}...")
+        future = self.controller.runner.submit(asyncio.to_thread(self.pipeline.images.encode, file_path))
+        future.add_done_callback(lambda f: self.after(0, self.image_ready, f))
+
+    def image_ready(self, future):
         try:
-            filename = os.path.basename(file_path)
-            extension = os.path.splitext(file_path)[1].lower()
-
-            if extension == '.pdf':
-                content = self.read_pdf(file_path)
-            elif extension == '.docx':
-                content = self.read_docx(file_path)
-            elif extension == '.csv':
-                content = self.read_csv(file_path)
-            elif extension in ['.jpg', '.jpeg', '.png']:
-                content = self.read_image(file_path)
-            else:
-                content = self.read_text(file_path)
-
-            self.add_to_kb(content, f"File: {filename}")
-            self.file_label.config(text=f"Added: {filename}")
-            
+            image = future.result()
         except Exception as e:
-            messagebox.showerror("Error", f"Could not process file: {str(e)}")
-
-    def read_pdf(self, file_path):
-        with open(file_path, 'rb') as file:
-            reader = PyPDF2.PdfReader(file)
-            return "\n".join(page.extract_text() for page in reader.pages)
-
-    def read_docx(self, file_path):
-        doc = docx.Document(file_path)
-        return "\n".join(paragraph.text for paragraph in doc.paragraphs)
+            self.file_label.config(text="No file attached")
+            messagebox.showerror("Error", f"Could not read image: {str(e)}")
+            return
+        if all(pending.digest != image.digest for pending in self.pending_images):
+            self.pending_images.append(image)
+        self.file_label.config(text="Next message: " + ", ".join(i.summary() for i in self.pending_images))
 
-    def read_csv(self, file_path):
-        df = pd.read_csv(file_path)
-        return df.to_string()
+    def process_file(self, file_path):
+        # Parsing and embedding can take a while; ingest on the processing thread
+        self.file_label.config(text=f"Processing: {os.path.basename(file_path)}...")
+        self.processing_queue.put((self.ingest_document, [file_path]))
 
-    def read_image(self, file_path):
-        if pytesseract is None:
-            return "OCR not available. Please install pytesseract."
+    def ingest_document(self, file_path):
+        # Runs on the processing thread
         try:
-            img = Image.open(file_path)
-            return pytesseract.image_to_string(img)
+            report = ingest_file(self.knowledge, file_path)
         except Exception as e:
-            return f"Failed to process image: {str(e)}"
+            self.after(0, self.file_failed, str(e))
+            return
+        self.after(0, self.file_added, file_path, report)
+
+    def file_added(self, file_path, report):
+        self.update_kb_view()
+        self.file_label.config(text=f"Added: {os.path.basename(file_path)}")
+        if report.skipped:
+            self.add_system_message(report.summary())
 
-    def read_text(self, file_path):
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
-            return file.read()
+    def file_failed(self, error):
+        self.file_label.config(text="No file attached")
+        messagebox.showerror("Error", f"Could not process file: {error}")
 # ========== END OF PART 3A ==========
 # ========== START OF PART 3B ==========
     def add_url(self):
@@ -251,22 +282,15 @@ class ChatFrame(ttk.Frame):
         self.add_system_message(f"Processing URL: {url}")
 
     def process_url(self, url):
+        # Runs on the processing thread
         try:
-            response = requests.get(url, timeout=10)
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Clean content
-            for tag in soup(['script', 'style']):
-                tag.decompose()
-            
-            text = soup.get_text(separator='\n')
-            lines = [line.strip() for line in text.splitlines() if line.strip()]
-            content = '\n'.join(lines)
-            
-            self.add_to_kb(content, f"URL: {url}")
+            report = ingest_url(self.knowledge, url)
+            self.after(0, self.update_kb_view)
+            if report.skipped:
+                self.after(0, self.add_system_message, report.summary())
             
         except Exception as e:
-            self.add_system_message(f"Failed to process {url}: {str(e)}")
+            self.after(0, self.add_system_message, f"Failed to process {url}: {str(e)}")
 
     def batch_urls(self):
         file_path = filedialog.askopenfilename(
@@ -291,25 +315,42 @@ class ChatFrame(ttk.Frame):
         except Exception as e:
             messagebox.showerror("Error", f"Failed to process URLs: {str(e)}")
 
-    def add_to_kb(self, content, source):
-        entry = {
-            'content': content,
-            'source': source,
-            'date': datetime.now(),
-            'size': len(content)
-        }
-        self.knowledge_base.append(entry)
+    def refresh_urls(self):
+        # Re-crawl URL sources in the background; only changed pages are re-indexed
+        if self.controller.refresher.running:
+            self.add_system_message("A URL refresh is already running")
+            return
+        self.add_system_message("Refreshing URL sources...")
+        future = self.controller.runner.submit(self.controller.refresher.refresh())
+        future.add_done_callback(lambda f: self.after(0, self.refresh_done, f))
+
+    def refresh_done(self, future):
+        try:
+            report = future.result()
+        except Exception as e:
+            self.add_system_message(f"URL refresh failed: {str(e)}")
+            return
+        if report is not None:
+            self.show_refresh_report(report)
+
+    def on_refresh_report(self, report):
+        # Scheduled refreshes report from the asyncio thread
+        if report.changed or report.removed:
+            self.after(0, self.show_refresh_report, report)
+
+    def show_refresh_report(self, report):
+        self.add_system_message(report.summary())
         self.update_kb_view()
 
     def update_kb_view(self):
         for item in self.kb_tree.get_children():
             self.kb_tree.delete(item)
         
-        for entry in self.knowledge_base:
+        for entry in self.knowledge.entries:
             self.kb_tree.insert('', 'end', values=(
-                entry['source'],
-                f"{entry['size']/1024:.1f} KB",
-                entry['date'].strftime("%Y-%m-%d %H:%M")
+                entry.source,
+                f"{entry.size/1024:.1f} KB" + (f" ({entry.skipped}/{entry.chunks} dup)" if entry.skipped else ""),
+                entry.date.strftime("%Y-%m-%d %H:%M")
             ))
 
     def remove_kb_entry(self):
@@ -317,16 +358,14 @@ class ChatFrame(ttk.Frame):
         if not selected:
             return
         
-        for item in selected:
-            idx = self.kb_tree.index(item)
-            if 0 <= idx < len(self.knowledge_base):
-                del self.knowledge_base[idx]
-        
+        entries = self.knowledge.entries
+        indices = [self.kb_tree.index(item) for item in selected]
+        self.knowledge.remove(entries[idx].id for idx in indices if 0 <= idx < len(entries))
         self.update_kb_view()
 
     def clear_kb(self):
         if messagebox.askyesno("Confirm", "Clear entire knowledge base?"):
-            self.knowledge_base.clear()
+            self.knowledge.clear()
             self.update_kb_view()
 # ========== END OF PART 3B ==========
 # ========== START OF PART 3C ==========
@@ -337,29 +376,9 @@ class ChatFrame(ttk.Frame):
         else:
             self.add_system_message("No model loaded")
 
-    def process_with_rag(self, message):
-        if not self.use_rag.get() or not self.knowledge_base:
-            return message
-
-        context_size = int(self.context_size.get())
-        threshold = self.relevance_threshold.get()
-
-        relevant_contexts = []
-        for entry in self.knowledge_base:
-            if any(term.lower() in entry['content'].lower() for term in message.split()):
-                preview = entry['content'][:500]  # Larger context window
-                relevant_contexts.append(f"From {entry['source']}:\n{preview}")
-                if len(relevant_contexts) >= context_size:
-                    break
-
-        if relevant_contexts:
-            context_text = "\n\n".join(relevant_contexts)
-            return f"""Using knowledge base with {len(relevant_contexts)} relevant contexts:
-
-{context_text}
-
-Question: {message}"""
-        return message
+    def prompt_budget(self):
+        control_frame = self.controller.control_frame
+        return control_frame.get_context_window(), control_frame.get_max_tokens()
 
     def send_message(self):
         if not self.current_model:
@@ -370,39 +389,74 @@ Question: {message}"""
         if not message:
             return
 
-        # Disable input while processing
+        # Show user message, then disable input while processing
+        self.add_message("You", message)
+        self.message_input.delete("1.0", tk.END)
         self.message_input.configure(state=tk.DISABLED)
         self.send_button.configure(state=tk.DISABLED)
-        
-        # Process with RAG if enabled
-        full_message = self.process_with_rag(message)
 
-        # Show user message
-        self.add_message("You", message)
-        self.message_input.delete("1.0", tk.END)
+        context_window, answer_tokens = self.prompt_budget()
+        request = ChatRequest(
+            message,
+            self.current_model,
+            use_rag=self.use_rag.get(),
+            context_size=int(self.context_size.get()),
+            relevance_threshold=float(self.relevance_threshold.get()),
+            context_window=context_window,
+            max_tokens=answer_tokens,
+            images=self.pending_images
+        )
+        if self.pending_images:
+            self.pending_images = []
+            self.file_label.config(text="No file attached")
+        self.controller.runner.submit(self.reply(request))
 
+    async def reply(self, request):
+        # Runs on the controller's asyncio thread; widgets are only touched via after()
         try:
-            # Send to Ollama
-            result = subprocess.run(
-                ['ollama', 'run', self.current_model],
-                input=full_message,
-                text=True,
-                capture_output=True,
-                encoding='utf-8',
-                errors='ignore'
-            )
-            
-            if result.returncode == 0:
-                self.add_message("Assistant", result.stdout.strip())
-            else:
-                self.add_system_message(f"Error: {result.stderr}")
+            # Retrieval may wait on the embedding server; keep it off both the UI and the event loop
+            turn = await asyncio.to_thread(self.pipeline.prepare, request, self.conversation)
         except Exception as e:
-            self.add_system_message(f"Error: {str(e)}")
-        finally:
-            # Re-enable input
-            self.message_input.configure(state=tk.NORMAL)
-            self.send_button.configure(state=tk.NORMAL)
-            self.message_input.focus()
+            self.after(0, self.add_system_message, f"Error: {str(e)}")
+            self.after(0, self.enable_input)
+            return
+        self.after(0, self.begin_message, "Assistant")
+        await self.stream_reply(turn)
+
+    async def stream_reply(self, turn):
+        async for text in self.pipeline.stream(turn, self.conversation):
+            self.after(0, self.append_stream_text, text)
+        if not turn.timing.success:
+            self.after(0, self.add_system_message, f"Error: {turn.timing.error}")
+        self.after(0, self.finish_reply, turn.timing)
+
+    def clear_conversation(self):
+        self.pipeline.cancel_compaction(self.conversation)
+        self.conversation.clear()
+
+    def finish_reply(self, timing):
+        self.chat_display.configure(state=tk.NORMAL)
+        self.chat_display.insert(tk.END, "\n")
+        self.chat_display.configure(state=tk.DISABLED)
+        self.controller.control_frame.show_generation_metrics(timing)
+        self.enable_input()
+
+    def enable_input(self):
+        self.message_input.configure(state=tk.NORMAL)
+        self.send_button.configure(state=tk.NORMAL)
+        self.message_input.focus()
+
+    def begin_message(self, sender):
+        self.chat_display.configure(state=tk.NORMAL)
+        self.chat_display.insert(tk.END, f"\n{sender}: ")
+        self.chat_display.see(tk.END)
+        self.chat_display.configure(state=tk.DISABLED)
+
+    def append_stream_text(self, text):
+        self.chat_display.configure(state=tk.NORMAL)
+        self.chat_display.insert(tk.END, text)
+        self.chat_display.see(tk.END)
+        self.chat_display.configure(state=tk.DISABLED)
 
     def add_message(self, sender, message):
         self.chat_display.configure(state=tk.NORMAL)
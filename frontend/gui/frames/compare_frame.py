@@ -0,0 +1,164 @@
+# gui/frames/compare_frame.py
+import asyncio
+import tkinter as tk
+from tkinter import ttk, messagebox, scrolledtext
+
+from core.pipeline import ChatRequest
+
+
+class CompareWindow(tk.Toplevel):
+    def __init__(self, parent, controller, models):
+        """
+        Send one prompt to several models at once and stream the answers side by side.
+
+        Every model gets the same knowledge-base context, using the chat
+        frame's RAG settings and the control frame's token budget. Load
+        time, first-token latency and decode rate land in the metrics
+        database like any other generation.
+
+        Args:
+            parent: Widget the window belongs to
+            controller: OllamaGUI with the pipeline, runner and other frames
+            models: Model names offered for selection
+        """
+        super().__init__(parent)
+        self.controller = controller
+        self.title("Compare Models")
+        self.geometry("1200x700")
+        self.panes = {}
+        self.future = None
+        self.create_widgets(models)
+        self.protocol("WM_DELETE_WINDOW", self.close)
+
+    def create_widgets(self, models):
+        top = ttk.Frame(self)
+        top.pack(fill=tk.X, padx=5, pady=5)
+
+        model_frame = ttk.LabelFrame(top, text="Models")
+        model_frame.pack(side=tk.LEFT, fill=tk.Y, padx=(0, 5))
+        self.model_list = tk.Listbox(model_frame, height=6, selectmode=tk.EXTENDED, exportselection=False)
+        for model in models:
+            self.model_list.insert(tk.END, model)
+        self.model_list.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        prompt_frame = ttk.LabelFrame(top, text="Prompt")
+        prompt_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.prompt_input = scrolledtext.ScrolledText(prompt_frame, height=6, font=('Arial', 10), wrap=tk.WORD)
+        self.prompt_input.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        controls = ttk.Frame(top)
+        controls.pack(side=tk.LEFT, fill=tk.Y, padx=5)
+        self.run_button = ttk.Button(controls, text="Run", command=self.run)
+        self.run_button.pack(fill=tk.X, pady=2)
+        self.status_label = ttk.Label(controls, text="", wraplength=150)
+        self.status_label.pack(fill=tk.X, pady=2)
+
+        # One streaming pane per model, rebuilt for every run
+        self.pane_window = ttk.PanedWindow(self, orient=tk.HORIZONTAL)
+        self.pane_window.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        results = ttk.LabelFrame(self, text="Latency")
+        results.pack(fill=tk.X, padx=5, pady=5)
+        columns = (("model", "Model", 160), ("load", "Load", 80), ("ttft", "First Token", 90),
+                   ("tps", "Tokens/s", 80), ("tokens", "Tokens", 70), ("total", "Total", 80),
+                   ("status", "Status", 200))
+        self.results_tree = ttk.Treeview(results, columns=[c[0] for c in columns], show="headings", height=4)
+        for key, label, width in columns:
+            self.results_tree.heading(key, text=label)
+            self.results_tree.column(key, width=width)
+        self.results_tree.pack(fill=tk.X, padx=5, pady=5)
+
+    def run(self):
+        models = [self.model_list.get(i) for i in self.model_list.curselection()]
+        prompt = self.prompt_input.get("1.0", tk.END).strip()
+        if len(models) < 2:
+            messagebox.showwarning("Warning", "Select at least two models", parent=self)
+            return
+        if not prompt:
+            messagebox.showwarning("Warning", "Enter a prompt", parent=self)
+            return
+
+        chat_frame = self.controller.chat_frame
+        context_window, answer_tokens = chat_frame.prompt_budget()
+        request = ChatRequest(
+            prompt,
+            models[0],
+            use_rag=chat_frame.use_rag.get(),
+            context_size=int(chat_frame.context_size.get()),
+            relevance_threshold=float(chat_frame.relevance_threshold.get()),
+            context_window=context_window,
+            max_tokens=answer_tokens
+        )
+        self.create_panes(models)
+        self.run_button.configure(state=tk.DISABLED)
+        self.status_label.config(text=f"Running {len(models)} models...")
+        self.future = self.controller.runner.submit(self.compare(request, models))
+        self.future.add_done_callback(lambda f: self.post(self.compare_done, f))
+
+    async def compare(self, request, models):
+        # Runs on the controller's asyncio thread; widgets are only touched via after()
+        pipeline = self.controller.pipeline
+        turns = await asyncio.to_thread(pipeline.prepare_comparison, request, models)
+        return await pipeline.compare(
+            turns, lambda turn, text: self.post(self.append_text, turn.request.model, text))
+
+    def post(self, callback, *args):
+        # Text can still arrive while the window is being closed
+        try:
+            self.after(0, callback, *args)
+        except (tk.TclError, RuntimeError):
+            pass
+
+    def create_panes(self, models):
+        for pane in self.pane_window.panes():
+            self.pane_window.forget(pane)
+        for item in self.results_tree.get_children():
+            self.results_tree.delete(item)
+        self.panes = {}
+        for model in models:
+            frame = ttk.LabelFrame(self.pane_window, text=model)
+            text = scrolledtext.ScrolledText(frame, wrap=tk.WORD, font=('Arial', 10), bg='white', width=30)
+            text.pack(fill=tk.BOTH, expand=True, padx=2, pady=2)
+            text.configure(state=tk.DISABLED)
+            self.pane_window.add(frame, weight=1)
+            self.panes[model] = text
+
+    def append_text(self, model, text):
+        pane = self.panes.get(model)
+        if pane is None:
+            return
+        pane.configure(state=tk.NORMAL)
+        pane.insert(tk.END, text)
+        pane.see(tk.END)
+        pane.configure(state=tk.DISABLED)
+
+    def compare_done(self, future):
+        self.run_button.configure(state=tk.NORMAL)
+        if future.cancelled():
+            return
+        try:
+            turns = future.result()
+        except Exception as e:
+            self.status_label.config(text=f"Failed: {str(e)}")
+            return
+
+        def seconds(value):
+            return "-" if value is None else f"{value:.2f}s"
+
+        for turn in sorted(turns, key=lambda t: (not t.timing.success, t.timing.time_to_first_token or 0)):
+            timing = turn.timing
+            self.results_tree.insert("", tk.END, values=(
+                timing.model,
+                seconds(timing.load_duration),
+                seconds(timing.time_to_first_token),
+                f"{timing.tokens_per_second:.1f}",
+                timing.eval_count,
+                seconds(timing.total_time),
+                "ok" if timing.success else timing.error
+            ))
+        self.status_label.config(text="Done")
+
+    def close(self):
+        if self.future is not None and not self.future.done():
+            self.future.cancel()
+        self.destroy()
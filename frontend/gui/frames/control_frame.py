@@ -24,6 +24,11 @@ class ControlFrame(ttk.Frame):
         self.create_metrics(metrics_frame)
         notebook.add(metrics_frame, text="Metrics")
 
+        # Diagnostics tab
+        diagnostics_frame = ttk.Frame(notebook)
+        self.create_diagnostics(diagnostics_frame)
+        notebook.add(diagnostics_frame, text="Diagnostics")
+
     def create_settings(self, parent):
         # Model Parameters
         param_frame = ttk.LabelFrame(parent, text="Model Parameters")
@@ -37,20 +42,52 @@ class ControlFrame(ttk.Frame):
 
         # Max tokens
         ttk.Label(param_frame, text="Max Tokens:").pack(padx=5, pady=2)
-        token_entry = ttk.Entry(param_frame)
-        token_entry.insert(0, "2000")
-        token_entry.pack(fill=tk.X, padx=5, pady=2)
+        self.token_entry = ttk.Entry(param_frame)
+        self.token_entry.insert(0, "2000")
+        self.token_entry.pack(fill=tk.X, padx=5, pady=2)
 
         # Context window
         ttk.Label(param_frame, text="Context Window:").pack(padx=5, pady=2)
-        context_entry = ttk.Entry(param_frame)
-        context_entry.insert(0, "4096")
-        context_entry.pack(fill=tk.X, padx=5, pady=2)
+        self.context_entry = ttk.Entry(param_frame)
+        self.context_entry.insert(0, "4096")
+        self.context_entry.pack(fill=tk.X, padx=5, pady=2)
 
         # Save button
         ttk.Button(param_frame, text="Save Settings").pack(padx=5, pady=5)
 
+    @staticmethod
+    def read_int(entry, default):
+        try:
+            return max(1, int(entry.get()))
+        except ValueError:
+            return default
+
+    def get_context_window(self):
+        return self.read_int(self.context_entry, 4096)
+
+    def get_max_tokens(self):
+        return self.read_int(self.token_entry, 2000)
+
     def create_metrics(self, parent):
+        # Live breakdown of the most recent generation
+        latency_frame = ttk.LabelFrame(parent, text="Last Request")
+        latency_frame.pack(fill=tk.X, padx=5, pady=5)
+
+        self.latency_vars = {}
+        fields = [
+            ("model", "Model"), ("queue_time", "Queue"), ("retrieval_time", "Retrieval"),
+            ("load_duration", "Model Load"), ("prompt_eval", "Prompt Eval"),
+            ("time_to_first_token", "First Token"), ("eval", "Decode"),
+            ("tokens_per_second", "Tokens/s"), ("total_time", "Total"),
+            ("client_overhead", "Client Overhead"),
+        ]
+        for i, (key, label) in enumerate(fields):
+            row, col = divmod(i, 2)
+            ttk.Label(latency_frame, text=f"{label}:").grid(row=row, column=col * 2, sticky=tk.W, padx=5, pady=1)
+            self.latency_vars[key] = tk.StringVar(value="-")
+            ttk.Label(latency_frame, textvariable=self.latency_vars[key]).grid(
+                row=row, column=col * 2 + 1, sticky=tk.W, padx=5, pady=1)
+
         # Create metrics display frame
         metrics_display = ttk.LabelFrame(parent, text="Usage Metrics")
         metrics_display.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
@@ -88,17 +125,115 @@ class ControlFrame(ttk.Frame):
         self.metrics_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5, pady=5)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y, pady=5)
 
+        # Per-model latency over the same dates, for choosing models to deploy
+        latency_table = ttk.LabelFrame(parent, text="Latency by Model")
+        latency_table.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        columns = (("model", "Model", 140), ("runs", "Runs", 50), ("load", "Load", 70),
+                   ("ttft", "First Token", 80), ("ttft_max", "Worst First Token", 110),
+                   ("tps", "Tokens/s", 70), ("total", "Total", 70), ("success", "Success", 60))
+        self.model_latency_tree = ttk.Treeview(latency_table, columns=[c[0] for c in columns], show="headings", height=5)
+        for key, label, width in columns:
+            self.model_latency_tree.heading(key, text=label)
+            self.model_latency_tree.column(key, width=width)
+        self.model_latency_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+    def create_diagnostics(self, parent):
+        # UI responsiveness, fed by the controller's watchdog
+        lag_frame = ttk.LabelFrame(parent, text="UI Responsiveness")
+        lag_frame.pack(fill=tk.X, padx=5, pady=5)
+
+        self.lag_label = ttk.Label(lag_frame, text="Watchdog disabled")
+        self.lag_label.pack(anchor=tk.W, padx=5, pady=2)
+        self.stall_label = ttk.Label(lag_frame, text="", wraplength=500, justify=tk.LEFT)
+        self.stall_label.pack(anchor=tk.W, padx=5, pady=2)
+
+        # On-demand profiling of the UI thread
+        profile_frame = ttk.LabelFrame(parent, text="Profiler")
+        profile_frame.pack(fill=tk.X, padx=5, pady=5)
+
+        self.profile_mode = tk.StringVar(value="sampling")
+        for mode, label in (("sampling", "Sampling (low overhead)"), ("cprofile", "cProfile (exact)")):
+            ttk.Radiobutton(profile_frame, text=label, value=mode,
+                            variable=self.profile_mode).pack(anchor=tk.W, padx=5)
+
+        self.profile_button = ttk.Button(profile_frame, text="Start Profiling", command=self.toggle_profiler)
+        self.profile_button.pack(padx=5, pady=5)
+        self.profile_label = ttk.Label(profile_frame, text="")
+        self.profile_label.pack(anchor=tk.W, padx=5, pady=2)
+
+        self.after(1000, self.refresh_diagnostics)
+
+    def refresh_diagnostics(self):
+        watchdog = self.controller.watchdog
+        if watchdog:
+            stats = watchdog.stats()
+            self.lag_label.config(text=(
+                f"Event-loop lag: {stats['last'] * 1000:.0f} ms (p95 {stats['p95'] * 1000:.0f} ms, "
+                f"max {stats['max'] * 1000:.0f} ms), stalls: {stats['stalls']}"
+            ))
+            if watchdog.stalls:
+                stall = watchdog.stalls[-1]
+                self.stall_label.config(text=(
+                    f"Last stall {stall.started_at.strftime('%H:%M:%S')}, "
+                    f"{stall.duration * 1000:.0f} ms in {stall.culprit}"
+                ))
+        self.after(1000, self.refresh_diagnostics)
+
+    def toggle_profiler(self):
+        profiler = self.controller.profiler
+        if profiler.active:
+            path = profiler.stop()
+            self.profile_button.config(text="Start Profiling")
+            self.profile_label.config(text=f"Saved: {path}")
+        else:
+            profiler.start(self.profile_mode.get())
+            self.profile_button.config(text="Stop Profiling")
+            self.profile_label.config(text=f"Profiling ({profiler.mode})...")
+
+    def show_generation_metrics(self, metrics):
+        def seconds(value):
+            return "-" if value is None else f"{value * 1000:.0f} ms"
+
+        values = {
+            "model": metrics.model if metrics.success else f"{metrics.model} (failed)",
+            "queue_time": seconds(metrics.queue_time),
+            "retrieval_time": seconds(metrics.retrieval_time),
+            "load_duration": seconds(metrics.load_duration),
+            "prompt_eval": f"{seconds(metrics.prompt_eval_duration)} ({metrics.prompt_eval_count} tok)",
+            "time_to_first_token": seconds(metrics.time_to_first_token),
+            "eval": f"{seconds(metrics.eval_duration)} ({metrics.eval_count} tok)",
+            "tokens_per_second": f"{metrics.tokens_per_second:.1f}",
+            "total_time": seconds(metrics.total_time),
+            "client_overhead": seconds(metrics.client_overhead),
+        }
+        for key, value in values.items():
+            self.latency_vars[key].set(value)
+
     def update_metrics(self):
         # Clear current items
         for item in self.metrics_tree.get_children():
             self.metrics_tree.delete(item)
-            
-        # Add dummy data (replace with actual data from database)
-        example_data = [
-            ("2024-03-01", "1000", "0.5s", "95%"),
-            ("2024-03-02", "1200", "0.6s", "93%"),
-            ("2024-03-03", "900", "0.4s", "97%")
-        ]
-        
-        for data in example_data:
-            self.metrics_tree.insert("", tk.END, values=data)
\ No newline at end of file
+
+        rows = self.controller.db.get_daily_metrics(self.start_date.get_date(), self.end_date.get_date())
+        for day, tokens, response_time, _ttft, _tps, success_rate in rows:
+            self.metrics_tree.insert("", tk.END, values=(
+                day,
+                tokens or 0,
+                f"{response_time or 0:.2f}s",
+                f"{(success_rate or 0) * 100:.0f}%"
+            ))
+
+        for item in self.model_latency_tree.get_children():
+            self.model_latency_tree.delete(item)
+        rows = self.controller.db.get_model_latency(self.start_date.get_date(), self.end_date.get_date())
+        for model, runs, load, ttft, ttft_max, tps, total, success_rate in rows:
+            self.model_latency_tree.insert("", tk.END, values=(
+                model,
+                runs,
+                f"{load or 0:.2f}s",
+                f"{ttft or 0:.2f}s",
+                f"{ttft_max or 0:.2f}s",
+                f"{tps or 0:.1f}",
+                f"{total or 0:.2f}s",
+                f"{(success_rate or 0) * 100:.0f}%"
+            ))
\ No newline at end of file
@@ -1,7 +1,8 @@
 # gui/frames/model_frame.py
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, simpledialog
 import subprocess
+from .compare_frame import CompareWindow
 
 class ModelFrame(ttk.Frame):
     def __init__(self, parent, controller):
@@ -9,6 +10,7 @@ class ModelFrame(ttk.Frame):
         self.controller = controller
         self.loaded_model = None
         self.create_widgets()
+        self.controller.pull_manager.on_update = self.on_pull_update
         self.refresh_models()
 
     def create_widgets(self):
@@ -34,8 +36,25 @@ class ModelFrame(ttk.Frame):
         
         ttk.Button(refresh_frame, text="Refresh Model", 
                   command=self.refresh_model).pack(fill=tk.X, padx=5, pady=2)
+        ttk.Button(refresh_frame, text="Pull Models...", 
+                  command=self.pull_models).pack(fill=tk.X, padx=5, pady=2)
+        ttk.Button(refresh_frame, text="Compare Models...", 
+                  command=self.compare_models).pack(fill=tk.X, padx=5, pady=2)
         ttk.Button(refresh_frame, text="Clear Context", 
                   command=self.clear_context).pack(fill=tk.X, padx=5, pady=2)
+
+        # Download progress, one row per model with its layers underneath
+        pull_frame = ttk.LabelFrame(self, text="Downloads")
+        pull_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.pull_tree = ttk.Treeview(pull_frame, columns=("status", "progress", "speed"), height=6)
+        self.pull_tree.heading("#0", text="Model / Layer")
+        self.pull_tree.heading("status", text="Status")
+        self.pull_tree.heading("progress", text="Progress")
+        self.pull_tree.heading("speed", text="Speed")
+        self.pull_tree.column("#0", width=140)
+        for column in ("status", "progress", "speed"):
+            self.pull_tree.column(column, width=80)
+        self.pull_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         
         # Status
         self.status_frame = ttk.LabelFrame(self, text="Model Status")
@@ -106,21 +125,80 @@ class ModelFrame(ttk.Frame):
         messagebox.showinfo("Success", "Model unloaded")
 
     def refresh_model(self):
-        try:
-            model_name = self.loaded_model
-            if model_name:
-                subprocess.run(['ollama', 'pull', model_name])
-                messagebox.showinfo("Success", f"Model {model_name} refreshed")
+        model_name = self.loaded_model
+        if model_name:
+            self.start_pulls([model_name])
+        else:
+            messagebox.showwarning("Warning", "No model is currently loaded")
+
+    def pull_models(self):
+        names = simpledialog.askstring("Pull Models", "Model names (comma or space separated):", parent=self)
+        if names:
+            models = [name for name in names.replace(",", " ").split() if name]
+            if models:
+                self.start_pulls(models)
+
+    def compare_models(self):
+        models = list(self.model_list.get(0, tk.END))
+        if len(models) < 2:
+            messagebox.showwarning("Warning", "At least two models are needed to compare")
+            return
+        CompareWindow(self, self.controller, models)
+
+    def start_pulls(self, models):
+        # Pulls run on the controller's event loop; progress arrives through on_pull_update
+        future = self.controller.runner.submit(self.controller.pull_manager.pull_many(models))
+        future.add_done_callback(lambda f: self.after(0, self.pulls_finished, f))
+
+    def on_pull_update(self, status):
+        # Called on the event-loop thread
+        self.after(0, self.show_pull_status, status)
+
+    def show_pull_status(self, status):
+        item = f"pull:{status.model}"
+        values = (
+            status.state if status.state != "pulling" else status.message,
+            f"{status.fraction * 100:.0f}%" if status.total else "",
+            self.format_rate(status.bytes_per_second) if status.state == "pulling" else ""
+        )
+        if self.pull_tree.exists(item):
+            self.pull_tree.item(item, values=values)
+        else:
+            self.pull_tree.insert("", 0, iid=item, text=status.model, values=values, open=True)
+
+        for digest, layer in list(status.layers.items()):
+            layer_item = f"{item}:{digest}"
+            layer_values = (
+                "done" if layer.total and layer.completed >= layer.total else "",
+                f"{layer.completed / 2**20:.0f}/{layer.total / 2**20:.0f} MB",
+                self.format_rate(layer.bytes_per_second) if layer.completed < layer.total else ""
+            )
+            if self.pull_tree.exists(layer_item):
+                self.pull_tree.item(layer_item, values=layer_values)
             else:
-                messagebox.showwarning("Warning", "No model is currently loaded")
+                self.pull_tree.insert(item, tk.END, iid=layer_item, text=digest[7:19], values=layer_values)
+
+    @staticmethod
+    def format_rate(bytes_per_second):
+        return f"{bytes_per_second / 2**20:.1f} MB/s" if bytes_per_second else ""
+
+    def pulls_finished(self, future):
+        try:
+            statuses = future.result()
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to refresh model: {str(e)}")
+            messagebox.showerror("Error", f"Failed to pull models: {str(e)}")
+            return
+        failed = [status for status in statuses if status.state == "failed"]
+        if failed:
+            messagebox.showerror("Error", "\n".join(f"{s.model}: {s.error}" for s in failed))
+        self.refresh_models()
 
     def clear_context(self):
         if self.loaded_model:
             self.controller.chat_frame.chat_display.configure(state=tk.NORMAL)
             self.controller.chat_frame.chat_display.delete("1.0", tk.END)
             self.controller.chat_frame.chat_display.configure(state=tk.DISABLED)
+            self.controller.chat_frame.clear_conversation()
             self.controller.chat_frame.add_system_message("Context cleared")
         else:
             messagebox.showwarning("Warning", "No model is currently loaded")
\ No newline at end of file
@@ -1,3 +1,4 @@
 from .model_manager import ModelManager
+from .pull_manager import PullManager, PullStatus, LayerProgress
 
-__all__ = ['ModelManager']
\ No newline at end of file
+__all__ = ['ModelManager', 'PullManager', 'PullStatus', 'LayerProgress']
\ No newline at end of file
@@ -0,0 +1,175 @@
+# models/pull_manager.py
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional
+
+import aiohttp
+
+from utils.api_client import OllamaAPI, OllamaAPIError, ProgressUpdate
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LayerProgress:
+    digest: str
+    total: int = 0
+    completed: int = 0
+    bytes_per_second: float = 0.0
+    updated_at: float = 0.0
+
+    def update(self, total: int, completed: int, now: float, smoothing: float = 0.3) -> None:
+        if self.updated_at and completed > self.completed and now > self.updated_at:
+            rate = (completed - self.completed) / (now - self.updated_at)
+            # Exponential moving average keeps the displayed speed from jittering
+            self.bytes_per_second = rate if not self.bytes_per_second else (
+                smoothing * rate + (1 - smoothing) * self.bytes_per_second)
+        self.total = total or self.total
+        self.completed = completed
+        self.updated_at = now
+
+
+@dataclass
+class PullStatus:
+    model: str
+    state: str = "queued"  # queued, pulling, retrying, done, failed
+    message: str = ""
+    attempts: int = 0
+    layers: Dict[str, LayerProgress] = field(default_factory=dict)
+    error: Optional[str] = None
+    started_at: float = 0.0
+    finished_at: float = 0.0
+
+    @property
+    def total(self) -> int:
+        return sum(layer.total for layer in self.layers.values())
+
+    @property
+    def completed(self) -> int:
+        return sum(layer.completed for layer in self.layers.values())
+
+    @property
+    def bytes_per_second(self) -> float:
+        return sum(layer.bytes_per_second for layer in self.layers.values()
+                   if layer.completed < layer.total)
+
+    @property
+    def fraction(self) -> float:
+        return self.completed / self.total if self.total else 0.0
+
+
+class PullManager:
+    def __init__(
+        self,
+        api: OllamaAPI,
+        max_concurrent: int = 2,
+        max_attempts: int = 5,
+        retry_delay: float = 2.0,
+        on_update: Optional[Callable[[PullStatus], None]] = None,
+        update_interval: float = 0.25
+    ):
+        """
+        Pull models through the streaming /pull endpoint.
+
+        Several pulls run at once, bounded by max_concurrent. A pull that
+        fails on a transport error or timeout is re-issued; Ollama keeps
+        partially downloaded blobs, so the retry resumes rather than restarts.
+
+        Args:
+            api: Client to pull through
+            max_concurrent: Pulls allowed to download at the same time
+            max_attempts: Attempts per model before giving up
+            retry_delay: Base delay for exponential backoff between attempts
+            on_update: Called with a PullStatus whenever progress changes
+            update_interval: Minimum seconds between progress callbacks per model
+        """
+        self.api = api
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.on_update = on_update
+        self.update_interval = update_interval
+        self.max_concurrent = max_concurrent
+        self.statuses: Dict[str, PullStatus] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._last_notified: Dict[str, float] = {}
+
+    def _notify(self, status: PullStatus, force: bool = False) -> None:
+        if not self.on_update:
+            return
+        now = time.monotonic()
+        if force or now - self._last_notified.get(status.model, 0.0) >= self.update_interval:
+            self._last_notified[status.model] = now
+            self.on_update(status)
+
+    def _set_state(self, status: PullStatus, state: str, message: str = "") -> None:
+        status.state = state
+        status.message = message or state
+        self._notify(status, force=True)
+
+    def _apply(self, status: PullStatus, update: ProgressUpdate) -> None:
+        if update.digest:
+            layer = status.layers.get(update.digest)
+            if layer is None:
+                layer = status.layers[update.digest] = LayerProgress(update.digest)
+            layer.update(update.total, update.completed, time.monotonic())
+        if update.status != status.message:
+            status.message = update.status
+            self._notify(status, force=not update.digest)
+        else:
+            self._notify(status)
+
+    @staticmethod
+    def _is_retryable(error: OllamaAPIError) -> bool:
+        if isinstance(error.__cause__, (aiohttp.ClientError, asyncio.TimeoutError)):
+            return True
+        return error.status_code is not None and error.status_code >= 500
+
+    async def pull(self, model: str) -> PullStatus:
+        """Pull one model, retrying transient failures; a pull already running is awaited, not repeated"""
+        task = self._tasks.get(model)
+        if task is None or task.done():
+            task = self._tasks[model] = asyncio.ensure_future(self._pull(model))
+        # One caller giving up does not cancel the download for the others
+        return await asyncio.shield(task)
+
+    async def _pull(self, model: str) -> PullStatus:
+        status = self.statuses[model] = PullStatus(model)
+        self._notify(status, force=True)
+
+        if self._semaphore is None:
+            # Created lazily so it belongs to the loop the pulls run on
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        async with self._semaphore:
+            status.started_at = time.monotonic()
+            while True:
+                status.attempts += 1
+                self._set_state(status, "pulling", "pulling manifest")
+                try:
+                    async for update in self.api.pull_model_stream(model):
+                        self._apply(status, update)
+                    status.finished_at = time.monotonic()
+                    status.error = None
+                    self._set_state(status, "done", "success")
+                    return status
+                except OllamaAPIError as e:
+                    status.error = e.message
+                    if not self._is_retryable(e) or status.attempts >= self.max_attempts:
+                        status.finished_at = time.monotonic()
+                        self._set_state(status, "failed", e.message)
+                        logger.error(f"Pull of {model} failed: {e.message}")
+                        return status
+                    delay = self.retry_delay * 2 ** (status.attempts - 1) * random.uniform(0.5, 1.5)
+                    self._set_state(status, "retrying", f"retrying in {delay:.0f}s: {e.message}")
+                    if metrics.enabled:
+                        metrics.retries.inc(model, "pull")
+                    logger.warning(f"Pull of {model} interrupted ({e.message}), resuming in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+
+    async def pull_many(self, models: Iterable[str]) -> List[PullStatus]:
+        """Pull several models concurrently (bounded by max_concurrent)"""
+        return await asyncio.gather(*(self.pull(model) for model in dict.fromkeys(models)))
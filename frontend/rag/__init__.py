@@ -1,3 +1,16 @@
 from .knowledge_base import KnowledgeBase
+from .retriever import Chunk, KeywordRetriever, chunk_text
+from .packer import ContextPacker, PackedContext, build_rag_prompt, estimate_tokens
+from .cache import CachedRetriever
+from .segment import SegmentFile
+from .ann import ExactIndex, HNSWIndex, IVFIndex, VectorIndex, create_index, load_index, open_index
+from .embeddings import Embedder
+from .hybrid import HybridRetriever, RetrievalTimings, reciprocal_rank_fusion
 
-__all__ = ['KnowledgeBase']
\ No newline at end of file
+__all__ = [
+    'KnowledgeBase', 'Chunk', 'KeywordRetriever', 'chunk_text',
+    'ContextPacker', 'PackedContext', 'build_rag_prompt', 'estimate_tokens',
+    'CachedRetriever', 'SegmentFile', 'VectorIndex', 'ExactIndex', 'IVFIndex', 'HNSWIndex',
+    'create_index', 'load_index', 'open_index', 'Embedder', 'HybridRetriever', 'RetrievalTimings',
+    'reciprocal_rank_fusion'
+]
\ No newline at end of file
@@ -0,0 +1,652 @@
+# rag/ann.py
+import logging
+import os
+import tempfile
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+from .segment import SegmentFile
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(vectors) -> np.ndarray:
+    """Unit-length float32 rows, so inner products are cosine similarities"""
+    vectors = np.array(vectors, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k highest scores, best first"""
+    if len(scores) > k:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def _save(path: str, **arrays) -> None:
+    # Write next to the target and rename, so a crash never leaves half an index
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+
+
+class VectorIndex:
+    """Cosine-similarity search over vectors labelled with integer ids"""
+    kind = ""
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def add(self, labels: Iterable[int], vectors) -> None:
+        """Insert vectors; a label already present is replaced"""
+        raise NotImplementedError
+
+    def remove(self, labels: Iterable[int]) -> None:
+        raise NotImplementedError
+
+    def search(self, query, k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """(labels, similarities) of the k nearest vectors, best first"""
+        raise NotImplementedError
+
+    def get(self, labels: Iterable[int]) -> np.ndarray:
+        """Stored unit-length vectors of labels that are present, one row each"""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def save(self, path: str) -> None:
+        _save(path, **self._state())
+
+    def _state(self) -> Dict[str, np.ndarray]:
+        raise NotImplementedError
+
+    def _restore(self, state) -> None:
+        raise NotImplementedError
+
+    def _open(self, state) -> None:
+        """Restore from _state() arrays, keeping them rather than copying where the index allows"""
+        self._restore(state)
+
+
+STORAGE_TYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+
+class ExactIndex(VectorIndex):
+    kind = "exact"
+
+    def __init__(self, dim: Optional[int] = None, storage: str = "float32", rerank: int = 64):
+        """
+        Brute-force search: every query is compared with every vector.
+
+        Exact, and the baseline the approximate indexes are measured against.
+
+        Vectors can be held in memory at reduced precision: float16 halves
+        the memory and int8 quarters it. int8 rows are scaled per vector and
+        scored with integer dot products against an int8 copy of the query.
+        With either, full-precision rows go to a file on disk and the best
+        rerank candidates are re-scored from it, so recall stays close to
+        float32.
+
+        Args:
+            dim: Vector length, None to take it from the first add()
+            storage: "float32", "float16" or "int8"
+            rerank: Candidates re-scored at full precision, 0 to rank by the codes alone
+        """
+        if storage not in STORAGE_TYPES:
+            raise ValueError(f"Unknown vector storage {storage!r}, expected one of {', '.join(STORAGE_TYPES)}")
+        self.dim = dim
+        self.storage = storage
+        self.rerank = rerank
+        self.clear()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the stored vectors and their bookkeeping arrays"""
+        return self._vectors.nbytes + self._scales.nbytes + self._rows.nbytes + self._labels.nbytes + self._alive.nbytes
+
+    def clear(self) -> None:
+        self._vectors = np.zeros((0, self.dim or 0), dtype=STORAGE_TYPES[self.storage])
+        self._scales = np.zeros(0, dtype=np.float32)
+        self._rows = np.zeros(0, dtype=np.int64)
+        self._labels = np.zeros(0, dtype=np.int64)
+        self._alive = np.zeros(0, dtype=bool)
+        self._count = 0
+        self._size = 0
+        self._slot_map: Optional[Dict[int, int]] = {}
+        # Full-precision copies for re-scoring; rows are never rewritten, compaction just forgets them
+        self._full: Optional[SegmentFile] = None
+        # Full-precision rows of an opened snapshot, referenced by negative _rows
+        self._base_full: Optional[np.ndarray] = None
+
+    @property
+    def _slots(self) -> Dict[int, int]:
+        """Label -> slot, built on first use after opening a snapshot"""
+        if self._slot_map is None:
+            live = np.flatnonzero(self._alive[:self._count])
+            self._slot_map = dict(zip(self._labels[live].tolist(), live.tolist()))
+        return self._slot_map
+
+    @property
+    def quantized(self) -> bool:
+        return self.storage != "float32"
+
+    def _encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        if self.storage == "int8":
+            # Symmetric per-vector scale: the largest component maps to 127
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+        return vectors.astype(STORAGE_TYPES[self.storage]), None
+
+    def _decode(self, slots: np.ndarray) -> np.ndarray:
+        vectors = self._vectors[slots].astype(np.float32)
+        if self.storage == "int8":
+            vectors *= self._scales[slots, None]
+        return vectors
+
+    def _append(self, labels: List[int], vectors: np.ndarray) -> np.ndarray:
+        """Store rows, growing the buffers geometrically; returns their slots"""
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            self._vectors = np.zeros((0, self.dim), dtype=STORAGE_TYPES[self.storage])
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dimensional vectors, got {vectors.shape[1]}")
+        self.remove(labels)
+        needed = self._count + len(labels)
+        if needed > len(self._vectors):
+            capacity = max(needed, 2 * len(self._vectors), 1024)
+            self._vectors = np.resize(self._vectors, (capacity, self.dim))
+            if self.storage == "int8":
+                self._scales = np.resize(self._scales, capacity)
+            if self.quantized:
+                self._rows = np.resize(self._rows, capacity)
+            self._labels = np.resize(self._labels, capacity)
+            self._alive = np.resize(self._alive, capacity)
+        slots = np.arange(self._count, needed)
+        codes, scales = self._encode(vectors)
+        self._vectors[slots] = codes
+        if scales is not None:
+            self._scales[slots] = scales
+        if self.quantized:
+            if self._full is None:
+                self._full = SegmentFile()
+            offset, _ = self._full.append_bytes(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+            self._rows[slots] = offset + np.arange(len(labels)) * self.dim * 4
+        self._labels[slots] = labels
+        self._alive[slots] = True
+        self._slots.update(zip(labels, slots.tolist()))
+        self._count = needed
+        self._size += len(labels)
+        return slots
+
+    def _full_rows(self, slots: np.ndarray) -> np.ndarray:
+        if not self.quantized:
+            return self._vectors[slots]
+        rows = self._rows[slots]
+        vectors = np.empty((len(slots), self.dim), dtype=np.float32)
+        opened = rows < 0
+        if opened.any():
+            vectors[opened] = self._base_full[-1 - rows[opened]]
+        size = self.dim * 4
+        for i in np.flatnonzero(~opened):
+            vectors[i] = np.frombuffer(self._full.read_bytes(int(rows[i]), size), dtype=np.float32)
+        return vectors
+
+    def add(self, labels: Iterable[int], vectors) -> None:
+        labels = [int(label) for label in labels]
+        if labels:
+            self._append(labels, normalize(vectors))
+
+    def get(self, labels: Iterable[int]) -> np.ndarray:
+        slots = np.array([self._slots[int(label)] for label in labels], dtype=np.int64)
+        return self._full_rows(slots).reshape(len(slots), self.dim or 0)
+
+    def remove(self, labels: Iterable[int]) -> None:
+        for label in labels:
+            slot = self._slots.pop(int(label), None)
+            if slot is not None:
+                self._alive[slot] = False
+                self._size -= 1
+        # Reclaim dead rows once they outnumber live ones
+        if self._count > 1024 and self._count > 2 * self._size:
+            self._compact()
+
+    def _compact(self) -> np.ndarray:
+        """Drop dead rows; returns the old slots of the rows kept, in their new order"""
+        keep = np.flatnonzero(self._alive[:self._count])
+        self._vectors = self._vectors[keep]
+        if self.storage == "int8":
+            self._scales = self._scales[keep]
+        if self.quantized:
+            self._rows = self._rows[keep]
+        self._labels = self._labels[keep]
+        self._alive = np.ones(len(keep), dtype=bool)
+        self._count = len(keep)
+        self._slot_map = dict(zip(self._labels.tolist(), range(len(keep))))
+        return keep
+
+    def _scores(self, slots: np.ndarray, query: np.ndarray) -> np.ndarray:
+        if self.storage == "int8":
+            scale = max(float(np.abs(query).max()) / 127.0, 1e-12)
+            codes = np.round(query / scale).astype(np.int32)
+            # int8 x int8 products summed in int32: exact, and no float copy of the codes
+            dots = np.einsum("ij,j->i", self._vectors[slots], codes, dtype=np.int32, casting="unsafe")
+            return dots * (self._scales[slots] * scale)
+        return np.einsum("ij,j->i", self._vectors[slots], query, dtype=np.float32)
+
+    def _rank(self, slots: np.ndarray, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        slots = slots[self._alive[slots]]
+        scores = self._scores(slots, query)
+        if self.quantized and self.rerank:
+            # Shortlist by the codes, then order the shortlist by the exact vectors
+            slots = slots[top_k(scores, max(k, self.rerank))]
+            scores = self._full_rows(slots) @ query
+        best = top_k(scores, k)
+        return self._labels[slots[best]], scores[best]
+
+    def search(self, query, k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        if not self._size:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        return self._rank(np.arange(self._count), normalize(query)[0], k)
+
+    def _state(self) -> Dict[str, np.ndarray]:
+        self._compact()
+        state = {
+            "kind": np.array(self.kind),
+            "dim": np.array(self.dim or 0),
+            "storage": np.array(self.storage),
+            "rerank": np.array(self.rerank),
+            # Full precision, so the index can be reopened with another storage
+            "vectors": self._full_rows(np.arange(self._count)).reshape(self._count, self.dim or 0),
+            "labels": self._labels[:self._count],
+        }
+        if self.quantized:
+            # The codes too, so an index with the same storage opens without re-encoding
+            state["codes"] = self._vectors[:self._count]
+            state["scales"] = self._scales[:self._count]
+            state["rows"] = -1 - np.arange(self._count, dtype=np.int64)
+        return state
+
+    def _open(self, state) -> None:
+        self.rerank = int(state["rerank"])
+        self.clear()
+        labels = state["labels"]
+        if not len(labels):
+            return
+        self.dim = state["vectors"].shape[1]
+        if self.quantized:
+            self._vectors = state["codes"]
+            self._scales = state["scales"]
+            self._rows = state["rows"]
+            self._base_full = state["vectors"]
+        else:
+            self._vectors = state["vectors"]
+        self._labels = labels
+        self._alive = np.ones(len(labels), dtype=bool)
+        self._count = self._size = len(labels)
+        self._slot_map = None
+
+    def _restore(self, state) -> None:
+        if "storage" in state:
+            self.storage = str(state["storage"])
+            self.rerank = int(state["rerank"])
+            self.clear()
+        vectors = state["vectors"]
+        if len(vectors):
+            self._append(state["labels"].tolist(), vectors)
+
+
+class IVFIndex(ExactIndex):
+    kind = "ivf"
+
+    def __init__(
+        self,
+        dim: Optional[int] = None,
+        nlist: int = 0,
+        nprobe: int = 8,
+        train_min: int = 4096,
+        retrain_growth: float = 4.0,
+        seed: int = 1,
+        storage: str = "float32",
+        rerank: int = 64
+    ):
+        """
+        Inverted-file index: vectors are grouped under the nearest of nlist
+        k-means centroids, and a query only scores the lists of its nprobe
+        nearest centroids.
+
+        Query time falls roughly by nlist / nprobe against exact search;
+        raising nprobe buys recall back at the cost of speed. Inserts go
+        straight into their list. Deletes are dropped at search time and
+        reclaimed when dead vectors outnumber live ones. Until train_min
+        vectors exist, search is exact.
+
+        Args:
+            dim: Vector length, None to take it from the first add()
+            nlist: Number of lists, 0 for about 4 * sqrt(size) at training time
+            nprobe: Lists scanned per query
+            train_min: Vectors needed before clustering is worth it
+            retrain_growth: Re-cluster when the index has grown by this factor
+                since the last training, so lists stay balanced
+            seed: Seed for k-means initialisation
+            storage: "float32", "float16" or "int8", see ExactIndex
+            rerank: Candidates re-scored at full precision with quantized storage
+        """
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_min = train_min
+        self.retrain_growth = retrain_growth
+        self.seed = seed
+        super().__init__(dim, storage, rerank)
+
+    def clear(self) -> None:
+        super().clear()
+        self.centroids: Optional[np.ndarray] = None
+        self._trained_size = 0
+        self._assign = np.zeros(0, dtype=np.int32)
+        self._lists: List[np.ndarray] = []
+        self._list_sizes = np.zeros(0, dtype=np.int64)
+
+    def add(self, labels: Iterable[int], vectors) -> None:
+        labels = [int(label) for label in labels]
+        if not labels:
+            return
+        slots = self._append(labels, normalize(vectors))
+        self._assign = np.resize(self._assign, len(self._vectors))
+        if self.centroids is None:
+            if len(self) >= self.train_min:
+                self.train()
+        elif len(self) >= self.retrain_growth * self._trained_size:
+            self.train()
+        else:
+            self._file(slots)
+
+    def train(self, iterations: int = 10, sample_per_list: int = 64) -> None:
+        """Cluster the live vectors and rebuild every list"""
+        live = np.flatnonzero(self._alive[:self._count])
+        nlist = self.nlist or int(4 * np.sqrt(len(live)))
+        nlist = max(1, min(nlist, len(live)))
+        rng = np.random.RandomState(self.seed)
+        sample = self._decode(rng.choice(live, min(len(live), nlist * sample_per_list), replace=False))
+
+        # Spherical k-means: centroids stay unit length so inner product ranks them
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            nearest = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, nearest, sample)
+            counts = np.bincount(nearest, minlength=nlist)
+            empty = counts == 0
+            # Re-seed empty clusters so no list is wasted
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids = normalize(sums)
+
+        self.centroids = centroids
+        self._trained_size = len(live)
+        self._lists = [np.zeros(0, dtype=np.int64) for _ in range(nlist)]
+        self._list_sizes = np.zeros(nlist, dtype=np.int64)
+        self._assign[:] = -1
+        self._file(live)
+        logger.info(f"Clustered {len(live)} vectors into {nlist} lists")
+
+    def _file(self, slots: np.ndarray, batch: int = 65536) -> None:
+        """Append slots to the lists of their nearest centroids"""
+        for i in range(0, len(slots), batch):
+            part = slots[i:i + batch]
+            nearest = np.argmax(self._decode(part) @ self.centroids.T, axis=1).astype(np.int32)
+            self._assign[part] = nearest
+            order = np.argsort(nearest, kind="stable")
+            lists, starts = np.unique(nearest[order], return_index=True)
+            for list_id, members in zip(lists, np.split(part[order], starts[1:])):
+                self._extend_list(int(list_id), members)
+
+    def _extend_list(self, list_id: int, members: np.ndarray) -> None:
+        current = self._lists[list_id]
+        size = self._list_sizes[list_id]
+        needed = size + len(members)
+        if needed > len(current):
+            current = self._lists[list_id] = np.resize(current, max(needed, 2 * len(current), 16))
+        current[size:needed] = members
+        self._list_sizes[list_id] = needed
+
+    def _compact(self) -> np.ndarray:
+        keep = super()._compact()
+        self._assign = self._assign[keep]
+        if self.centroids is not None:
+            self._rebuild_lists()
+        return keep
+
+    def _rebuild_lists(self) -> None:
+        self._lists = [np.zeros(0, dtype=np.int64) for _ in range(len(self.centroids))]
+        self._list_sizes = np.zeros(len(self.centroids), dtype=np.int64)
+        # Rows removed before the last clustering were never filed (-1)
+        slots = np.flatnonzero(self._assign[:self._count] >= 0)
+        order = np.argsort(self._assign[slots], kind="stable")
+        lists, starts = np.unique(self._assign[slots[order]], return_index=True)
+        for list_id, members in zip(lists, np.split(slots[order], starts[1:])):
+            self._extend_list(int(list_id), members)
+
+    def search(self, query, k: int = 10, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        if self.centroids is None:
+            return super().search(query, k)
+        query = normalize(query)[0]
+        probes = top_k(self.centroids @ query, nprobe or self.nprobe)
+        slots = np.concatenate([self._lists[p][:self._list_sizes[p]] for p in probes])
+        return self._rank(slots, query, k)
+
+    def _state(self) -> Dict[str, np.ndarray]:
+        state = super()._state()
+        sizes = self._list_sizes
+        state.update(
+            params=np.array([self.nlist, self.nprobe, self.train_min, self._trained_size]),
+            retrain_growth=np.array(self.retrain_growth),
+            centroids=self.centroids if self.centroids is not None else np.zeros((0, self.dim or 0), np.float32),
+            assign=self._assign[:self._count],
+            # The lists as they are, so opening does not have to regroup every vector
+            list_offsets=np.concatenate(([0], np.cumsum(sizes))).astype(np.int64),
+            list_slots=np.concatenate([members[:size] for members, size in zip(self._lists, sizes)]
+                                      + [np.zeros(0, dtype=np.int64)]),
+        )
+        return state
+
+    def _open(self, state) -> None:
+        self.nlist, self.nprobe, self.train_min, trained_size = (int(v) for v in state["params"])
+        self.retrain_growth = float(state["retrain_growth"])
+        super()._open(state)
+        self._assign = state["assign"]
+        if len(state["centroids"]):
+            self.centroids = state["centroids"]
+            self._trained_size = trained_size
+            offsets, members = state["list_offsets"], state["list_slots"]
+            self._lists = [members[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+            self._list_sizes = np.diff(offsets)
+
+    def _restore(self, state) -> None:
+        self.nlist, self.nprobe, self.train_min, trained_size = (int(v) for v in state["params"])
+        self.retrain_growth = float(state["retrain_growth"])
+        super()._restore(state)
+        if len(state["centroids"]):
+            # Lists come back from the saved assignment rather than a new clustering
+            self.centroids = state["centroids"]
+            self._trained_size = trained_size
+            self._assign = np.resize(state["assign"].astype(np.int32), len(self._vectors))
+            self._rebuild_lists()
+
+
+class HNSWIndex(VectorIndex):
+    kind = "hnsw"
+
+    def __init__(
+        self,
+        dim: Optional[int] = None,
+        m: int = 16,
+        ef_construction: int = 200,
+        ef_search: int = 64,
+        storage: str = "float32",
+        rerank: int = 0
+    ):
+        """
+        Hierarchical navigable small-world graph, via the optional hnswlib package.
+
+        Args:
+            dim: Vector length, None to take it from the first add()
+            m: Graph links per node; more is better recall and more memory
+            ef_construction: Candidate list size while inserting
+            ef_search: Candidate list size while searching; the recall/latency knob
+            storage: Only "float32"; hnswlib has no quantized storage
+            rerank: Unused, accepted so settings can switch kinds freely
+        """
+        if hnswlib is None:
+            raise ImportError("The hnsw index needs hnswlib: pip install hnswlib")
+        if storage != "float32":
+            raise ValueError(f"The hnsw index stores float32 vectors only, not {storage}")
+        self.dim = dim
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self._index = None
+        self._labels: set = set()
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    def clear(self) -> None:
+        self._index = None
+        self._labels.clear()
+
+    def _ensure(self, dim: int, capacity: int) -> None:
+        if self._index is None:
+            self.dim = dim
+            self._index = hnswlib.Index(space="cosine", dim=dim)
+            self._index.init_index(max_elements=max(capacity, 1024), ef_construction=self.ef_construction,
+                                   M=self.m, allow_replace_deleted=True)
+            self._index.set_ef(self.ef_search)
+        elif capacity > self._index.get_max_elements():
+            self._index.resize_index(max(capacity, 2 * self._index.get_max_elements()))
+
+    def add(self, labels: Iterable[int], vectors) -> None:
+        labels = [int(label) for label in labels]
+        if not labels:
+            return
+        vectors = normalize(vectors)
+        self._ensure(vectors.shape[1], self._index.get_current_count() + len(labels) if self._index else len(labels))
+        self.remove(labels)
+        self._index.add_items(vectors, labels, replace_deleted=True)
+        self._labels.update(labels)
+
+    def remove(self, labels: Iterable[int]) -> None:
+        for label in labels:
+            label = int(label)
+            if label in self._labels:
+                self._index.mark_deleted(label)
+                self._labels.discard(label)
+
+    def search(self, query, k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        k = min(k, len(self))
+        if not k:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        labels, distances = self._index.knn_query(normalize(query), k=k)
+        return labels[0].astype(np.int64), 1.0 - distances[0]
+
+    def get(self, labels: Iterable[int]) -> np.ndarray:
+        labels = [int(label) for label in labels]
+        if not labels:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return np.array(self._index.get_items(labels), dtype=np.float32)
+
+    def _state(self) -> Dict[str, np.ndarray]:
+        fd, graph = tempfile.mkstemp(suffix=".hnsw")
+        os.close(fd)
+        self._index.save_index(graph)
+        # One set of arrays per index, like the other kinds
+        try:
+            return dict(kind=np.array(self.kind), dim=np.array(self.dim),
+                        params=np.array([self.m, self.ef_construction, self.ef_search]),
+                        labels=np.fromiter(self._labels, dtype=np.int64), graph=np.fromfile(graph, dtype=np.uint8))
+        finally:
+            os.remove(graph)
+
+    def _restore(self, state) -> None:
+        self.dim = int(state["dim"])
+        self.m, self.ef_construction, self.ef_search = (int(v) for v in state["params"])
+        fd, graph = tempfile.mkstemp(suffix=".hnsw")
+        os.close(fd)
+        state["graph"].tofile(graph)
+        try:
+            self._index = hnswlib.Index(space="cosine", dim=self.dim)
+            self._index.load_index(graph, allow_replace_deleted=True)
+        finally:
+            os.remove(graph)
+        self._index.set_ef(self.ef_search)
+        self._labels = set(state["labels"].tolist())
+
+
+INDEX_TYPES = {cls.kind: cls for cls in (ExactIndex, IVFIndex, HNSWIndex)}
+
+
+def create_index(kind: str = "ivf", **options) -> VectorIndex:
+    """
+    Build an empty index by name.
+
+    Args:
+        kind: "exact", "ivf" or "hnsw" (needs hnswlib)
+        options: Knobs of the chosen index class
+    """
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown vector index {kind!r}, expected one of {', '.join(INDEX_TYPES)}")
+    return INDEX_TYPES[kind](**options)
+
+
+def load_index(path: str) -> VectorIndex:
+    """Open an index written by VectorIndex.save()"""
+    with np.load(path) as state:
+        kind = str(state["kind"])
+        if kind not in INDEX_TYPES:
+            raise ValueError(f"{path} holds an unknown vector index {kind!r}")
+        index = INDEX_TYPES[kind](dim=int(state["dim"]) or None)
+        index._restore(state)
+    return index
+
+
+def open_index(state: Dict[str, np.ndarray], into: VectorIndex) -> VectorIndex:
+    """
+    Restore an index from VectorIndex._state() arrays, normally memory-mapped.
+
+    into is the index the settings ask for. If it has the snapshot's kind
+    and storage the arrays are used in place; otherwise the vectors are
+    added to it again, which costs a rebuild. An hnsw snapshot carries no
+    plain vectors, so it stays an hnsw index.
+
+    Returns:
+        The restored index, into unless the snapshot could not be converted
+    """
+    kind = str(state["kind"])
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Snapshot holds an unknown vector index {kind!r}")
+    storage = str(state["storage"]) if "storage" in state else "float32"
+    if kind == into.kind and storage == getattr(into, "storage", "float32"):
+        into._open(state)
+        return into
+    if "vectors" not in state:
+        logger.warning(f"Keeping the snapshot's {kind} index; it cannot be converted to {into.kind}")
+        index = INDEX_TYPES[kind](dim=int(state["dim"]) or None)
+        index._open(state)
+        return index
+    logger.info(f"Re-adding the snapshot's {kind}/{storage} vectors to the configured {into.kind} index")
+    into.clear()
+    into.add(state["labels"].tolist(), state["vectors"])
+    return into
@@ -0,0 +1,197 @@
+# rag/cache.py
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Generic, Hashable, Iterable, List, Optional, Tuple, TypeVar
+
+import numpy as np
+
+from utils.metrics import metrics
+from .retriever import Chunk, KeywordRetriever, SearchResults, tokenize
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ResultCache(Generic[T]):
+    def __init__(self, max_entries: int = 128, wait: float = 2.0, keep: Optional[Callable[[T], bool]] = None):
+        """
+        Least-recently-used memo of search results with single-flight computation.
+
+        Keys are stamped with a version that invalidate() bumps, so every
+        entry is dropped when the data changes and a result computed across
+        a change is not stored. A caller asking for a key already being
+        computed (typically a prefetch of the draft being typed) waits for
+        that computation instead of repeating it.
+
+        Args:
+            max_entries: Results kept, 0 stores none
+            wait: Seconds get() waits for the same key computed elsewhere
+            keep: Whether a computed result may be stored, e.g. not a degraded one
+        """
+        self.max_entries = max_entries
+        self.wait = wait
+        self.keep = keep
+        self.version = 0
+        self._results: "OrderedDict[Tuple[Hashable, int], T]" = OrderedDict()
+        self._pending: Dict[Tuple[Hashable, int], threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Whether the key is stored or being computed"""
+        versioned = (key, self.version)
+        return versioned in self._results or versioned in self._pending
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.version += 1
+            self._results.clear()
+
+    def _lookup(self, versioned: Tuple[Hashable, int]) -> Optional[T]:
+        # Called with _lock held
+        result = self._results.get(versioned)
+        if result is not None:
+            self._results.move_to_end(versioned)
+        return result
+
+    def get(self, key: Hashable, compute: Callable[[], T]) -> Tuple[T, bool]:
+        """
+        The stored result for key, or compute()'s.
+
+        Returns:
+            The result and whether it came from the cache
+        """
+        versioned = (key, self.version)
+        with self._lock:
+            result = self._lookup(versioned)
+            if result is not None:
+                return result, True
+            pending = self._pending.get(versioned)
+            owner = pending is None
+            if owner:
+                pending = self._pending[versioned] = threading.Event()
+
+        if not owner:
+            pending.wait(self.wait)
+            with self._lock:
+                result = self._lookup(versioned)
+            if result is not None:
+                return result, True
+            # The other computation failed, was not kept or is too slow
+            return compute(), False
+
+        try:
+            result = compute()
+            with self._lock:
+                if self.max_entries and versioned[1] == self.version and (self.keep is None or self.keep(result)):
+                    self._results[versioned] = result
+                    if len(self._results) > self.max_entries:
+                        self._results.popitem(last=False)
+            return result, False
+        finally:
+            with self._lock:
+                self._pending.pop(versioned, None)
+            pending.set()
+
+    def prefetch(self, key: Hashable, compute: Callable[[], T]) -> None:
+        """Compute and store a result ahead of time, unless it is stored or on its way"""
+        if key in self:
+            return
+        try:
+            self.get(key, compute)
+        except Exception as e:
+            logger.debug(f"Prefetch failed: {e}")
+
+
+class CachedRetriever:
+    def __init__(self, retriever: KeywordRetriever, max_entries: int = 128):
+        """
+        Memoise keyword search results.
+
+        Keyword scores depend only on the set of distinct query terms, so
+        results are keyed by that set: queries that differ only in case,
+        punctuation, spacing or word order share an entry. Any change to
+        the knowledge base invalidates every entry.
+
+        Args:
+            retriever: Index to search
+            max_entries: Result lists kept, least recently used dropped first
+        """
+        self.retriever = retriever
+        self.results: ResultCache[SearchResults] = ResultCache(max_entries)
+        # Ingestion runs on the processing thread while searches run on others
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.retriever)
+
+    def get(self, chunk_id: str) -> Optional[Chunk]:
+        return self.retriever.get(chunk_id)
+
+    def _invalidate(self) -> None:
+        self.results.invalidate()
+
+    def add_document(self, doc_id: int, source: str, content: str) -> List[Chunk]:
+        with self._lock:
+            self._invalidate()
+            return self.retriever.add_document(doc_id, source, content)
+
+    def add_chunks(self, doc_id: int, source: str, pieces: Iterable[Tuple[int, int, str]]) -> List[Chunk]:
+        with self._lock:
+            self._invalidate()
+            return self.retriever.add_chunks(doc_id, source, pieces)
+
+    def split(self, content: str) -> List[Tuple[int, int, str]]:
+        return self.retriever.split(content)
+
+    def document_chunks(self, doc_id: int) -> List[str]:
+        return self.retriever.document_chunks(doc_id)
+
+    def remove_document(self, doc_id: int) -> None:
+        with self._lock:
+            self._invalidate()
+            self.retriever.remove_document(doc_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._invalidate()
+            self.retriever.clear()
+
+    def extend(self, documents: Iterable[Tuple[int, str, str]]) -> None:
+        with self._lock:
+            self._invalidate()
+            self.retriever.extend(documents)
+
+    def snapshot(self, delta: bool = False) -> Dict[str, np.ndarray]:
+        """Index arrays for a base snapshot, or the changes since the last restore() for a delta"""
+        with self._lock:
+            return self.retriever._delta() if delta else self.retriever._state()
+
+    def restore(self, state: Dict[str, np.ndarray], sources: Dict[int, str],
+                delta: Optional[Dict[str, np.ndarray]] = None) -> None:
+        """Replace the index with a base snapshot's arrays and the delta taken against it"""
+        with self._lock:
+            self._invalidate()
+            self.retriever._restore(state, sources)
+            if delta is not None:
+                self.retriever._apply(delta)
+
+    def _search(self, query: str) -> SearchResults:
+        with self._lock:
+            return self.retriever.search(query)
+
+    def search(
+        self,
+        query: str,
+        limit: Optional[int] = None,
+        min_score: float = 0.0,
+        model: str = ""
+    ) -> SearchResults:
+        """Same contract as KeywordRetriever.search, served from the cache when possible"""
+        results, cached = self.results.get(frozenset(tokenize(query)), lambda: self._search(query))
+        if metrics.enabled:
+            (metrics.cache_hits if cached else metrics.cache_misses).inc(model, "retrieval")
+        if min_score:
+            results = results.above(min_score)
+        return results[:limit] if limit else results
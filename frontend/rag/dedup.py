@@ -0,0 +1,148 @@
+# rag/dedup.py
+import zlib
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+import numpy as np
+
+from .retriever import tokenize
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def shingle_hashes(text: str, size: int = 5) -> np.ndarray:
+    """32-bit hashes of the word size-grams of text, insensitive to case, punctuation and spacing"""
+    words = tokenize(text)
+    if len(words) <= size:
+        shingles = [" ".join(words)] if words else []
+    else:
+        shingles = [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+    return np.fromiter((zlib.crc32(s.encode("utf-8")) for s in set(shingles)), dtype=np.uint64)
+
+
+def choose_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """
+    Split num_perm signature rows into (bands, rows) so the banding S-curve,
+    whose steep part sits near (1/bands)^(1/rows), rises at the target similarity.
+    """
+    best = (num_perm, 1)
+    best_error = float("inf")
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        error = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+        # Lean towards lower rows: a missed candidate cannot be recovered, a false one is verified away
+        if error < best_error and (1.0 / bands) ** (1.0 / rows) <= threshold + 0.05:
+            best, best_error = (bands, rows), error
+    return best
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        """
+        MinHash signatures whose agreement rate estimates Jaccard similarity
+        of the shingle sets.
+
+        Args:
+            num_perm: Hash functions per signature; more is more precise and slower
+            seed: Seed for the hash family, fixed so signatures are reproducible
+        """
+        self.num_perm = num_perm
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, (1 << 61) - 1, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, (1 << 61) - 1, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str, batch: int = 4096) -> Optional[np.ndarray]:
+        hashes = shingle_hashes(text)
+        if not len(hashes):
+            return None
+        signature = np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        # Batches bound the shingles x permutations matrix for whole documents
+        for i in range(0, len(hashes), batch):
+            # uint64 products wrap around, which still mixes well enough for MinHash
+            with np.errstate(over="ignore"):
+                permuted = (np.outer(hashes[i:i + batch], self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+            np.minimum(signature, permuted.min(axis=0), out=signature)
+        # Every value fits in 32 bits; halve what the index keeps per item
+        return signature.astype(np.uint32)
+
+    @staticmethod
+    def similarity(a: np.ndarray, b: np.ndarray) -> float:
+        return float(np.count_nonzero(a == b)) / len(a)
+
+
+class NearDuplicateIndex:
+    def __init__(self, threshold: float = 0.85, num_perm: int = 64):
+        """
+        Locality-sensitive hashing over MinHash signatures.
+
+        Candidates sharing a band bucket are confirmed against the estimated
+        similarity, so lookups cost a few dictionary probes rather than a
+        comparison with every stored item. Items are chunks or whole documents.
+
+        Args:
+            threshold: Estimated Jaccard similarity at which items count as duplicates
+            num_perm: Signature length
+        """
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm)
+        self.bands, self.rows = choose_bands(num_perm, threshold)
+        # Most buckets hold a single item, stored bare rather than in a set
+        self._buckets: List[Dict[int, Union[str, Set[str]]]] = [{} for _ in range(self.bands)]
+        self._signatures: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def _keys(self, signature: np.ndarray) -> List[int]:
+        # A hash collision only adds a candidate, which the similarity check rejects
+        return [hash(band.tobytes()) for band in signature.reshape(self.bands, self.rows)]
+
+    def find(self, signature: np.ndarray) -> Optional[Tuple[str, float]]:
+        """Most similar stored item at or above the threshold"""
+        candidates = set()
+        for bucket, key in zip(self._buckets, self._keys(signature)):
+            members = bucket.get(key)
+            if isinstance(members, str):
+                candidates.add(members)
+            elif members:
+                candidates |= members
+        best = None
+        for item_id in candidates:
+            score = self.hasher.similarity(signature, self._signatures[item_id])
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (item_id, score)
+        return best
+
+    def get(self, item_id: str) -> Optional[np.ndarray]:
+        return self._signatures.get(item_id)
+
+    def add(self, item_id: str, signature: np.ndarray) -> None:
+        self._signatures[item_id] = signature
+        for bucket, key in zip(self._buckets, self._keys(signature)):
+            members = bucket.get(key)
+            if members is None:
+                bucket[key] = item_id
+            elif isinstance(members, str):
+                bucket[key] = {members, item_id}
+            else:
+                members.add(item_id)
+
+    def remove(self, item_id: str) -> None:
+        signature = self._signatures.pop(item_id, None)
+        if signature is None:
+            return
+        for bucket, key in zip(self._buckets, self._keys(signature)):
+            members = bucket.get(key)
+            if members == item_id:
+                del bucket[key]
+            elif isinstance(members, set):
+                members.discard(item_id)
+                if len(members) == 1:
+                    bucket[key] = members.pop()
+
+    def clear(self) -> None:
+        self._signatures.clear()
+        for bucket in self._buckets:
+            bucket.clear()
@@ -0,0 +1,59 @@
+# rag/embeddings.py
+import threading
+from collections import OrderedDict
+from typing import List
+
+import numpy as np
+import requests
+
+
+class Embedder:
+    def __init__(self, api_base: str, model: str, batch_size: int = 32, timeout: float = 60, cache_size: int = 256):
+        """
+        Embedding vectors from the Ollama server's /api/embed.
+
+        Blocking, like the rest of ingestion, so it works from the processing
+        thread and from executor threads alike. Query vectors are memoised:
+        the draft embedded while typing is usually the message that is sent.
+
+        Args:
+            api_base: Ollama API root, e.g. http://localhost:11434/api
+            model: Embedding model, e.g. nomic-embed-text
+            batch_size: Texts sent per request
+            timeout: Per-request timeout in seconds
+            cache_size: Query vectors remembered
+        """
+        self.api_base = api_base.rstrip("/")
+        self.model = model
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self.session = requests.Session()
+        self._queries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """One row per text"""
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            response = self.session.post(
+                f"{self.api_base}/embed",
+                json={"model": self.model, "input": texts[i:i + self.batch_size]},
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            vectors.extend(response.json()["embeddings"])
+        return np.array(vectors, dtype=np.float32)
+
+    def embed_query(self, text: str) -> np.ndarray:
+        with self._lock:
+            vector = self._queries.get(text)
+            if vector is not None:
+                self._queries.move_to_end(text)
+                return vector
+        vector = self.embed([text])[0]
+        with self._lock:
+            self._queries[text] = vector
+            if len(self._queries) > self.cache_size:
+                self._queries.popitem(last=False)
+        return vector
@@ -0,0 +1,189 @@
+# rag/hybrid.py
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from utils.metrics import metrics
+from .cache import CachedRetriever, ResultCache
+from .retriever import Chunk, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Vector search: (query, limit) -> (chunk, cosine similarity) pairs, best first
+SemanticSearch = Callable[[str, int], List[Tuple[Chunk, float]]]
+
+# (chunk, fused score, best score any stage gave it)
+FusedHit = Tuple[Chunk, float, float]
+
+# Fused hits, and whether every stage contributed to them
+Fused = Tuple[List[FusedHit], bool]
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Merge ranked id lists by summing 1 / (k + rank) over the lists each id appears in.
+
+    Only ranks are used, so lists scored on different scales (term
+    overlap, cosine similarity) combine without calibration. An id that
+    several lists rank fairly high beats one that a single list ranks
+    first; k damps the weight of the very top ranks.
+
+    Returns:
+        (id, fused score) pairs, best first; ties keep first-seen order
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, 1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+@dataclass
+class RetrievalTimings:
+    """Seconds spent in each stage of one hybrid search"""
+    lexical: float = 0.0
+    vector: float = 0.0     # query embedding and nearest-neighbour search
+    fusion: float = 0.0
+    total: float = 0.0
+    cached: bool = False
+
+    def summary(self) -> str:
+        if self.cached:
+            return f"cached, {self.total * 1000:.1f} ms"
+        return (f"keyword {self.lexical * 1000:.1f} ms, vector {self.vector * 1000:.1f} ms, "
+                f"fusion {self.fusion * 1000:.1f} ms, total {self.total * 1000:.1f} ms")
+
+
+class HybridRetriever:
+    def __init__(
+        self,
+        lexical: CachedRetriever,
+        semantic: Optional[SemanticSearch] = None,
+        candidates: int = 50,
+        rrf_k: int = 60,
+        max_entries: int = 128,
+        workers: int = 2,
+        prefetch_wait: float = 2.0
+    ):
+        """
+        Keyword and vector search run side by side and fused by reciprocal rank.
+
+        Keyword search finds chunks sharing the question's exact terms
+        (names, error codes, identifiers); vector search finds paraphrases
+        that share none. Each contributes its best candidates and
+        reciprocal-rank fusion merges the two lists. The vector stage,
+        mostly waiting on the embedding request, runs on a worker thread
+        while the keyword stage runs on the caller's, so a search costs
+        about the slower of the two rather than their sum.
+
+        Fused results are memoised by the question's lower-cased terms and
+        the knowledge-base version: asking again, or sending a draft that
+        was prefetched while typing, skips both searches. The store calls
+        invalidate() after every change.
+
+        Args:
+            lexical: Keyword index, with its own per-term-set cache
+            semantic: Vector search, None for keyword search alone
+            candidates: Results taken from each stage
+            rrf_k: Rank damping of reciprocal-rank fusion
+            max_entries: Fused result lists kept, 0 disables the cache
+            workers: Threads running vector searches, 0 runs them after the keyword search
+            prefetch_wait: Seconds search() waits for the same search already in flight
+        """
+        self.lexical = lexical
+        self.semantic = semantic
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        # Results of a failed vector search are used but not kept
+        self.results: ResultCache[Fused] = ResultCache(max_entries, prefetch_wait, keep=lambda fused: fused[1])
+        self._executor = None
+        if semantic is not None and workers:
+            self._executor = ThreadPoolExecutor(workers, thread_name_prefix="vector-search")
+
+    @staticmethod
+    def key(query: str) -> str:
+        # Case, punctuation and spacing change neither search noticeably
+        return " ".join(tokenize(query))
+
+    def invalidate(self) -> None:
+        self.results.invalidate()
+
+    def cached(self, query: str) -> bool:
+        """Whether a search for the query is stored or in flight"""
+        return self.key(query) in self.results
+
+    def _vector_search(self, query: str) -> Tuple[List[Tuple[Chunk, float]], float]:
+        started = time.perf_counter()
+        results = self.semantic(query, self.candidates)
+        return results, time.perf_counter() - started
+
+    def _fuse(self, query: str, model: str, timings: RetrievalTimings) -> Fused:
+        """Run both stages and fuse them"""
+        future = None
+        if self._executor is not None:
+            future = self._executor.submit(self._vector_search, query)
+
+        started = time.perf_counter()
+        lexical = list(self.lexical.search(query, self.candidates, model=model))
+        timings.lexical = time.perf_counter() - started
+
+        semantic, complete = [], True
+        if self.semantic is not None:
+            try:
+                semantic, timings.vector = future.result() if future is not None else self._vector_search(query)
+            except Exception as e:
+                logger.warning(f"Similarity search failed, using keyword search alone: {e}")
+                complete = False
+
+        started = time.perf_counter()
+        best: Dict[str, Tuple[Chunk, float]] = {}
+        for chunk, score in lexical + semantic:
+            seen = best.get(chunk.id)
+            if seen is None or score > seen[1]:
+                best[chunk.id] = (chunk, score)
+        fused = reciprocal_rank_fusion(
+            ([chunk.id for chunk, _ in lexical], [chunk.id for chunk, _ in semantic]), self.rrf_k)
+        hits = [(best[chunk_id][0], score, best[chunk_id][1]) for chunk_id, score in fused]
+        timings.fusion = time.perf_counter() - started
+        return hits, complete
+
+    def prefetch(self, query: str, model: str = "") -> None:
+        """Search ahead of time, normally for the draft in the message box"""
+        self.results.prefetch(self.key(query), lambda: self._fuse(query, model, RetrievalTimings()))
+
+    def search(
+        self,
+        query: str,
+        limit: Optional[int] = None,
+        min_score: float = 0.0,
+        model: str = ""
+    ) -> Tuple[List[Tuple[Chunk, float]], RetrievalTimings]:
+        """
+        Fused search, served from the cache when possible.
+
+        Args:
+            query: Question to retrieve context for
+            limit: Results returned, all candidates if None
+            min_score: Chunks are kept if the keyword share of query terms
+                or the cosine similarity reaches it
+            model: Model label for metrics
+
+        Returns:
+            (chunk, fused score) pairs best first, and the time each stage took
+        """
+        started = time.perf_counter()
+        timings = RetrievalTimings()
+        (hits, _), timings.cached = self.results.get(self.key(query), lambda: self._fuse(query, model, timings))
+        results = [(chunk, score) for chunk, score, best in hits if best >= min_score]
+        timings.total = time.perf_counter() - started
+
+        if metrics.enabled:
+            (metrics.cache_hits if timings.cached else metrics.cache_misses).inc(model, "fused")
+            if not timings.cached:
+                metrics.retrieval_time.observe(timings.lexical, model, "lexical")
+                if self.semantic is not None:
+                    metrics.retrieval_time.observe(timings.vector, model, "vector")
+                metrics.retrieval_time.observe(timings.fusion, model, "fusion")
+        return (results[:limit] if limit else results), timings
@@ -0,0 +1,176 @@
+# rag/packer.py
+import math
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional, Tuple
+
+from .retriever import Chunk, SearchResults, tokenize
+
+# Instructions and separators wrapped around the retrieved text
+PROMPT_OVERHEAD_TOKENS = 32
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate for Llama-style BPE vocabularies.
+
+    English prose averages about four characters per token; code and
+    non-Latin text run denser, so the word count acts as a floor.
+    """
+    if not text:
+        return 0
+    return max(math.ceil(len(text) / 4), math.ceil(len(text.split()) * 1.3))
+
+
+def _shingles(text: str, size: int = 5) -> set:
+    words = tokenize(text)
+    if len(words) <= size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+@dataclass
+class PackedChunk:
+    chunk: Chunk
+    score: float
+    text: str
+    tokens: int
+
+
+@dataclass
+class PackedContext:
+    chunks: List[PackedChunk] = field(default_factory=list)
+    budget: int = 0
+    tokens: int = 0
+    duplicates: int = 0
+    over_budget: int = 0
+
+    def __bool__(self) -> bool:
+        return bool(self.chunks)
+
+
+class ContextPacker:
+    def __init__(self, duplicate_threshold: float = 0.8, min_fragment: float = 0.3, cache_size: int = 50000):
+        """
+        Choose which retrieved chunks go into the prompt.
+
+        Chunks are taken best-score first until the token budget is spent.
+        Text a chosen chunk shares with an overlapping neighbour from the same
+        document is trimmed, and chunks that are near-copies of one already
+        chosen are skipped.
+
+        Args:
+            duplicate_threshold: Share of a chunk's word 5-grams already in the
+                selected text above which it counts as a duplicate
+            min_fragment: Skip a trimmed chunk if less than this share of it is new
+            cache_size: Chunks whose token counts are remembered
+        """
+        self.duplicate_threshold = duplicate_threshold
+        self.min_fragment = min_fragment
+        self.cache_size = cache_size
+        self._token_cache: "OrderedDict[Tuple[str, int], int]" = OrderedDict()
+        # Turns are prepared on several worker threads at once
+        self._lock = threading.Lock()
+
+    def count_tokens(self, chunk_id: str, text: str) -> int:
+        key = (chunk_id, len(text))
+        with self._lock:
+            tokens = self._token_cache.get(key)
+            if tokens is not None:
+                self._token_cache.move_to_end(key)
+                return tokens
+        tokens = estimate_tokens(text)
+        with self._lock:
+            self._token_cache[key] = tokens
+            if len(self._token_cache) > self.cache_size:
+                self._token_cache.popitem(last=False)
+        return tokens
+
+    @staticmethod
+    def budget(context_window: int, answer_tokens: int, question: str = "", history_tokens: int = 0) -> int:
+        """Tokens left for retrieved context once everything else is reserved"""
+        return max(0, context_window - answer_tokens - history_tokens
+                   - estimate_tokens(question) - PROMPT_OVERHEAD_TOKENS)
+
+    def _trim_overlap(self, chunk: Chunk, selected: List[PackedChunk]) -> Optional[str]:
+        text = chunk.text
+        start, end = chunk.start, chunk.end
+        for packed in selected:
+            other = packed.chunk
+            if other.doc_id != chunk.doc_id or other.end <= start or other.start >= end:
+                continue
+            if other.start <= start and other.end >= end:
+                return None  # fully covered
+            if other.start <= start:
+                text = text[other.end - start:]
+                start = other.end
+            elif other.end >= end:
+                text = text[:other.start - start]
+                end = other.start
+        if len(text.strip()) < self.min_fragment * len(chunk.text):
+            return None
+        return text
+
+    def pack(
+        self,
+        scored_chunks: Iterable[Tuple[Chunk, float]],
+        budget: int,
+        max_chunks: Optional[int] = None
+    ) -> PackedContext:
+        """
+        Fill a token budget with the highest-scoring chunks.
+
+        Args:
+            scored_chunks: (chunk, score) pairs in any order
+            budget: Tokens available, see ContextPacker.budget()
+            max_chunks: Upper bound on chunks regardless of budget
+        """
+        packed = PackedContext(budget=budget)
+        covered = set()
+        if not isinstance(scored_chunks, SearchResults):
+            # Search results are ranked already, and sorting them would build every chunk
+            scored_chunks = sorted(scored_chunks, key=lambda item: item[1], reverse=True)
+        for chunk, score in scored_chunks:
+            if max_chunks and len(packed.chunks) >= max_chunks:
+                break
+            remaining = budget - packed.tokens
+            if remaining <= 0:
+                break
+
+            text = self._trim_overlap(chunk, packed.chunks)
+            if text is None:
+                packed.duplicates += 1
+                continue
+
+            tokens = self.count_tokens(chunk.id, text) if text is chunk.text else estimate_tokens(text)
+            if tokens > remaining:
+                if packed.chunks:
+                    packed.over_budget += 1
+                    continue
+                # Nothing fits yet: keep the head of the best chunk rather than nothing
+                while tokens > remaining and text:
+                    text = text[:len(text) * remaining // tokens]
+                    tokens = estimate_tokens(text)
+                if not text:
+                    break
+
+            shingles = _shingles(text)
+            if shingles and len(shingles & covered) >= self.duplicate_threshold * len(shingles):
+                packed.duplicates += 1
+                continue
+            packed.chunks.append(PackedChunk(chunk, score, text, tokens))
+            packed.tokens += tokens
+            covered |= shingles
+        return packed
+
+
+def build_rag_prompt(message: str, context: PackedContext) -> str:
+    if not context:
+        return message
+    context_text = "\n\n".join(f"From {packed.chunk.source}:\n{packed.text}" for packed in context.chunks)
+    return f"""Using knowledge base with {len(context.chunks)} relevant contexts:
+
+{context_text}
+
+Question: {message}"""
@@ -0,0 +1,461 @@
+# rag/retriever.py
+import hashlib
+import re
+from array import array
+from collections.abc import Sequence
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .segment import SegmentFile
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word terms used for lexical matching"""
+    return _TERM_RE.findall(text.lower())
+
+
+def term_hash(term: str) -> int:
+    """64-bit key of a term in a snapshot lexicon; unlike hash(), the same in every process"""
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class Chunk:
+    """A chunk of a document; text read from the segment file is loaded on first use"""
+    __slots__ = ("id", "doc_id", "source", "start", "size", "_text", "_load")
+
+    def __init__(
+        self,
+        id: str,
+        doc_id: int,
+        source: str,
+        text: Optional[str] = None,
+        start: int = 0,
+        size: Optional[int] = None,
+        load: Optional[Callable[[], str]] = None
+    ):
+        self.id = id
+        self.doc_id = doc_id
+        self.source = source
+        self.start = start  # character offset of the chunk within its document
+        self.size = len(text) if size is None else size
+        self._text = text
+        self._load = load
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = self._load()
+        return self._text
+
+    @property
+    def end(self) -> int:
+        return self.start + self.size
+
+    def __repr__(self) -> str:
+        return f"Chunk(id={self.id!r}, source={self.source!r}, start={self.start}, size={self.size})"
+
+
+def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[Tuple[int, str]]:
+    """
+    Split text into overlapping windows of roughly chunk_size characters.
+
+    Window ends are moved back to the nearest whitespace so words are not cut.
+
+    Returns:
+        List of (start_offset, chunk_text)
+    """
+    if len(text) <= chunk_size:
+        return [(0, text)] if text.strip() else []
+    overlap = min(overlap, chunk_size // 2)
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + chunk_size)
+        if end < len(text):
+            split = text.rfind(" ", start + chunk_size // 2, end)
+            split = max(split, text.rfind("\n", start + chunk_size // 2, end))
+            if split > start:
+                end = split
+        piece = text[start:end]
+        if piece.strip():
+            chunks.append((start, piece))
+        if end >= len(text):
+            break
+        start = max(start + 1, end - overlap)
+    return chunks
+
+
+# Chunk table column -> array typecode
+COLUMNS = {"doc_ids": "q", "indices": "I", "starts": "Q", "sizes": "I", "offsets": "Q", "lengths": "I"}
+
+_EMPTY_SLOTS = np.zeros(0, dtype=np.uint32)
+
+
+class ChunkTable:
+    """
+    Per-chunk fields in flat arrays indexed by slot; slots are never reused.
+
+    Slots restored from a snapshot are read from its memory-mapped columns
+    (base); slots appended since go into growable arrays after them.
+    """
+    __slots__ = ("segment", "doc_ids", "indices", "starts", "sizes", "offsets", "lengths", "alive", "sources",
+                 "base", "split")
+
+    def __init__(self, segment: SegmentFile):
+        self.segment = segment
+        self.doc_ids = array("q")
+        self.indices = array("I")
+        self.starts = array("Q")
+        self.sizes = array("I")
+        self.offsets = array("Q")
+        self.lengths = array("I")
+        self.alive = bytearray()
+        self.sources: Dict[int, str] = {}
+        self.base: Dict[str, np.ndarray] = {}
+        self.split = 0
+
+    def __len__(self) -> int:
+        return len(self.alive)
+
+    def append(self, doc_id: int, index: int, start: int, text: str) -> int:
+        offset, length = self.segment.append(text)
+        self.doc_ids.append(doc_id)
+        self.indices.append(index)
+        self.starts.append(start)
+        self.sizes.append(len(text))
+        self.offsets.append(offset)
+        self.lengths.append(length)
+        self.alive.append(1)
+        return len(self.alive) - 1
+
+    def index(self, slot: int) -> int:
+        """Position of the slot's chunk within its document"""
+        if slot < self.split:
+            return int(self.base["indices"][slot])
+        return self.indices[slot - self.split]
+
+    def chunk(self, slot: int) -> Chunk:
+        if slot < self.split:
+            doc_id, index, start, size, offset, length = (int(self.base[name][slot]) for name in COLUMNS)
+        else:
+            i = slot - self.split
+            doc_id, index, start, size = self.doc_ids[i], self.indices[i], self.starts[i], self.sizes[i]
+            offset, length = self.offsets[i], self.lengths[i]
+        return Chunk(
+            f"{doc_id}:{index}", doc_id, self.sources[doc_id],
+            start=start, size=size,
+            load=partial(self.segment.read, offset, length)
+        )
+
+    def columns(self, start: int = 0) -> Dict[str, np.ndarray]:
+        """Copies of the fields of slots start onwards"""
+        fields = {}
+        for name, typecode in COLUMNS.items():
+            tail = np.frombuffer(getattr(self, name), dtype=np.dtype(typecode))[max(0, start - self.split):]
+            if start < self.split:
+                fields[name] = np.concatenate((self.base[name][start:], tail))
+            else:
+                fields[name] = tail.copy()
+        fields["alive"] = np.frombuffer(self.alive, dtype=np.uint8)[start:].copy()
+        return fields
+
+    def restore(self, columns: Dict[str, np.ndarray]) -> None:
+        """Take the snapshot's columns as the base of an empty table"""
+        self.base = {name: columns[name] for name in COLUMNS}
+        # One byte per chunk and written by every removal, so it is the one column copied in
+        self.alive = bytearray(columns["alive"].tobytes())
+        self.split = len(self.alive)
+
+    def extend(self, columns: Dict[str, np.ndarray]) -> None:
+        for name, typecode in COLUMNS.items():
+            getattr(self, name).frombytes(np.ascontiguousarray(columns[name], dtype=np.dtype(typecode)).tobytes())
+        self.alive.extend(columns["alive"].tobytes())
+
+
+class SearchResults(Sequence):
+    """(chunk, score) pairs best first; a Chunk is only built for the pairs actually read"""
+    __slots__ = ("_table", "_slots", "_scores")
+
+    def __init__(self, table: ChunkTable, slots: np.ndarray, scores: np.ndarray):
+        self._table = table
+        self._slots = slots
+        self._scores = scores
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return SearchResults(self._table, self._slots[item], self._scores[item])
+        return self._table.chunk(int(self._slots[item])), float(self._scores[item])
+
+    def __repr__(self) -> str:
+        return f"SearchResults({len(self)} chunks)"
+
+    def above(self, min_score: float) -> "SearchResults":
+        keep = self._scores >= min_score
+        return SearchResults(self._table, self._slots[keep], self._scores[keep])
+
+
+class KeywordRetriever:
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200, segment: Optional[SegmentFile] = None):
+        """
+        Chunk documents and score chunks by the share of query terms they contain.
+
+        Chunk text lives in the segment file and per-chunk fields in a
+        ChunkTable, so the heap holds a few dozen bytes per chunk plus one
+        posting per distinct term. Removed chunks leave dead slots that are
+        skipped at search time.
+
+        An index restored from a snapshot is used where it lies: postings
+        and per-document slots stay in memory-mapped CSR arrays and terms
+        are found by binary search over their hashes, so restoring reads
+        nothing per chunk or per term. Chunks indexed afterwards go into
+        in-memory postings on top, which are what a delta snapshot holds.
+
+        Args:
+            chunk_size: Characters per chunk
+            chunk_overlap: Characters shared by consecutive chunks
+            segment: File chunk text is appended to, None for a private temporary file
+        """
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.segment = segment or SegmentFile()
+        self._reset()
+
+    def _reset(self) -> None:
+        # A fresh table rather than emptied arrays: results handed out earlier keep working
+        self._table = ChunkTable(self.segment)
+        self._live = 0
+        # Terms added since the snapshot, plus snapshot terms already looked up
+        self._vocab: Dict[str, int] = {}
+        self._next_term = 0
+        # Postings and document slots added since the snapshot
+        self._postings: Dict[int, array] = {}
+        self._doc_slots: Dict[int, array] = {}
+        self._dead_postings = 0
+        # The snapshot: sorted term hashes, and CSR postings and document slots
+        self._lexicon = np.zeros(0, dtype=np.uint64)
+        self._lexicon_ids = np.zeros(0, dtype=np.uint32)
+        self._posting_offsets = np.zeros(1, dtype=np.int64)
+        self._posting_slots = _EMPTY_SLOTS
+        self._base_docs = np.zeros(0, dtype=np.int64)
+        self._doc_offsets = np.zeros(1, dtype=np.int64)
+        self._base_doc_slots = _EMPTY_SLOTS
+        self._base_terms = 0
+
+    def __len__(self) -> int:
+        return self._live
+
+    def split(self, content: str) -> List[Tuple[int, int, str]]:
+        """(index, start_offset, text) for each chunk add_document would index"""
+        return [(index, start, text) for index, (start, text)
+                in enumerate(chunk_text(content, self.chunk_size, self.chunk_overlap))]
+
+    def _term_id(self, term: str, create: bool = False) -> Optional[int]:
+        term_id = self._vocab.get(term)
+        if term_id is None and len(self._lexicon):
+            key = np.uint64(term_hash(term))
+            i = int(np.searchsorted(self._lexicon, key))
+            if i < len(self._lexicon) and self._lexicon[i] == key:
+                term_id = self._vocab[term] = int(self._lexicon_ids[i])
+        if term_id is None and create:
+            term_id = self._vocab[term] = self._next_term
+            self._next_term += 1
+        return term_id
+
+    def _posting(self, term_id: int) -> np.ndarray:
+        added = self._postings.get(term_id)
+        added = np.array(added, dtype=np.uint32) if added else _EMPTY_SLOTS
+        if term_id >= self._base_terms:
+            return added
+        base = self._posting_slots[self._posting_offsets[term_id]:self._posting_offsets[term_id + 1]]
+        return np.concatenate((base, added)) if len(added) else base
+
+    def _slots(self, doc_id: int) -> List[int]:
+        """Live slots of a document, the snapshot's first"""
+        slots = []
+        if len(self._base_docs):
+            i = int(np.searchsorted(self._base_docs, doc_id))
+            if i < len(self._base_docs) and self._base_docs[i] == doc_id:
+                alive = self._table.alive
+                base = self._base_doc_slots[self._doc_offsets[i]:self._doc_offsets[i + 1]]
+                slots = [slot for slot in base.tolist() if alive[slot]]
+        slots.extend(self._doc_slots.get(doc_id, ()))
+        return slots
+
+    def get(self, chunk_id: str) -> Optional[Chunk]:
+        doc_id, index = (int(part) for part in chunk_id.split(":"))
+        for slot in self._slots(doc_id):
+            if self._table.index(slot) == index:
+                return self._table.chunk(slot)
+        return None
+
+    def add_document(self, doc_id: int, source: str, content: str) -> List[Chunk]:
+        return self.add_chunks(doc_id, source, self.split(content))
+
+    def add_chunks(self, doc_id: int, source: str, pieces: Iterable[Tuple[int, int, str]]) -> List[Chunk]:
+        """Index selected pieces of a document, as produced by split()"""
+        self._table.sources[doc_id] = source
+        slots = self._doc_slots.setdefault(doc_id, array("I"))
+        vocab, postings = self._vocab, self._postings
+        added = []
+        for index, start, text in pieces:
+            slot = self._table.append(doc_id, index, start, text)
+            for term in set(tokenize(text)):
+                term_id = vocab.get(term)
+                if term_id is None:
+                    term_id = self._term_id(term, create=True)
+                posting = postings.get(term_id)
+                if posting is None:
+                    posting = postings[term_id] = array("I")
+                posting.append(slot)
+            slots.append(slot)
+            added.append(Chunk(f"{doc_id}:{index}", doc_id, source, text, start))
+        self._live += len(added)
+        return added
+
+    def document_chunks(self, doc_id: int) -> List[str]:
+        return [f"{doc_id}:{self._table.index(slot)}" for slot in self._slots(doc_id)]
+
+    def remove_document(self, doc_id: int) -> None:
+        slots = self._slots(doc_id)
+        self._doc_slots.pop(doc_id, None)
+        for slot in slots:
+            self._table.alive[slot] = 0
+        self._live -= len(slots)
+        self._dead_postings += len(slots)
+        # Postings of dead slots are skipped at search time; drop them once they dominate
+        if self._dead_postings > max(1024, self._live):
+            alive = np.frombuffer(self._table.alive, dtype=np.uint8).astype(bool)
+            if self._base_terms:
+                keep = alive[self._posting_slots]
+                kept = np.concatenate(([0], np.cumsum(keep)))
+                self._posting_offsets = kept[self._posting_offsets]
+                self._posting_slots = self._posting_slots[keep]
+            for term_id, posting in self._postings.items():
+                slots = np.array(posting, dtype=np.uint32)
+                self._postings[term_id] = array("I", slots[alive[slots]].tobytes())
+            self._dead_postings = 0
+
+    def clear(self) -> None:
+        self._reset()
+
+    def search(self, query: str, limit: Optional[int] = None, min_score: float = 0.0) -> SearchResults:
+        """
+        Score every chunk against the query.
+
+        Returns:
+            (chunk, score) pairs with score in (0, 1], best first
+        """
+        terms = set(tokenize(query))
+        term_ids = [term_id for term_id in map(self._term_id, terms) if term_id is not None]
+        table = self._table
+        matched = np.zeros(len(table), dtype=np.uint16)
+        for term_id in term_ids:
+            # A chunk appears at most once per posting list, so fancy-index += counts it once
+            matched[self._posting(term_id)] += 1
+        matched *= np.frombuffer(table.alive, dtype=np.uint8)
+        slots = np.flatnonzero(matched)
+        scores = matched[slots] / max(1, len(terms))
+        # Stable, so equal scores keep insertion order
+        order = np.argsort(-scores, kind="stable")
+        results = SearchResults(table, slots[order], scores[order])
+        if min_score:
+            results = results.above(min_score)
+        return results[:limit] if limit else results
+
+    def extend(self, documents: Iterable[Tuple[int, str, str]]) -> None:
+        """Bulk add (doc_id, source, content) triples"""
+        for doc_id, source, content in documents:
+            self.add_document(doc_id, source, content)
+
+    def _state(self) -> Dict[str, np.ndarray]:
+        """The whole index as flat arrays for a base snapshot; postings of dead chunks are left out"""
+        state = {f"chunks.{name}": column for name, column in self._table.columns().items()}
+        alive = state["chunks.alive"].astype(bool)
+
+        # Terms added since the last snapshot join its lexicon
+        added = [(term, term_id) for term, term_id in self._vocab.items() if term_id >= self._base_terms]
+        hashes = np.concatenate((self._lexicon, np.fromiter((term_hash(t) for t, _ in added), np.uint64, len(added))))
+        ids = np.concatenate((self._lexicon_ids, np.fromiter((i for _, i in added), np.uint32, len(added))))
+        order = np.argsort(hashes, kind="stable")
+        state["lexicon.hashes"] = hashes[order]
+        state["lexicon.ids"] = ids[order]
+
+        # Postings by term id: the snapshot's lists, then what was added since
+        tails = [np.array(posting, dtype=np.uint32) for posting in self._postings.values()]
+        terms = np.concatenate((
+            np.repeat(np.arange(self._base_terms), np.diff(self._posting_offsets)),
+            np.repeat(np.fromiter(self._postings, np.int64, len(self._postings)), [len(t) for t in tails])
+        )).astype(np.int64)
+        slots = np.concatenate([self._posting_slots] + tails)
+        keep = alive[slots]
+        terms, slots = terms[keep], slots[keep]
+        order = np.argsort(terms, kind="stable")
+        state["postings.slots"] = slots[order]
+        state["postings.offsets"] = np.concatenate(
+            ([0], np.cumsum(np.bincount(terms, minlength=self._next_term)))).astype(np.int64)
+
+        # Live slots grouped by document
+        live = np.flatnonzero(alive)
+        docs = state["chunks.doc_ids"][live]
+        order = np.argsort(docs, kind="stable")
+        doc_ids, starts = np.unique(docs[order], return_index=True)
+        state["documents.ids"] = doc_ids
+        state["documents.offsets"] = np.append(starts, len(live)).astype(np.int64)
+        state["documents.slots"] = live[order].astype(np.uint32)
+        state["counts"] = np.array([self._live, self._next_term, 0], dtype=np.int64)
+        return state
+
+    def _delta(self) -> Dict[str, np.ndarray]:
+        """Changes since the restored snapshot as flat arrays, see _apply()"""
+        table = self._table
+        state = {f"chunks.{name}": column for name, column in table.columns(table.split).items()}
+        state["chunks.dead"] = np.flatnonzero(
+            np.frombuffer(table.alive, dtype=np.uint8)[:table.split] == 0).astype(np.uint32)
+        added = sorted((term_id, term) for term, term_id in self._vocab.items() if term_id >= self._base_terms)
+        state["lexicon.terms"] = np.array([term for _, term in added], dtype=str)
+        state["lexicon.ids"] = np.array([term_id for term_id, _ in added], dtype=np.uint32)
+        term_ids = sorted(self._postings)
+        tails = [np.array(self._postings[term_id], dtype=np.uint32) for term_id in term_ids]
+        state["postings.ids"] = np.array(term_ids, dtype=np.int64)
+        state["postings.offsets"] = np.concatenate(([0], np.cumsum([len(t) for t in tails]))).astype(np.int64)
+        state["postings.slots"] = np.concatenate(tails) if tails else _EMPTY_SLOTS
+        state["counts"] = np.array([self._live, self._next_term, self._dead_postings], dtype=np.int64)
+        return state
+
+    def _restore(self, state: Dict[str, np.ndarray], sources: Dict[int, str]) -> None:
+        """Replace the index with a base snapshot's arrays, used in place"""
+        self._reset()
+        self._table.restore({name: state[f"chunks.{name}"] for name in (*COLUMNS, "alive")})
+        self._table.sources = dict(sources)
+        self._live, self._next_term, self._dead_postings = (int(v) for v in state["counts"])
+        self._lexicon = state["lexicon.hashes"]
+        self._lexicon_ids = state["lexicon.ids"]
+        self._posting_offsets = state["postings.offsets"]
+        self._posting_slots = state["postings.slots"]
+        self._base_docs = state["documents.ids"]
+        self._doc_offsets = state["documents.offsets"]
+        self._base_doc_slots = state["documents.slots"]
+        self._base_terms = len(self._posting_offsets) - 1
+
+    def _apply(self, delta: Dict[str, np.ndarray]) -> None:
+        """Replay a delta written by _delta() on the snapshot it was taken against"""
+        table = self._table
+        for slot in delta["chunks.dead"].tolist():
+            table.alive[slot] = 0
+        first = len(table)
+        table.extend({name: delta[f"chunks.{name}"] for name in (*COLUMNS, "alive")})
+        self._vocab.update(zip(delta["lexicon.terms"].tolist(), delta["lexicon.ids"].tolist()))
+        offsets, slots = delta["postings.offsets"], delta["postings.slots"]
+        for i, term_id in enumerate(delta["postings.ids"].tolist()):
+            self._postings[term_id] = array("I", slots[offsets[i]:offsets[i + 1]].tobytes())
+        doc_ids = delta["chunks.doc_ids"]
+        for slot in np.flatnonzero(delta["chunks.alive"]).tolist():
+            self._doc_slots.setdefault(int(doc_ids[slot]), array("I")).append(first + slot)
+        self._live, self._next_term, self._dead_postings = (int(v) for v in delta["counts"])
@@ -0,0 +1,95 @@
+# rag/segment.py
+import mmap
+import os
+import tempfile
+import threading
+import zlib
+from typing import Optional, Tuple
+
+# (byte offset, byte length) of a record in the segment
+Record = Tuple[int, int]
+
+
+class SegmentFile:
+    def __init__(self, path: Optional[str] = None, compress: bool = False, directory: Optional[str] = None):
+        """
+        Append-only file of text (or raw byte) records, read back through a memory map.
+
+        Text handed to append() leaves the Python heap; the OS page cache
+        keeps whatever is read often and drops the rest, so resident memory
+        does not grow with the amount of text stored. Records are never
+        rewritten, which keeps already-returned offsets valid for readers
+        on other threads.
+
+        Args:
+            path: File to append to, None for an unnamed temporary file
+            compress: zlib-compress each record; smaller on disk, slower to read
+            directory: Where the temporary file goes when path is None
+        """
+        self.path = path
+        self.compress = compress
+        if path is None:
+            self._file = tempfile.TemporaryFile(dir=directory or None)
+        else:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._file = open(path, "a+b")
+        self._file.seek(0, os.SEEK_END)
+        self.size = self._file.tell()
+        # (map, bytes it covers), swapped as one so readers never see a mismatched pair
+        self._view: Tuple[Optional[mmap.mmap], int] = (None, 0)
+        self._lock = threading.Lock()
+
+    def append(self, text: str) -> Record:
+        return self.append_bytes(text.encode("utf-8"))
+
+    def append_bytes(self, data: bytes) -> Record:
+        if self.compress:
+            data = zlib.compress(data)
+        with self._lock:
+            offset = self.size
+            self._file.write(data)
+            self.size += len(data)
+        return offset, len(data)
+
+    def _remap(self) -> mmap.mmap:
+        with self._lock:
+            if self._view[1] < self.size:
+                # Writes are buffered until something needs to read them
+                self._file.flush()
+                # The previous map stays valid for readers still holding it
+                self._view = (mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ), self.size)
+            return self._view[0]
+
+    def flush(self) -> int:
+        """Push buffered records to the file; returns the bytes it now holds"""
+        with self._lock:
+            self._file.flush()
+            return self.size
+
+    def truncate(self, size: int) -> None:
+        """Drop records past size, e.g. ones written after the last snapshot"""
+        with self._lock:
+            if size < self.size:
+                self._file.flush()
+                self._file.truncate(size)
+                self.size = size
+                self._view = (None, 0)
+
+    def read(self, offset: int, length: int) -> str:
+        return self.read_bytes(offset, length).decode("utf-8")
+
+    def read_bytes(self, offset: int, length: int) -> bytes:
+        view, mapped = self._view
+        if offset + length > mapped:
+            view = self._remap()
+        data = view[offset:offset + length]
+        if self.compress:
+            data = zlib.decompress(data)
+        return data
+
+    def close(self) -> None:
+        with self._lock:
+            if self._view[0] is not None:
+                self._view[0].close()
+            self._view = (None, 0)
+            self._file.close()
@@ -0,0 +1,39 @@
+# server.py
+import argparse
+import logging
+
+from aiohttp import web
+
+from config.settings import Settings
+from core.service import create_service
+from database.db_manager import DatabaseManager
+from utils.metrics import metrics
+
+
+def main(argv=None):
+    settings = Settings().current_settings
+    server_settings = settings.get('server', {})
+
+    parser = argparse.ArgumentParser(description="Serve the chat and knowledge-base pipeline over HTTP")
+    parser.add_argument("--host", default=server_settings.get('host', '127.0.0.1'))
+    parser.add_argument("--port", type=int, default=server_settings.get('port', 8080))
+    parser.add_argument("--api-base", help="Ollama API URL (default: api_base from config)")
+    parser.add_argument("--model", help="model for requests that name none (default: default_model from config)")
+    parser.add_argument("--no-db", action="store_true", help="don't record turns in the database")
+    args = parser.parse_args(argv)
+
+    if args.api_base:
+        settings['api_base'] = args.api_base
+    if args.model:
+        settings['default_model'] = args.model
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    # /metrics is always served, so always record
+    metrics.enabled = True
+    db = None if args.no_db else DatabaseManager(settings.get('db_path', 'data/ollama_gui.db'))
+    service = create_service(settings, db)
+    web.run_app(service.create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,11 @@
-from .api_client import OllamaAPI, OllamaAPIError, ModelInfo, GenerateResponse
+from .api_client import (
+    OllamaAPI, OllamaAPIError, ModelInfo, GenerateResponse, GenerateChunk, GenerateStats,
+    GenerationMetrics, ProgressUpdate
+)
+from .async_runner import AsyncRunner
+from .ndjson import NDJSONDecoder, iter_ndjson
 
-__all__ = ['OllamaAPI', 'OllamaAPIError', 'ModelInfo', 'GenerateResponse']
\ No newline at end of file
+__all__ = [
+    'OllamaAPI', 'OllamaAPIError', 'ModelInfo', 'GenerateResponse', 'GenerateChunk', 'GenerateStats',
+    'GenerationMetrics', 'ProgressUpdate', 'AsyncRunner', 'NDJSONDecoder', 'iter_ndjson'
+]
\ No newline at end of file
@@ -2,10 +2,13 @@ import aiohttp
 import asyncio
 import json
 import logging
-from typing import Dict, Any, Optional, List, Tuple
+import time
+from typing import Dict, Any, Optional, List, Tuple, Callable, AsyncIterator, Union
 from dataclasses import dataclass
 from datetime import datetime
-import backoff  # for retry logic
+from .metrics import metrics
+from .ndjson import iter_ndjson
+from .resilience import CircuitBreaker, Deadlines, LatencyTracker, RetryPolicy
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -28,8 +31,85 @@ class GenerateResponse:
     prompt_eval_duration: int
     eval_duration: int
     tokens: int
+    prompt_eval_count: int
+    eval_count: int
     raw_response: Dict[str, Any]
 
+@dataclass
+class GenerateChunk:
+    """One streamed piece of a /generate response"""
+    response: str
+    model: str = ""
+    created_at: str = ""
+    done: bool = False
+
+@dataclass
+class GenerateStats:
+    """Final `done` record of a /generate stream; durations in nanoseconds"""
+    model: str
+    done_reason: str
+    context: List[int]
+    total_duration: int
+    load_duration: int
+    prompt_eval_count: int
+    prompt_eval_duration: int
+    eval_count: int
+    eval_duration: int
+    raw_response: Dict[str, Any]
+    response: str = ""
+    done: bool = True
+
+@dataclass
+class ProgressUpdate:
+    """Status record streamed by /pull, /push and /create"""
+    status: str
+    digest: str = ""
+    total: int = 0
+    completed: int = 0
+
+NS_PER_SECOND = 1e9
+
+@dataclass
+class GenerationMetrics:
+    """Latency breakdown for one generation, all durations in seconds"""
+    model: str
+    queue_time: float = 0.0
+    retrieval_time: float = 0.0
+    time_to_first_token: Optional[float] = None
+    total_time: float = 0.0
+    load_duration: float = 0.0
+    prompt_eval_duration: float = 0.0
+    eval_duration: float = 0.0
+    server_total_duration: float = 0.0
+    prompt_eval_count: int = 0
+    eval_count: int = 0
+    success: bool = True
+    error: Optional[str] = None
+    comparison: Optional[str] = None  # shared by the runs of one model comparison
+
+    @property
+    def tokens_per_second(self) -> float:
+        """Decode rate as measured by the server, falling back to client timing"""
+        if self.eval_duration > 0:
+            return self.eval_count / self.eval_duration
+        streaming_time = self.total_time - (self.time_to_first_token or 0.0)
+        return self.eval_count / streaming_time if streaming_time > 0 else 0.0
+
+    @property
+    def client_overhead(self) -> float:
+        """Wall time not accounted for by the server's own total_duration"""
+        return max(0.0, self.queue_time + self.retrieval_time + self.total_time - self.server_total_duration)
+
+    def update_from_stats(self, stats: Union[GenerateStats, GenerateResponse]) -> "GenerationMetrics":
+        """Copy Ollama's timing fields (nanoseconds) from a final stats record"""
+        self.load_duration = stats.load_duration / NS_PER_SECOND
+        self.prompt_eval_duration = stats.prompt_eval_duration / NS_PER_SECOND
+        self.eval_duration = stats.eval_duration / NS_PER_SECOND
+        self.server_total_duration = stats.total_duration / NS_PER_SECOND
+        self.prompt_eval_count = stats.prompt_eval_count
+        self.eval_count = stats.eval_count
+        return self
+
 class OllamaAPIError(Exception):
     def __init__(self, message: str, status_code: Optional[int] = None, response_text: Optional[str] = None):
         self.message = message
@@ -37,20 +117,127 @@ class OllamaAPIError(Exception):
         self.response_text = response_text
         super().__init__(self.message)
 
+class CircuitOpenError(OllamaAPIError):
+    """Raised without contacting the server while an endpoint's circuit is open"""
+
+# Endpoints that only read, so sending them twice is harmless
+IDEMPOTENT_ENDPOINTS = frozenset(("tags", "show", "embed", "embeddings", "ps", "version"))
+
+def _is_transient(error: OllamaAPIError) -> bool:
+    """Connection trouble, timeouts, overload and server errors; not bad requests"""
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error.__cause__, (aiohttp.ClientError, asyncio.TimeoutError)):
+        return True
+    return error.status_code is not None and (error.status_code >= 500 or error.status_code == 429)
+
+def _settle(breaker: CircuitBreaker, healthy: Optional[bool]) -> None:
+    # None means the request was abandoned before the server answered either way
+    if healthy is None:
+        breaker.release()
+    elif healthy:
+        breaker.record_success()
+    else:
+        breaker.record_failure()
+
+def _model_label(data: Optional[Dict[str, Any]]) -> str:
+    if not data:
+        return ""
+    return data.get("model") or data.get("name", "")
+
+def _check_error(record: Dict[str, Any]) -> None:
+    # Ollama reports mid-stream failures as {"error": "..."} records
+    if "error" in record:
+        raise OllamaAPIError(f"API request failed: {record['error']}")
+
+def _parse_generate(record: Dict[str, Any]) -> Union[GenerateChunk, GenerateStats]:
+    _check_error(record)
+    if not record.get("done"):
+        return GenerateChunk(
+            response=record.get("response", ""),
+            model=record.get("model", ""),
+            created_at=record.get("created_at", "")
+        )
+    return GenerateStats(
+        model=record.get("model", ""),
+        done_reason=record.get("done_reason", ""),
+        context=record.get("context", []),
+        total_duration=record.get("total_duration", 0),
+        load_duration=record.get("load_duration", 0),
+        prompt_eval_count=record.get("prompt_eval_count", 0),
+        prompt_eval_duration=record.get("prompt_eval_duration", 0),
+        eval_count=record.get("eval_count", 0),
+        eval_duration=record.get("eval_duration", 0),
+        raw_response=record,
+        response=record.get("response", "")
+    )
+
+def _parse_progress(record: Dict[str, Any]) -> ProgressUpdate:
+    _check_error(record)
+    return ProgressUpdate(
+        status=record.get("status", ""),
+        digest=record.get("digest", ""),
+        total=record.get("total", 0),
+        completed=record.get("completed", 0)
+    )
+
 class OllamaAPI:
-    def __init__(self, base_url: str = "http://localhost:11434/api", timeout: int = 30):
+    def __init__(
+        self,
+        base_url: str = "http://localhost:11434/api",
+        timeout: float = 30,
+        deadlines: Optional[Deadlines] = None,
+        generation_timeout: Optional[float] = 600,
+        retry: Optional[RetryPolicy] = None,
+        hedge_percentile: Optional[float] = None,
+        breaker_threshold: int = 5,
+        breaker_reset: float = 30.0
+    ):
         """
         Initialize the Ollama API client.
         
         Args:
             base_url: Base URL for the Ollama API
-            timeout: Request timeout in seconds
+            timeout: Request timeout in seconds, used when deadlines is not given
+            deadlines: Connect / first-byte / total limits for ordinary requests
+            generation_timeout: Total limit for a generation, streamed or not; None is unbounded
+            retry: Backoff for retrying idempotent requests after transient failures
+            hedge_percentile: Send a duplicate idempotent request once the first has taken
+                longer than this percentile (0-100) of recent latencies; None disables hedging
+            breaker_threshold: Consecutive failures that open an endpoint's circuit
+            breaker_reset: Seconds an open circuit fails fast before a trial request
         """
         self.base_url = base_url.rstrip('/')
-        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.deadlines = deadlines or Deadlines(connect=min(5.0, timeout), first_byte=timeout, total=timeout)
+        self.generation_timeout = generation_timeout
+        self.timeout = self.deadlines.client_timeout()
+        self.retry = retry or RetryPolicy()
+        self.hedge_percentile = hedge_percentile
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.latencies = LatencyTracker()
         self.session = None
         self._initialize_headers()
 
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Any]) -> "OllamaAPI":
+        """Build the client from the settings dictionary"""
+        api = settings.get('api', {})
+        return cls(
+            settings.get('api_base', 'http://localhost:11434/api'),
+            deadlines=Deadlines(
+                connect=api.get('connect_timeout', 5),
+                first_byte=api.get('first_byte_timeout', 30),
+                total=api.get('request_timeout', 30)
+            ),
+            generation_timeout=api.get('generation_timeout', 600),
+            retry=RetryPolicy(max_tries=api.get('max_tries', 3)),
+            hedge_percentile=api.get('hedge_percentile') or None,
+            breaker_threshold=api.get('breaker_threshold', 5),
+            breaker_reset=api.get('breaker_reset', 30)
+        )
+
     def _initialize_headers(self) -> None:
         """Initialize default headers for API requests"""
         self.headers = {
@@ -68,22 +255,49 @@ class OllamaAPI:
         if self.session:
             await self.session.close()
 
-    @backoff.on_exception(backoff.expo, aiohttp.ClientError, max_tries=3)
+    def _breaker(self, endpoint: str) -> CircuitBreaker:
+        breaker = self.breakers.get(endpoint)
+        if breaker is None:
+            breaker = self.breakers[endpoint] = CircuitBreaker(self.breaker_threshold, self.breaker_reset)
+        return breaker
+
+    def _acquire(self, endpoint: str, model: str) -> CircuitBreaker:
+        breaker = self._breaker(endpoint)
+        if not breaker.allow():
+            if metrics.enabled:
+                metrics.short_circuits.inc(model, endpoint)
+            raise CircuitOpenError(
+                f"{endpoint} is failing, not retrying for {breaker.retry_after():.1f}s")
+        return breaker
+
+    @property
+    def generation_deadlines(self) -> Deadlines:
+        """Deadlines for a non-streamed generation, whose first byte is its last"""
+        return Deadlines(self.deadlines.connect, self.generation_timeout, self.generation_timeout)
+
     async def _make_request(
         self,
         method: str,
         endpoint: str,
         data: Optional[Dict[str, Any]] = None,
-        params: Optional[Dict[str, Any]] = None
+        params: Optional[Dict[str, Any]] = None,
+        deadlines: Optional[Deadlines] = None,
+        idempotent: Optional[bool] = None
     ) -> Tuple[Dict[str, Any], int]:
         """
-        Make an HTTP request to the Ollama API with retry logic.
+        Make an HTTP request to the Ollama API.
+        
+        Idempotent requests are retried with jittered backoff after transient
+        failures and may be hedged; all requests fail fast while the
+        endpoint's circuit is open.
         
         Args:
             method: HTTP method (GET, POST, etc.)
             endpoint: API endpoint
             data: Request body data
             params: Query parameters
+            deadlines: Overrides the client's deadlines; total covers every attempt
+            idempotent: Overrides the GET / IDEMPOTENT_ENDPOINTS rule
         
         Returns:
             Tuple of (response_data, status_code)
@@ -91,10 +305,83 @@ class OllamaAPI:
         if self.session is None:
             self.session = aiohttp.ClientSession(timeout=self.timeout, headers=self.headers)
 
+        deadlines = deadlines or self.deadlines
+        if idempotent is None:
+            idempotent = method == "GET" or endpoint in IDEMPOTENT_ENDPOINTS
+        tries = self.retry.max_tries if idempotent else 1
+        give_up_at = None if deadlines.total is None else time.monotonic() + deadlines.total
+        attempt = 0
+        while True:
+            attempt += 1
+            remaining = None if give_up_at is None else give_up_at - time.monotonic()
+            try:
+                return await self._send(method, endpoint, data, params, deadlines.with_total(remaining), idempotent)
+            except OllamaAPIError as e:
+                if attempt >= tries or not _is_transient(e):
+                    raise
+                delay = self.retry.delay(attempt)
+                if give_up_at is not None and time.monotonic() + delay >= give_up_at:
+                    raise
+                if metrics.enabled:
+                    metrics.retries.inc(_model_label(data), endpoint)
+                logger.info(f"Retrying {endpoint} in {delay:.2f}s: {e.message}")
+                await asyncio.sleep(delay)
+
+    async def _send(
+        self,
+        method: str,
+        endpoint: str,
+        data: Optional[Dict[str, Any]],
+        params: Optional[Dict[str, Any]],
+        deadlines: Deadlines,
+        hedge: bool
+    ) -> Tuple[Dict[str, Any], int]:
+        """One attempt, duplicated if it outlasts the hedge percentile"""
+        delay = None
+        if hedge and self.hedge_percentile:
+            delay = self.latencies.percentile(endpoint, self.hedge_percentile)
+        if delay is None:
+            return await self._attempt(method, endpoint, data, params, deadlines)
+
+        primary = asyncio.ensure_future(self._attempt(method, endpoint, data, params, deadlines))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return primary.result()
+            if metrics.enabled:
+                metrics.hedges.inc(_model_label(data), endpoint)
+            tasks.append(asyncio.ensure_future(self._attempt(method, endpoint, data, params, deadlines)))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            raise primary.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _attempt(
+        self,
+        method: str,
+        endpoint: str,
+        data: Optional[Dict[str, Any]],
+        params: Optional[Dict[str, Any]],
+        deadlines: Deadlines
+    ) -> Tuple[Dict[str, Any], int]:
+        model = _model_label(data)
+        breaker = self._acquire(endpoint, model)
         url = f"{self.base_url}/{endpoint}"
+        started = time.perf_counter()
+        failed = True
+        healthy = None
         
         try:
-            async with self.session.request(method, url, json=data, params=params) as response:
+            async with self.session.request(
+                method, url, json=data, params=params, timeout=deadlines.client_timeout()
+            ) as response:
                 response_text = await response.text()
                 try:
                     response_data = json.loads(response_text) if response_text else {}
@@ -108,10 +395,30 @@ class OllamaAPI:
                         response_text
                     )
                 
+                failed = False
+                healthy = True
+                self.latencies.observe(endpoint, time.perf_counter() - started)
                 return response_data, response.status
                 
         except aiohttp.ClientError as e:
-            raise OllamaAPIError(f"Request failed: {str(e)}")
+            healthy = False
+            raise OllamaAPIError(f"Request failed: {str(e)}") from e
+        except asyncio.TimeoutError as e:
+            healthy = False
+            raise OllamaAPIError(f"Request to {endpoint} timed out") from e
+        except OllamaAPIError as e:
+            # The server answered; only overload and server errors count against it
+            healthy = not _is_transient(e)
+            raise
+        finally:
+            _settle(breaker, healthy)
+            if metrics.enabled:
+                self._record_request(endpoint, model, time.perf_counter() - started, failed)
+
+    def _record_request(self, endpoint: str, model: str, elapsed: float, failed: bool) -> None:
+        metrics.request_latency.observe(elapsed, model, endpoint)
+        if failed:
+            metrics.errors.inc(model, endpoint)
 
     async def generate(
         self,
@@ -121,7 +428,10 @@ class OllamaAPI:
         template: Optional[str] = None,
         context: Optional[List[int]] = None,
         options: Optional[Dict[str, Any]] = None,
-        stream: bool = False
+        stream: bool = False,
+        keep_alive: Optional[Union[str, int]] = None,
+        deadlines: Optional[Deadlines] = None,
+        images: Optional[List[str]] = None
     ) -> GenerateResponse:
         """
         Generate a response from the model.
@@ -134,6 +444,9 @@ class OllamaAPI:
             context: Context from previous generation
             options: Additional model options
             stream: Whether to stream the response
+            keep_alive: How long the server keeps the model loaded afterwards ("10m", seconds, -1 forever)
+            deadlines: Overrides generation_deadlines for this request
+            images: Base64-encoded images for vision models
         
         Returns:
             GenerateResponse object
@@ -145,10 +458,12 @@ class OllamaAPI:
             **({"template": template} if template else {}),
             **({"context": context} if context else {}),
             **({"options": options} if options else {}),
+            **({"images": images} if images else {}),
+            **({"keep_alive": keep_alive} if keep_alive is not None else {}),
             "stream": stream
         }
 
-        response_data, _ = await self._make_request("POST", "generate", data)
+        response_data, _ = await self._make_request("POST", "generate", data, deadlines=deadlines or self.generation_deadlines)
         
         return GenerateResponse(
             response=response_data.get("response", ""),
@@ -157,10 +472,82 @@ class OllamaAPI:
             load_duration=response_data.get("load_duration", 0),
             prompt_eval_duration=response_data.get("prompt_eval_duration", 0),
             eval_duration=response_data.get("eval_duration", 0),
-            tokens=response_data.get("tokens", 0),
+            tokens=response_data.get("eval_count", 0),
+            prompt_eval_count=response_data.get("prompt_eval_count", 0),
+            eval_count=response_data.get("eval_count", 0),
             raw_response=response_data
         )
 
+    async def _stream(
+        self,
+        endpoint: str,
+        data: Dict[str, Any],
+        parse: Callable[[Dict[str, Any]], Any],
+        cancel_event=None,
+        queue_size: int = 0,
+        deadlines: Optional[Deadlines] = None
+    ) -> AsyncIterator[Any]:
+        """
+        POST to a streaming endpoint and yield its NDJSON records as typed objects.
+        
+        Streams are never retried or hedged, but do fail fast while the
+        endpoint's circuit is open.
+        
+        Args:
+            endpoint: API endpoint
+            data: Request body data
+            parse: Converts each decoded record
+            cancel_event: Object with is_set() to abandon the stream early
+            queue_size: Bounded read-ahead queue size, 0 reads on demand
+            deadlines: Defaults to the client's connect and first-byte limits with no total,
+                since a long generation or download can legitimately outlive them
+        
+        Yields:
+            Parsed records
+        """
+        if self.session is None:
+            self.session = aiohttp.ClientSession(timeout=self.timeout, headers=self.headers)
+
+        deadlines = deadlines or self.deadlines.with_total(None)
+        breaker = self._acquire(endpoint, _model_label(data))
+        started = time.perf_counter()
+        failed = False
+        healthy = None
+        try:
+            async with self.session.post(
+                f"{self.base_url}/{endpoint}", json=data, timeout=deadlines.client_timeout()
+            ) as response:
+                if not response.ok:
+                    response_text = await response.text()
+                    raise OllamaAPIError(
+                        f"API request failed: {response_text}",
+                        response.status,
+                        response_text
+                    )
+                healthy = True
+                async for item in iter_ndjson(response.content, parse, cancel_event, queue_size):
+                    yield item
+        except aiohttp.ClientError as e:
+            failed = True
+            healthy = False
+            raise OllamaAPIError(f"Request failed: {str(e)}") from e
+        except asyncio.TimeoutError as e:
+            failed = True
+            healthy = False
+            raise OllamaAPIError(f"Request to {endpoint} timed out") from e
+        except OllamaAPIError as e:
+            failed = True
+            if healthy is None:
+                healthy = not _is_transient(e)
+            raise
+        except Exception:
+            failed = True
+            raise
+        finally:
+            _settle(breaker, healthy)
+            if metrics.enabled:
+                self._record_request(endpoint, _model_label(data), time.perf_counter() - started, failed)
+
     async def generate_stream(
         self,
         prompt: str,
@@ -168,16 +555,25 @@ class OllamaAPI:
         system: Optional[str] = None,
         template: Optional[str] = None,
         context: Optional[List[int]] = None,
-        options: Optional[Dict[str, Any]] = None
-    ):
+        options: Optional[Dict[str, Any]] = None,
+        cancel_event=None,
+        queue_size: int = 0,
+        keep_alive: Optional[Union[str, int]] = None,
+        deadlines: Optional[Deadlines] = None,
+        images: Optional[List[str]] = None
+    ) -> AsyncIterator[Union[GenerateChunk, GenerateStats]]:
         """
         Stream responses from the model.
         
         Args:
-            Same as generate()
+            Same as generate(), plus
+            cancel_event: Object with is_set() to stop reading early
+            queue_size: Bounded read-ahead queue size, 0 reads on demand
+            deadlines: Overrides the client's first-byte limit and generation_timeout
+            images: Base64-encoded images for vision models
         
         Yields:
-            Stream of responses
+            GenerateChunk objects, then one GenerateStats with the timing fields
         """
         data = {
             "model": model,
@@ -186,19 +582,31 @@ class OllamaAPI:
             **({"template": template} if template else {}),
             **({"context": context} if context else {}),
             **({"options": options} if options else {}),
+            **({"images": images} if images else {}),
+            **({"keep_alive": keep_alive} if keep_alive is not None else {}),
             "stream": True
         }
 
-        if self.session is None:
-            self.session = aiohttp.ClientSession(timeout=self.timeout, headers=self.headers)
+        started = time.perf_counter()
+        first_token = True
+        deadlines = deadlines or self.deadlines.with_total(self.generation_timeout)
+        async for chunk in self._stream("generate", data, _parse_generate, cancel_event, queue_size, deadlines):
+            if first_token and chunk.response:
+                first_token = False
+                if metrics.enabled:
+                    metrics.time_to_first_token.observe(time.perf_counter() - started, model, "generate")
+            yield chunk
 
-        async with self.session.post(f"{self.base_url}/generate", json=data) as response:
-            async for line in response.content:
-                if line:
-                    try:
-                        yield json.loads(line)
-                    except json.JSONDecodeError:
-                        logger.error(f"Failed to decode streaming response: {line}")
+    async def load_model(self, model: str, keep_alive: Union[str, int] = "5m") -> None:
+        """
+        Load a model into memory without generating anything.
+        
+        Args:
+            model: Model name to load
+            keep_alive: How long the server keeps it loaded
+        """
+        await self._make_request("POST", "generate", {"model": model, "keep_alive": keep_alive, "stream": False},
+                                 deadlines=self.generation_deadlines)
 
     async def list_models(self) -> List[ModelInfo]:
         """Get list of available models"""
@@ -247,39 +655,57 @@ class OllamaAPI:
         except OllamaAPIError:
             return False
 
-    async def pull_model(self, name: str) -> bool:
-        """Pull a model from the registry"""
+    async def _progress_request(
+        self,
+        endpoint: str,
+        data: Dict[str, Any],
+        progress: Optional[Callable[[ProgressUpdate], None]] = None
+    ) -> bool:
+        """Run a streaming /pull, /push or /create request to completion"""
         try:
-            await self._make_request("POST", "pull", {"name": name})
+            async for update in self._stream(endpoint, {**data, "stream": True}, _parse_progress):
+                if progress:
+                    progress(update)
             return True
-        except OllamaAPIError:
+        except OllamaAPIError as e:
+            logger.error(f"{endpoint} failed: {e.message}")
             return False
 
-    async def push_model(self, name: str) -> bool:
+    async def pull_model_stream(self, name: str, cancel_event=None) -> AsyncIterator[ProgressUpdate]:
+        """Pull a model from the registry, yielding download progress"""
+        async for update in self._stream("pull", {"name": name, "stream": True}, _parse_progress, cancel_event):
+            yield update
+
+    async def pull_model(
+        self,
+        name: str,
+        progress: Optional[Callable[[ProgressUpdate], None]] = None
+    ) -> bool:
+        """Pull a model from the registry"""
+        return await self._progress_request("pull", {"name": name}, progress)
+
+    async def push_model(
+        self,
+        name: str,
+        progress: Optional[Callable[[ProgressUpdate], None]] = None
+    ) -> bool:
         """Push a model to the registry"""
-        try:
-            await self._make_request("POST", "push", {"name": name})
-            return True
-        except OllamaAPIError:
-            return False
+        return await self._progress_request("push", {"name": name}, progress)
 
     async def create_model(
         self,
         name: str,
         modelfile: str,
-        path: Optional[str] = None
+        path: Optional[str] = None,
+        progress: Optional[Callable[[ProgressUpdate], None]] = None
     ) -> bool:
         """Create a model from a Modelfile"""
-        try:
-            data = {
-                "name": name,
-                "modelfile": modelfile,
-                **({"path": path} if path else {})
-            }
-            await self._make_request("POST", "create", data)
-            return True
-        except OllamaAPIError:
-            return False
+        data = {
+            "name": name,
+            "modelfile": modelfile,
+            **({"path": path} if path else {})
+        }
+        return await self._progress_request("create", data, progress)
 
 # Example usage:
 async def example_usage():
@@ -303,7 +729,7 @@ async def example_usage():
             prompt="Tell me a story",
             model="llama2"
         ):
-            print(chunk.get("response", ""), end="", flush=True)
+            print(chunk.response, end="", flush=True)
 
 if __name__ == "__main__":
     # Run example
@@ -0,0 +1,32 @@
+# utils/async_runner.py
+import asyncio
+import concurrent.futures
+import threading
+from typing import Awaitable, TypeVar
+
+T = TypeVar("T")
+
+
+class AsyncRunner:
+    def __init__(self):
+        """
+        Run an asyncio event loop on a daemon thread so the Tk main loop never
+        blocks on network I/O. Coroutines are submitted from any thread and
+        results come back as concurrent.futures.Future objects.
+        """
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, name="ollama-async", daemon=True)
+        self.thread.start()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro: Awaitable[T]) -> "concurrent.futures.Future[T]":
+        """Schedule a coroutine on the background loop"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self) -> None:
+        """Stop the loop; pending coroutines are abandoned"""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
@@ -0,0 +1,132 @@
+# utils/conversation.py
+import logging
+import threading
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from rag.packer import estimate_tokens
+from .api_client import OllamaAPI
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """Summarise the conversation below so it can replace the original turns as context for future replies.
+Keep facts, names, numbers, decisions, open questions and the user's stated preferences. Be concise and write in plain prose.
+
+{previous}{turns}
+
+Summary:"""
+
+
+@dataclass
+class Turn:
+    role: str  # "user" or "assistant"
+    text: str
+    tokens: int
+
+    def render(self) -> str:
+        return f"{'User' if self.role == 'user' else 'Assistant'}: {self.text}"
+
+
+class Conversation:
+    def __init__(self, budget_tokens: int = 1024, keep_recent: int = 4):
+        """
+        Rolling chat history that is resent with every prompt.
+
+        Once the history outgrows budget_tokens, everything but the last
+        keep_recent turns becomes eligible for compaction into a summary.
+        Access is locked because the Tk thread renders while the event loop
+        applies summaries.
+
+        Args:
+            budget_tokens: History size that triggers compaction
+            keep_recent: Turns always kept verbatim
+        """
+        self.budget_tokens = budget_tokens
+        self.keep_recent = keep_recent
+        self.turns: List[Turn] = []
+        self.summary = ""
+        self.summary_tokens = 0
+        self._lock = threading.Lock()
+
+    def add(self, role: str, text: str) -> None:
+        with self._lock:
+            self.turns.append(Turn(role, text, estimate_tokens(text)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self.turns.clear()
+            self.summary = ""
+            self.summary_tokens = 0
+
+    @property
+    def history_tokens(self) -> int:
+        with self._lock:
+            return self.summary_tokens + sum(turn.tokens for turn in self.turns)
+
+    def render(self) -> str:
+        """History text to prepend to the next prompt"""
+        with self._lock:
+            parts = []
+            if self.summary:
+                parts.append(f"Summary of the earlier conversation: {self.summary}")
+            parts.extend(turn.render() for turn in self.turns)
+            return "\n\n".join(parts)
+
+    def needs_compaction(self) -> bool:
+        return self.history_tokens > self.budget_tokens and len(self.turns) > self.keep_recent
+
+    def compactable(self) -> Tuple[str, List[Turn]]:
+        """Current summary plus the turns a compaction would fold into it"""
+        with self._lock:
+            return self.summary, list(self.turns[:max(0, len(self.turns) - self.keep_recent)])
+
+    def apply_summary(self, summary: str, turns: List[Turn]) -> None:
+        """Replace the summarised turns (still at the head of the list) with the new summary"""
+        with self._lock:
+            if self.turns[:len(turns)] != turns:
+                # History was cleared or rewritten while the summary was generated
+                return
+            del self.turns[:len(turns)]
+            self.summary = summary
+            self.summary_tokens = estimate_tokens(summary)
+
+
+class ConversationCompactor:
+    def __init__(self, api: OllamaAPI, model: Optional[str] = None, max_summary_tokens: int = 256):
+        """
+        Summarise old turns with a background request.
+
+        Args:
+            api: Client used for the summary request
+            model: Model to summarise with, None uses the chat model
+            max_summary_tokens: num_predict limit for the summary
+        """
+        self.api = api
+        self.model = model
+        self.max_summary_tokens = max_summary_tokens
+
+    async def compact(self, conversation: Conversation, chat_model: str) -> bool:
+        """
+        Fold old turns into the summary. Safe to cancel at any point; the
+        conversation only changes once a complete summary has arrived.
+        """
+        previous, turns = conversation.compactable()
+        if not turns:
+            return False
+        prompt = SUMMARY_PROMPT.format(
+            previous=f"Earlier summary: {previous}\n\n" if previous else "",
+            turns="\n\n".join(turn.render() for turn in turns)
+        )
+        parts = []
+        async for chunk in self.api.generate_stream(
+            prompt=prompt,
+            model=self.model or chat_model,
+            options={"num_predict": self.max_summary_tokens, "temperature": 0.2}
+        ):
+            parts.append(chunk.response)
+        summary = "".join(parts).strip()
+        if not summary:
+            return False
+        conversation.apply_summary(summary, turns)
+        logger.info(f"Compacted {len(turns)} turns into a {estimate_tokens(summary)}-token summary")
+        return True
@@ -0,0 +1,225 @@
+# utils/metrics.py
+import bisect
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+THROUGHPUT_BUCKETS = (1e3, 1e4, 1e5, 1e6, 5e6, 1e7, 5e7, 1e8, 5e8)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_float(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        return self._values.get(labelvalues, 0.0)
+
+    def render(self, openmetrics: bool) -> List[str]:
+        family = self.name if openmetrics else f"{self.name}_total"
+        lines = [f"# HELP {family} {self.documentation}", f"# TYPE {family} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        for labelvalues, value in items:
+            lines.append(f"{self.name}_total{_format_labels(self.labelnames, labelvalues)} {_format_float(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labelvalues -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labelvalues: str) -> int:
+        series = self._series.get(labelvalues)
+        return series[2] if series else 0
+
+    def render(self, openmetrics: bool) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, list(v[0]), v[1], v[2]) for k, v in self._series.items()]
+        for labelvalues, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, labelvalues, f'le="{_format_float(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {_format_float(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self, prefix: str = "ollama_client"):
+        """
+        Client-side metrics for the Ollama frontend.
+
+        Instrumented code checks `metrics.enabled` before recording, so a
+        disabled registry costs one attribute lookup per call site.
+        """
+        self.enabled = False
+        self._metrics = []
+        labels = ("model", "endpoint")
+
+        self.request_latency = self.histogram(
+            f"{prefix}_request_latency_seconds", "Wall time of Ollama API requests", labels)
+        self.time_to_first_token = self.histogram(
+            f"{prefix}_time_to_first_token_seconds", "Time from request to first streamed token", labels)
+        self.retrieval_time = self.histogram(
+            f"{prefix}_retrieval_seconds", "Knowledge-base retrieval time per query", labels)
+        self.ingestion_throughput = self.histogram(
+            f"{prefix}_ingestion_bytes_per_second", "Knowledge-base ingestion throughput", labels,
+            buckets=THROUGHPUT_BUCKETS)
+        self.ui_lag = self.histogram(
+            f"{prefix}_ui_event_loop_lag_seconds", "Delay of Tk event-loop callbacks past their due time")
+        self.cache_hits = self.counter(f"{prefix}_cache_hits", "Cache hits", labels)
+        self.cache_misses = self.counter(f"{prefix}_cache_misses", "Cache misses", labels)
+        self.retries = self.counter(f"{prefix}_retries", "Retried Ollama API requests", labels)
+        self.errors = self.counter(f"{prefix}_errors", "Failed Ollama API requests", labels)
+        self.hedges = self.counter(f"{prefix}_hedges", "Duplicate requests sent after a slow first attempt", labels)
+        self.short_circuits = self.counter(
+            f"{prefix}_short_circuits", "Requests refused while the endpoint's circuit was open", labels)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self, openmetrics: bool = False) -> str:
+        """Exposition text in Prometheus 0.0.4 or OpenMetrics 1.0 format"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render(openmetrics))
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str) -> None:
+        """Atomically write the exposition for node_exporter's textfile collector"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".metrics-")
+        with os.fdopen(fd, "w") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+
+class MetricsExporter:
+    def __init__(self, registry: MetricsRegistry, port: Optional[int] = 9464, host: str = "127.0.0.1",
+                 textfile: Optional[str] = None, textfile_interval: float = 15.0):
+        """
+        Serve /metrics over HTTP and/or periodically write a textfile.
+
+        Args:
+            registry: Registry to expose
+            port: HTTP port (0 picks a free one), None disables the HTTP endpoint
+            host: Interface to bind
+            textfile: Path for textfile-collector output
+            textfile_interval: Seconds between textfile writes
+        """
+        self.registry = registry
+        self.port = port
+        self.host = host
+        self.textfile = textfile
+        self.textfile_interval = textfile_interval
+        self._server = None
+        self._stop = threading.Event()
+
+    def start(self) -> "MetricsExporter":
+        self.registry.enabled = True
+        if self.port is not None:
+            registry = self.registry
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split("?")[0] != "/metrics":
+                        self.send_error(404)
+                        return
+                    openmetrics = "application/openmetrics-text" in self.headers.get("Accept", "")
+                    body = registry.render(openmetrics).encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type",
+                                     OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+            self.port = self._server.server_address[1]
+            threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        if self.textfile:
+            threading.Thread(target=self._write_textfile_loop, name="metrics-textfile", daemon=True).start()
+        return self
+
+    def _write_textfile_loop(self) -> None:
+        while not self._stop.wait(self.textfile_interval):
+            self.registry.write_textfile(self.textfile)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self.textfile:
+            self.registry.write_textfile(self.textfile)
+
+
+# Process-wide registry; disabled until an exporter is started
+metrics = MetricsRegistry()
@@ -0,0 +1,291 @@
+# utils/mock_server.py
+import asyncio
+import hashlib
+import json
+import math
+import socket
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+
+@dataclass
+class MockConfig:
+    """Behaviour knobs for the mock Ollama server"""
+    latency: float = 0.0          # seconds before the first byte of every response
+    load_duration: float = 0.0    # simulated model load time reported in stats
+    token_rate: float = 0.0       # tokens per second while streaming, 0 = unthrottled
+    tokens: int = 64              # tokens generated per request
+    embedding_dim: int = 384
+    pull_layers: int = 2          # blobs per pulled model
+    pull_layer_size: int = 10_000_000
+    pull_steps: int = 20          # progress records per blob
+    pull_drops: int = 0           # pulls to cut off half way, to exercise resumption
+    failures: int = 0             # requests to answer with 503, to exercise retries and circuit breaking
+    tail_every: int = 0           # every Nth request is slow, 0 = none
+    tail_latency: float = 0.0     # extra delay of those slow requests
+    models: List[str] = field(default_factory=lambda: ["llama3.2-vision:latest", "mistral:latest"])
+
+
+class MockOllamaServer:
+    def __init__(self, config: Optional[MockConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        """
+        Local stand-in for the Ollama HTTP API.
+
+        Args:
+            config: Latency / throughput settings
+            host: Interface to bind
+            port: Port to bind, 0 picks a free one
+        """
+        self.config = config or MockConfig()
+        self.host = host
+        self.port = port
+        self.request_count = 0
+        self.image_bytes = 0
+        self._pull_offsets: Dict[str, int] = {}
+        self._runner = None
+
+    @property
+    def base_url(self) -> str:
+        """Base URL suitable for OllamaAPI(base_url=...)"""
+        return f"http://{self.host}:{self.port}/api"
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/api/generate", self.handle_generate)
+        app.router.add_get("/api/tags", self.handle_tags)
+        app.router.add_post("/api/show", self.handle_show)
+        app.router.add_post("/api/embeddings", self.handle_embeddings)
+        app.router.add_post("/api/embed", self.handle_embed)
+        app.router.add_post("/api/pull", self.handle_pull)
+        return app
+
+    async def start(self) -> "MockOllamaServer":
+        self._runner = web.AppRunner(self.create_app(), access_log=None)
+        await self._runner.setup()
+        # Bind the socket ourselves so an ephemeral port can be resolved
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        self.port = sock.getsockname()[1]
+        await web.SockSite(self._runner, sock).start()
+        return self
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+    async def _delay(self) -> None:
+        self.request_count += 1
+        if self.config.failures:
+            self.config.failures -= 1
+            raise web.HTTPServiceUnavailable(text=json.dumps({"error": "server busy"}),
+                                             content_type="application/json")
+        delay = self.config.latency
+        if self.config.tail_every and self.request_count % self.config.tail_every == 0:
+            delay += self.config.tail_latency
+        if delay:
+            await asyncio.sleep(delay)
+
+    def _token(self, i: int) -> str:
+        return f"tok{i} "
+
+    def _final_record(self, model: str, prompt: str, elapsed: float) -> Dict[str, Any]:
+        prompt_tokens = max(1, len(prompt) // 4)
+        eval_ns = int(elapsed * 1e9) or 1
+        return {
+            "model": model,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "response": "",
+            "done": True,
+            "done_reason": "stop",
+            "context": list(range(prompt_tokens + self.config.tokens)),
+            "total_duration": eval_ns + int(self.config.load_duration * 1e9),
+            "load_duration": int(self.config.load_duration * 1e9),
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": prompt_tokens * 1000,
+            "eval_count": self.config.tokens,
+            "eval_duration": eval_ns,
+        }
+
+    async def handle_generate(self, request: web.Request) -> web.StreamResponse:
+        await self._delay()
+        body = await request.json()
+        model = body.get("model", "")
+        prompt = body.get("prompt", "")
+        self.image_bytes += sum(len(image) for image in body.get("images") or [])
+        started = time.perf_counter()
+
+        if "prompt" not in body:
+            # No prompt only loads the model, as Ollama does for keep_alive warm-ups
+            await asyncio.sleep(self.config.load_duration)
+            return web.json_response({
+                "model": model,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "response": "",
+                "done": True,
+                "done_reason": "load",
+            })
+
+        if not body.get("stream", True):
+            if self.config.token_rate:
+                await asyncio.sleep(self.config.tokens / self.config.token_rate)
+            record = self._final_record(model, prompt, time.perf_counter() - started)
+            record["response"] = "".join(self._token(i) for i in range(self.config.tokens))
+            return web.json_response(record)
+
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        interval = 1.0 / self.config.token_rate if self.config.token_rate else 0
+        created_at = datetime.now(timezone.utc).isoformat()
+        try:
+            for i in range(self.config.tokens):
+                if interval:
+                    await asyncio.sleep(interval)
+                line = json.dumps({
+                    "model": model,
+                    "created_at": created_at,
+                    "response": self._token(i),
+                    "done": False,
+                })
+                await response.write(line.encode() + b"\n")
+            final = self._final_record(model, prompt, time.perf_counter() - started)
+            await response.write(json.dumps(final).encode() + b"\n")
+            await response.write_eof()
+        except ConnectionResetError:
+            # Client cancelled the stream
+            pass
+        return response
+
+    async def handle_tags(self, request: web.Request) -> web.Response:
+        await self._delay()
+        modified_at = datetime.now(timezone.utc).isoformat()
+        return web.json_response({"models": [
+            {
+                "name": name,
+                "model": name,
+                "modified_at": modified_at,
+                "size": 1_000_000_000 + i,
+                "digest": hashlib.sha256(name.encode()).hexdigest(),
+                "details": {"format": "gguf", "family": name.split(":")[0]},
+            }
+            for i, name in enumerate(self.config.models)
+        ]})
+
+    async def handle_show(self, request: web.Request) -> web.Response:
+        await self._delay()
+        body = await request.json()
+        name = body.get("name") or body.get("model", "")
+        if name not in self.config.models:
+            return web.json_response({"error": f"model '{name}' not found"}, status=404)
+        return web.json_response({
+            "name": name,
+            "modified_at": datetime.now(timezone.utc).isoformat(),
+            "digest": hashlib.sha256(name.encode()).hexdigest(),
+            "modelfile": f"FROM {name}",
+            "parameters": "",
+            "template": "{{ .Prompt }}",
+            "details": {"format": "gguf", "family": name.split(":")[0]},
+            "capabilities": ["completion", "vision"] if "vision" in name else ["completion"],
+        })
+
+    def _embedding(self, text: str) -> List[float]:
+        # Deterministic pseudo-embedding so identical text maps to identical vectors
+        seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+        values = [math.sin(seed * (i + 1) * 1e-9) for i in range(self.config.embedding_dim)]
+        norm = math.sqrt(sum(v * v for v in values)) or 1.0
+        return [v / norm for v in values]
+
+    async def handle_embeddings(self, request: web.Request) -> web.Response:
+        await self._delay()
+        body = await request.json()
+        return web.json_response({"embedding": self._embedding(body.get("prompt", ""))})
+
+    async def handle_embed(self, request: web.Request) -> web.Response:
+        await self._delay()
+        body = await request.json()
+        inputs = body.get("input", "")
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        return web.json_response({
+            "model": body.get("model", ""),
+            "embeddings": [self._embedding(text) for text in inputs],
+        })
+
+    async def handle_pull(self, request: web.Request) -> web.StreamResponse:
+        await self._delay()
+        body = await request.json()
+        name = body.get("name") or body.get("model", "")
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+
+        async def send(record: Dict[str, Any]) -> None:
+            await response.write(json.dumps(record).encode() + b"\n")
+
+        size = self.config.pull_layer_size
+        step = max(1, size // self.config.pull_steps)
+        interval = 1.0 / self.config.token_rate if self.config.token_rate else 0
+        try:
+            await send({"status": "pulling manifest"})
+            for layer in range(self.config.pull_layers):
+                digest = "sha256:" + hashlib.sha256(f"{name}/{layer}".encode()).hexdigest()
+                # Like Ollama, resume from whatever a previous attempt already fetched
+                completed = self._pull_offsets.get(digest, 0)
+                while completed < size:
+                    if interval:
+                        await asyncio.sleep(interval)
+                    completed = min(size, completed + step)
+                    self._pull_offsets[digest] = completed
+                    await send({"status": f"pulling {digest[7:19]}", "digest": digest,
+                                "total": size, "completed": completed})
+                    if self.config.pull_drops and completed >= size // 2:
+                        self.config.pull_drops -= 1
+                        request.transport.close()
+                        return response
+            for status in ("verifying sha256 digest", "writing manifest", "success"):
+                await send({"status": status})
+            await response.write_eof()
+        except ConnectionResetError:
+            pass
+        return response
+
+
+async def _serve(config: MockConfig, host: str, port: int) -> None:
+    server = MockOllamaServer(config, host, port)
+    await server.start()
+    print(f"Mock Ollama listening on {server.base_url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a mock Ollama API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--token-rate", type=float, default=0.0)
+    parser.add_argument("--tokens", type=int, default=64)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(_serve(
+            MockConfig(latency=args.latency, token_rate=args.token_rate, tokens=args.tokens),
+            args.host,
+            args.port,
+        ))
+    except KeyboardInterrupt:
+        pass
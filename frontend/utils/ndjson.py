@@ -0,0 +1,127 @@
+# utils/ndjson.py
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Callable, List, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# orjson parses bytes directly and is several times faster on small objects
+JSON_BACKEND = "orjson" if orjson else "json"
+_default_loads = orjson.loads if orjson else json.loads
+
+_END = object()
+
+
+class NDJSONDecoder:
+    def __init__(self, loads: Optional[Callable[[bytes], Any]] = None):
+        """
+        Incremental newline-delimited JSON decoder.
+
+        Bytes may arrive split anywhere, including mid-line or mid-UTF-8
+        sequence; partial lines are buffered until their newline arrives.
+
+        Args:
+            loads: JSON parser taking bytes, defaults to orjson when installed
+        """
+        self.loads = loads or _default_loads
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> List[Any]:
+        """Add bytes and return every complete record they finished"""
+        self._buffer += data
+        end = self._buffer.rfind(b"\n")
+        if end < 0:
+            return []
+        complete = bytes(self._buffer[:end])
+        del self._buffer[:end + 1]
+        return self._decode_lines(complete.split(b"\n"))
+
+    def flush(self) -> List[Any]:
+        """Decode whatever is left once the stream has ended"""
+        remainder = bytes(self._buffer)
+        self._buffer.clear()
+        return self._decode_lines([remainder])
+
+    def _decode_lines(self, lines: List[bytes]) -> List[Any]:
+        records = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                records.append(self.loads(line))
+            except ValueError:
+                logger.error(f"Failed to decode streaming response: {line[:200]!r}")
+        return records
+
+
+async def iter_ndjson(
+    content,
+    parse: Optional[Callable[[Any], Any]] = None,
+    cancel_event=None,
+    queue_size: int = 0,
+    loads: Optional[Callable[[bytes], Any]] = None
+) -> AsyncIterator[Any]:
+    """
+    Decode an aiohttp response body as NDJSON records.
+
+    Args:
+        content: aiohttp StreamReader (response.content)
+        parse: Optional converter applied to each decoded record
+        cancel_event: Anything with is_set() (threading or asyncio Event);
+            checked between network reads to abandon the stream early
+        queue_size: When > 0, read ahead on a separate task into a bounded
+            queue. A full queue stops reading the socket, so a slow consumer
+            applies backpressure to the server instead of buffering unbounded
+        loads: JSON parser override
+
+    Yields:
+        Decoded (and parsed) records in order
+    """
+    decoder = NDJSONDecoder(loads)
+    parse = parse or (lambda record: record)
+
+    async def records():
+        async for data in content.iter_any():
+            if cancel_event is not None and cancel_event.is_set():
+                logger.info("NDJSON stream cancelled")
+                return
+            for record in decoder.feed(data):
+                yield parse(record)
+        for record in decoder.flush():
+            yield parse(record)
+
+    if queue_size <= 0:
+        async for record in records():
+            yield record
+        return
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    async def produce():
+        # Exceptions travel through the queue so they surface in the consumer
+        try:
+            async for record in records():
+                await queue.put(record)
+            await queue.put(_END)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await queue.put(e)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is _END:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        producer.cancel()
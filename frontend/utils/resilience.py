@@ -0,0 +1,135 @@
+# utils/resilience.py
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import Dict, Optional
+
+import aiohttp
+
+
+@dataclass(frozen=True)
+class Deadlines:
+    """
+    Time limits for one request, in seconds; None means unbounded.
+
+    connect bounds establishing the connection, first_byte bounds the wait
+    for the server to start answering (and any later stall between reads),
+    total bounds the whole exchange including reading the body.
+    """
+    connect: Optional[float] = 5.0
+    first_byte: Optional[float] = 30.0
+    total: Optional[float] = 30.0
+
+    def client_timeout(self) -> aiohttp.ClientTimeout:
+        return aiohttp.ClientTimeout(
+            total=self.total,
+            connect=self.connect,
+            sock_connect=self.connect,
+            sock_read=self.first_byte
+        )
+
+    def with_total(self, total: Optional[float]) -> "Deadlines":
+        return replace(self, total=total)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Capped exponential backoff with full jitter"""
+    max_tries: int = 3
+    base_delay: float = 0.25
+    max_delay: float = 4.0
+
+    def delay(self, attempt: int) -> float:
+        """Seconds to wait before retry number `attempt` (1-based)"""
+        # Full jitter keeps clients that failed together from retrying together
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class LatencyTracker:
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        """
+        Recent successful latencies per endpoint, for picking hedge delays.
+
+        Args:
+            window: Latencies kept per endpoint
+            min_samples: Samples needed before a percentile is reported
+        """
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, deque] = {}
+
+    def observe(self, endpoint: str, elapsed: float) -> None:
+        samples = self._samples.get(endpoint)
+        if samples is None:
+            samples = self._samples[endpoint] = deque(maxlen=self.window)
+        samples.append(elapsed)
+
+    def percentile(self, endpoint: str, percentile: float) -> Optional[float]:
+        """Latency below which `percentile` (0-100) of recent requests finished"""
+        samples = self._samples.get(endpoint)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Fail fast while an endpoint keeps failing.
+
+        After failure_threshold consecutive failures the circuit opens and
+        requests are refused without touching the network. Once
+        reset_timeout has passed a single trial request is let through:
+        success closes the circuit, failure opens it for another period.
+
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds the circuit stays open before a trial request
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now; a True in half-open state claims the trial"""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+        if self._trial_running:
+            return False
+        self._trial_running = True
+        return True
+
+    def retry_after(self) -> float:
+        """Seconds until the next trial request is allowed"""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self._trial_running = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_running = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Give back a claimed trial without a verdict, e.g. when the request was cancelled"""
+        self._trial_running = False
@@ -0,0 +1,215 @@
+# utils/watchdog.py
+import collections
+import cProfile
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Deque, Dict, List, Optional
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Stall:
+    started_at: datetime
+    duration: float
+    stack: List[str]
+
+    @property
+    def culprit(self) -> str:
+        """Innermost application frame, the most useful one-line summary"""
+        return self.stack[-1].strip().splitlines()[0] if self.stack else "unknown"
+
+
+class UIWatchdog:
+    def __init__(self, root, interval_ms: int = 100, stall_threshold: float = 0.25, history: int = 600):
+        """
+        Measure Tk event-loop responsiveness.
+
+        A heartbeat scheduled with root.after records how late each callback
+        runs. A separate thread watches the heartbeat and, when the main thread
+        has not come back for longer than stall_threshold seconds, logs the
+        main thread's current Python stack, which is whatever is blocking it.
+
+        Args:
+            root: Tk root window
+            interval_ms: Heartbeat period
+            stall_threshold: Seconds without a heartbeat that count as a stall
+            history: Number of lag samples kept for statistics
+        """
+        self.root = root
+        self.interval = interval_ms / 1000.0
+        self.interval_ms = interval_ms
+        self.stall_threshold = stall_threshold
+        self.lags: Deque[float] = collections.deque(maxlen=history)
+        self.stalls: Deque[Stall] = collections.deque(maxlen=50)
+        self.max_lag = 0.0
+        self._main_thread_id = threading.main_thread().ident
+        self._last_beat = time.perf_counter()
+        self._expected = self._last_beat
+        self._running = False
+        self._stall_stack: Optional[List[str]] = None
+        self._stall_since = 0.0
+
+    def start(self) -> "UIWatchdog":
+        self._running = True
+        self._last_beat = time.perf_counter()
+        self._expected = self._last_beat + self.interval
+        self.root.after(self.interval_ms, self._beat)
+        threading.Thread(target=self._watch, name="ui-watchdog", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._running = False
+
+    def _beat(self) -> None:
+        now = time.perf_counter()
+        lag = max(0.0, now - self._expected)
+        self.lags.append(lag)
+        self.max_lag = max(self.max_lag, lag)
+        if metrics.enabled:
+            metrics.ui_lag.observe(lag)
+        self._last_beat = now
+        if self._running:
+            self._expected = now + self.interval
+            self.root.after(self.interval_ms, self._beat)
+
+    def _watch(self) -> None:
+        poll = min(self.stall_threshold / 4, 0.05)
+        while self._running:
+            time.sleep(poll)
+            silent_for = time.perf_counter() - self._last_beat - self.interval
+            if silent_for > self.stall_threshold:
+                if self._stall_stack is None:
+                    # Capture once, as early as possible, while the culprit is still on the stack
+                    self._stall_stack = self._main_stack()
+                    self._stall_since = self._last_beat
+            elif self._stall_stack is not None:
+                self._report_stall()
+
+    def _main_stack(self) -> List[str]:
+        frame = sys._current_frames().get(self._main_thread_id)
+        return traceback.format_stack(frame) if frame else []
+
+    def _report_stall(self) -> None:
+        duration = max(0.0, self._last_beat - self._stall_since - self.interval)
+        started_at = datetime.fromtimestamp(time.time() - (time.perf_counter() - self._stall_since))
+        stall = Stall(started_at, duration, self._stall_stack)
+        self.stalls.append(stall)
+        self._stall_stack = None
+        logger.warning(
+            f"UI thread stalled for {duration * 1000:.0f} ms at {stall.culprit}\n" + "".join(stall.stack)
+        )
+
+    def stats(self) -> Dict[str, float]:
+        """Recent lag statistics in seconds"""
+        lags = sorted(self.lags)
+        if not lags:
+            return {"last": 0.0, "p95": 0.0, "max": self.max_lag, "stalls": len(self.stalls)}
+        return {
+            "last": self.lags[-1],
+            "p95": lags[min(len(lags) - 1, int(len(lags) * 0.95))],
+            "max": self.max_lag,
+            "stalls": len(self.stalls),
+        }
+
+
+class SamplingProfiler:
+    def __init__(self, thread_id: Optional[int] = None, interval: float = 0.005):
+        """
+        Periodically sample one thread's stack and count identical stacks.
+
+        The output is in collapsed/folded format ("a;b;c count" per line), which
+        flamegraph.pl and speedscope read directly.
+        """
+        self.thread_id = thread_id or threading.main_thread().ident
+        self.interval = interval
+        self.samples: Dict[str, int] = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.samples[";".join(reversed(names))] += 1
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def dump(self, path: str) -> None:
+        with open(path, "w") as f:
+            for stack, count in sorted(self.samples.items(), key=lambda item: -item[1]):
+                f.write(f"{stack} {count}\n")
+
+
+class ProfilerToggle:
+    MODES = ("cprofile", "sampling")
+
+    def __init__(self, output_dir: str = "data/profiles"):
+        """
+        Start/stop profiling of the UI thread on demand.
+
+        "cprofile" instruments the calling thread (call it from the Tk thread)
+        and writes a .prof file for pstats/snakeviz. "sampling" has almost no
+        overhead and writes a .folded file for flame graphs.
+        """
+        self.output_dir = output_dir
+        self.mode: Optional[str] = None
+        self._profiler = None
+
+    @property
+    def active(self) -> bool:
+        return self.mode is not None
+
+    def start(self, mode: str = "cprofile") -> None:
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown profiler mode: {mode}")
+        if self.active:
+            return
+        if mode == "cprofile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._profiler = SamplingProfiler()
+            self._profiler.start()
+        self.mode = mode
+
+    def stop(self) -> Optional[str]:
+        """Stop profiling and return the path of the written profile"""
+        if not self.active:
+            return None
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        if self.mode == "cprofile":
+            self._profiler.disable()
+            path = os.path.join(self.output_dir, f"profile-{stamp}.prof")
+            self._profiler.dump_stats(path)
+        else:
+            self._profiler.stop()
+            path = os.path.join(self.output_dir, f"profile-{stamp}.folded")
+            self._profiler.dump(path)
+        self._profiler = None
+        self.mode = None
+        logger.info(f"Profile written to {path}")
+        return path